@@ -1,7 +1,5 @@
 import sys
-
-from opentrons.robot.robot import Robot
-from opentrons.robot.command import Command
+import types
 
 from ._version import get_versions
 
@@ -12,9 +10,30 @@ if version < (3, 5):
         'opentrons requires Python 3.5 or above, this is {0}.{1}'.format(
             version[0], version[1]))
 
-robot = Robot()
 
-__all__ = [Robot, Command, robot]
+class _OpentronsModule(types.ModuleType):
+    """
+    `opentrons.robot` is the Robot singleton, created on first use because
+    it reads the smoothie settings and creates the virtual smoothies
+    """
+    @property
+    def robot(self):
+        return Robot()
+
+    @robot.setter
+    def robot(self, value):
+        # importing the opentrons.robot subpackage binds it to its parent
+        # package under the same name, `opentrons.robot` stays the Robot
+        if value is not sys.modules.get(__name__ + '.robot'):
+            raise AttributeError("can't set attribute 'robot'")
+
+
+sys.modules[__name__].__class__ = _OpentronsModule
+
+from opentrons.robot.robot import Robot  # NOQA
+from opentrons.robot.command import Command  # NOQA
+
+__all__ = ['Robot', 'Command', 'robot']
 
 
 __version__ = get_versions()['version']
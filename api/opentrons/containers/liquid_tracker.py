@@ -0,0 +1,191 @@
+"""
+Optional tracking of the liquid volume in each well.
+
+When enabled with :meth:`Robot.enable_liquid_tracking`, every aspirate and
+dispense of a :any:`Pipette` updates the volume of the wells it visits
+while commands are set up, so protocols are validated both when they are
+written and on each :meth:`Robot.simulate`. Volumes are kept in one
+``array('d')`` per container, indexed like the container's wells.
+
+A well's volume is unknown (``None``) until it is set with
+:meth:`LiquidTracker.set_volume` or liquid is dispensed into it, in which
+case it is assumed to have been empty. Aspirating from a well of unknown
+volume is not checked.
+
+Aspirating more than a well holds (underflow) and dispensing more than
+its ``total-liquid-volume`` (overflow) are collected per well instead of
+being reported on every command, see :meth:`LiquidTracker.get_warnings`.
+"""
+from array import array
+from collections import OrderedDict
+import math
+
+from opentrons.containers.placeable import (
+    Container, Placeable, Well, humanize_location, unpack_location
+)
+
+
+UNDERFLOW = 'underflow'
+OVERFLOW = 'overflow'
+
+
+class _ContainerState(object):
+    """
+    Volumes of the wells of one container
+    """
+    def __init__(self, container):
+        self.container = container
+        self.wells = container.get_children_list()
+        self.index = {id(well): i for i, well in enumerate(self.wells)}
+
+        self.volumes = array('d', [math.nan]) * len(self.wells)
+        self.initial_volumes = array('d', self.volumes)
+        self.max_volumes = array('d', [
+            well.properties.get('total-liquid-volume') or math.inf
+            for well in self.wells
+        ])
+
+
+class LiquidTracker(object):
+    """
+    Volume of liquid in every well of the deck
+    """
+    def __init__(self):
+        # id(container) -> _ContainerState
+        self._containers = {}
+        # (id(well), kind) -> [well, kind, worst excess volume, count]
+        self._issues = OrderedDict()
+
+    def reset(self):
+        """
+        Restores the volumes set with :meth:`set_volume` and
+        forgets all warnings
+        """
+        for state in self._containers.values():
+            state.volumes = array('d', state.initial_volumes)
+        self._issues = OrderedDict()
+
+    def set_volume(self, location, volume):
+        """
+        Sets the starting volume of a :any:`Well`, or of all wells of a
+        :any:`Container`, :any:`WellSeries` or list
+        """
+        for well in self._get_wells(location):
+            state, i = self._get_state(well)
+            state.volumes[i] = volume
+            state.initial_volumes[i] = volume
+
+    def get_volume(self, well):
+        """
+        Returns the volume in :well:, or *None* if it is unknown
+        """
+        state, i = self._get_state(well)
+        volume = state.volumes[i]
+        return None if math.isnan(volume) else volume
+
+    def get_volumes(self, container):
+        """
+        Returns the volumes of all wells of :container: in order,
+        *None* for unknown volumes
+        """
+        state = self._get_container_state(container)
+        return [
+            None if math.isnan(volume) else volume
+            for volume in state.volumes
+        ]
+
+    def get_total_volume(self, container):
+        """
+        Returns the sum of the known volumes in :container:
+        """
+        state = self._get_container_state(container)
+        return math.fsum(v for v in state.volumes if not math.isnan(v))
+
+    def aspirate(self, location, volume):
+        """
+        Removes :volume: from each well of :location:
+        """
+        for well in self._get_wells(location):
+            state, i = self._get_state(well)
+            current = state.volumes[i]
+            if math.isnan(current):
+                continue
+            current -= volume
+            if current < 0:
+                self._add_issue(well, UNDERFLOW, -current)
+                current = 0
+            state.volumes[i] = current
+
+    def dispense(self, location, volume):
+        """
+        Adds :volume: to each well of :location:
+        """
+        for well in self._get_wells(location):
+            state, i = self._get_state(well)
+            current = state.volumes[i]
+            if math.isnan(current):
+                current = 0
+            current += volume
+            if current > state.max_volumes[i]:
+                self._add_issue(
+                    well, OVERFLOW, current - state.max_volumes[i])
+            state.volumes[i] = current
+
+    def get_issues(self):
+        """
+        Returns a list of (well, kind, worst excess volume, count) for
+        every well that underflowed or overflowed
+        """
+        return [tuple(issue) for issue in self._issues.values()]
+
+    def get_warnings(self):
+        """
+        Returns one warning message per well that underflowed or overflowed
+        """
+        warnings = []
+        for well, kind, excess, count in self._issues.values():
+            if kind == UNDERFLOW:
+                message = 'Aspirating {0:.1f}uL more than {1} holds'
+            else:
+                message = 'Dispensing {0:.1f}uL more than {1} can hold'
+            message = message.format(excess, humanize_location(well))
+            if count > 1:
+                message += ' ({} times)'.format(count)
+            warnings.append(message)
+        return warnings
+
+    def _add_issue(self, well, kind, excess):
+        key = (id(well), kind)
+        issue = self._issues.get(key)
+        if issue is None:
+            self._issues[key] = [well, kind, excess, 1]
+        else:
+            issue[2] = max(issue[2], excess)
+            issue[3] += 1
+
+    def _get_wells(self, location):
+        if isinstance(location, tuple):
+            location, _ = unpack_location(location)
+        if isinstance(location, Well):
+            return [location]
+        if isinstance(location, (Container, list)):
+            return [
+                well for well in location
+                if isinstance(well, Well)
+            ]
+        if isinstance(location, Placeable):
+            return []
+        raise ValueError(
+            'Cannot track liquid at {}, expected a Well or Container'.format(
+                location))
+
+    def _get_container_state(self, container):
+        state = self._containers.get(id(container))
+        if state is None:
+            state = _ContainerState(container)
+            self._containers[id(container)] = state
+        return state
+
+    def _get_state(self, well):
+        state = self._get_container_state(well.get_parent())
+        return (state, state.index[id(well)])
@@ -3,14 +3,15 @@ import copy
 import json
 import numbers
 import os
-import pkg_resources
 
+from opentrons import config
 from opentrons.containers.placeable import Container, Well
 from opentrons.util import environment
 
 
 persisted_containers_dict = {}
 persisted_containers_file_list = []
+_loaded = False
 
 
 def load_persisted_containers_from_file_list(file_list):
@@ -19,6 +20,8 @@ def load_persisted_containers_from_file_list(file_list):
 
 
 def load_all_persisted_containers_from_disk():
+    global _loaded
+    _loaded = True
     persisted_containers_file_list.clear()
     persisted_containers_file_list.extend(
         [persisted_containers_json_path] + get_custom_container_files()
@@ -37,8 +40,17 @@ def load_persisted_containers_from_file_path(file_path):
         )['containers'])
 
 
-containers_dir_path = pkg_resources.resource_filename(
-    'opentrons.config',
+def ensure_persisted_containers_loaded():
+    """
+    Loads the default containers and whatever containers we find in
+    environment.get_path('CONTAINERS_DIR'), unless already loaded
+    """
+    if not _loaded:
+        load_all_persisted_containers_from_disk()
+
+
+containers_dir_path = os.path.join(
+    os.path.dirname(config.__file__),
     'containers'
 )
 
@@ -73,6 +85,7 @@ def get_custom_container_files():
 
 
 def get_persisted_container(container_name: str) -> Container:
+    ensure_persisted_containers_loaded()
     container_data = persisted_containers_dict.get(container_name)
     if not container_data:
         raise ValueError(
@@ -83,11 +96,13 @@ def get_persisted_container(container_name: str) -> Container:
 
 
 def list_container_names():
+    ensure_persisted_containers_loaded()
     c_list = [n for n in persisted_containers_dict.keys()]
     return sorted(c_list, key=lambda s: s.lower())
 
 
 def load_all_persisted_containers():
+    ensure_persisted_containers_loaded()
     containers = []
     for container_name, container_data in persisted_containers_dict.items():
         try:
@@ -199,8 +214,3 @@ def create_container_obj_from_dict(container_data: dict) -> Container:
         container.add(well, well_name, well_coordinates)
 
     return container
-
-
-# Load default persisted containers from API distribution
-# and whatever containers we find in environment.get_path('CONTAINERS_DIR')
-load_all_persisted_containers_from_disk()
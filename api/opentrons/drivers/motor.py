@@ -1,24 +1,25 @@
 import configparser
-import glob
+import copy
 import json
 import math
 import os
-import pkg_resources
 import sys
 import time
 from threading import Event
 
-import serial
-
+from opentrons import config
 from opentrons.util.log import get_logger
 from opentrons.util.vector import Vector
+from opentrons.drivers import serial_recorder
+from opentrons.drivers.serial_arbiter import SerialArbiter
 from opentrons.drivers.virtual_smoothie import VirtualSmoothie
 
+from opentrons.util import metrics
 from opentrons.util import trace
 
 
-DEFAULTS_DIR_PATH = pkg_resources.resource_filename(
-    'opentrons.config', 'smoothie')
+DEFAULTS_DIR_PATH = os.path.join(
+    os.path.dirname(config.__file__), 'smoothie')
 DEFAULTS_FILE_PATH = os.path.join(DEFAULTS_DIR_PATH, 'smoothie-defaults.ini')
 CONFIG_DIR_PATH = os.environ.get('APP_DATA_DIR', os.getcwd())
 CONFIG_DIR_PATH = os.path.join(CONFIG_DIR_PATH, 'smoothie')
@@ -26,6 +27,23 @@ CONFIG_FILE_PATH = os.path.join(CONFIG_DIR_PATH, 'smoothie-config.ini')
 
 log = get_logger(__name__)
 
+# traffic with real smoothies, not with virtual ones or replays
+SERIAL_EXCHANGES = metrics.counter(
+    'opentrons_serial_exchanges_total',
+    'Request/response exchanges with the smoothie')
+SERIAL_LATENCY = metrics.summary(
+    'opentrons_serial_latency_seconds',
+    'Seconds from writing a command to the smoothie to reading its response')
+SERIAL_CONNECTS = metrics.counter(
+    'opentrons_serial_connects_total',
+    'Connections to a smoothie')
+SERIAL_RECONNECTS = metrics.counter(
+    'opentrons_serial_reconnects_total',
+    'Serial ports reopened because a write found them closed')
+LIMIT_SWITCH_HITS = metrics.counter(
+    'opentrons_limit_switch_hits_total',
+    'Limit switches hit')
+
 
 class CNCDriver(object):
 
@@ -84,14 +102,43 @@ class CNCDriver(object):
 
     firmware_version = None
     config_version = None
+    config_file_version = None
     ot_version = None
 
+    # skip commands that would not change the robot's state, like moves to
+    # the current position or resending the current coordinate system,
+    # off until proven on robots
+    peephole = False
+
+    # moves closer than this (in mm) to the current target are skipped
+    NOOP_MOVE_TOLERANCE = 0.001
+
     def __init__(self):
         self.halted = Event()
         self.stopped = Event()
         self.do_not_pause = Event()
         self.resume()
         self.current_commands = []
+        # (connection, mode) of the last coordinate system sent
+        self._coordinate_system = None
+        # (connection, head target) of the last move sent, see
+        # get_head_target
+        self._head_target = None
+
+        # serializes exchanges on the serial link between threads
+        self.arbiter = SerialArbiter()
+        # last position and switches read from the smoothie, answers
+        # queries of other threads while a protocol runs
+        self._state_cache = {}
+        # connection -> versions and steps per mm read from it,
+        # see _get_handshake
+        self._handshakes = {}
+
+        # totals since the driver was created, read by
+        # opentrons.robot.command_timing
+        self.serial_exchanges = 0
+        self.serial_bytes_sent = 0
+        self.arrival_wait_seconds = 0.0
 
         self.SMOOTHIE_SUCCESS = 'Success'
         self.SMOOTHIE_ERROR = 'Received unexpected response from Smoothie'
@@ -167,54 +214,92 @@ class CNCDriver(object):
     def get_serial_ports_list(self):
         """ Lists serial port names
 
-            :raises EnvironmentError:
-                On unsupported or unknown platforms
             :returns:
-                A list of the serial ports available on the system
+                A list of the serial ports available on the system,
+                see :mod:`opentrons.drivers.serial_ports`
         """
-        if sys.platform.startswith('win'):
-            ports = ['COM%s' % (i + 1) for i in range(256)]
-        elif (sys.platform.startswith('linux') or
-              sys.platform.startswith('cygwin')):
-            # this excludes your current terminal "/dev/tty"
-            ports = glob.glob('/dev/tty*')
+        from opentrons.drivers import serial_ports
+
+        if sys.platform.startswith('linux'):
             # ignore Smoothie's local storage if linux (temporary work-around)
             self.ignore_smoothie_sd = True
-        elif sys.platform.startswith('darwin'):
-            ports = glob.glob('/dev/tty.*')
-        else:
-            raise EnvironmentError('Unsupported platform')
-
-        result = []
-        port_filter = {'usbmodem', 'COM', 'ACM', 'USB'}
-        for port in ports:
-            try:
-                if any([f in port for f in port_filter]):
-                    s = serial.Serial(port)
-                    s.close()
-                    result.append(port)
-            except Exception as e:
-                log.debug(
-                    'Exception in testing port {}'.format(port))
-                log.debug(e)
-        return result
+        return serial_ports.list_serial_ports()
 
     def disconnect(self):
         if self.is_connected() and self.connection:
             self.connection.close()
         self.connection = None
+        self._coordinate_system = None
+        self._head_target = None
+        self._state_cache = {}
+        self._handshakes = {}
 
     def connect(self, device):
-        self.connection = device
-        self.toggle_port()
-        log.debug("Connected to {}".format(device))
+        with self.arbiter.link():
+            if not self.is_virtual(device):
+                SERIAL_CONNECTS.inc()
+            self.connection = device
+            self._coordinate_system = None
+            self._head_target = None
+            self._state_cache = {}
+            self._handshakes = {}
+            self.toggle_port()
+            log.debug("Connected to %s", device)
+
+            self.turn_off_feedback()
+            self.versions_compatible()
+            if self.ignore_smoothie_sd:
+                self._set_step_per_mm_from_config()
+
+            return self.calm_down()
+
+    def _is_query_during_run(self):
+        """
+        Returns True if another thread is running a protocol, so
+        read-only queries should be answered from cached state
+        """
+        return self.arbiter.is_motion_active() and \
+            not self.arbiter.is_motion_thread()
+
+    def _use_state_cache(self, key):
+        return key in self._state_cache and self._is_query_during_run()
+
+    def _get_handshake(self):
+        """
+        Returns the dict of versions and settings read from the current
+        connection, they are read once per connection (the robot swaps
+        in a virtual smoothie while simulating) and forgotten on
+        :meth:`connect`, :meth:`disconnect` and :meth:`reset`
+        """
+        handshake = self._handshakes.get(self.connection)
+        if handshake is None:
+            handshake = {}
+            self._handshakes[self.connection] = handshake
+        return handshake
 
-        self.turn_off_feedback()
-        self.versions_compatible()
-        if self.ignore_smoothie_sd:
-            self._set_step_per_mm_from_config()
+    def is_virtual(self, device=None):
+        """
+        Returns True if :device: (Default: the connection) is not a live
+        robot: a virtual smoothie, also while its traffic is recorded, or
+        a replayed recording
+        """
+        if device is None:
+            device = self.connection
+        return isinstance(
+            serial_recorder.get_device(device),
+            (VirtualSmoothie, serial_recorder.ReplayDevice))
 
-        return self.calm_down()
+    def get_wait_time(self, delay_time):
+        """
+        Returns the seconds a delay of :delay_time: takes on the connection,
+        none on a virtual smoothie and divided by the speed of a replay
+        """
+        device = serial_recorder.get_device(self.connection)
+        if isinstance(device, serial_recorder.ReplayDevice):
+            return device.get_replay_time(delay_time)
+        if self.is_virtual(device):
+            return 0
+        return delay_time
 
     def is_connected(self):
         return self.connection and self.connection.isOpen()
@@ -278,19 +363,30 @@ class CNCDriver(object):
 
         Raises RuntimeError write fails or connection times out
         """
-        log.debug("Write: {}".format(str(data).encode()))
+        log.debug("Write: %r", data)
         if self.is_connected():
-            try:
-                self.connection.write(str(data).encode())
-            except Exception as e:
-                self.disconnect()
-                raise RuntimeError('Lost connection with serial port') from e
-            return self.wait_for_response()
+            with self.arbiter.link():
+                encoded = str(data).encode()
+                start = time.perf_counter()
+                try:
+                    self.connection.write(encoded)
+                except Exception as e:
+                    self.disconnect()
+                    raise RuntimeError(
+                        'Lost connection with serial port') from e
+                self.serial_exchanges += 1
+                self.serial_bytes_sent += len(encoded)
+                response = self.wait_for_response()
+                if not self.is_virtual():
+                    SERIAL_EXCHANGES.inc()
+                    SERIAL_LATENCY.observe(time.perf_counter() - start)
+                return response
         elif self.connection is None:
             msg = "No connection found."
             log.warn(msg)
             raise RuntimeError(msg)
         elif max_tries > 0:
+            SERIAL_RECONNECTS.inc()
             self.toggle_port()
             return self.write_to_serial(
                 data, max_tries=max_tries - 1, try_interval=try_interval
@@ -314,16 +410,12 @@ class CNCDriver(object):
             count = count + 1
             out = self.readline_from_serial()
             if out:
-                log.debug(
-                    "Waited {} lines for response {}.".format(count, out)
-                )
+                log.debug("Waited %s lines for response %s.", count, out)
                 return out
             else:
                 if count == 1 or count % 10 == 0:
                     # Don't log all the time; gets spammy.
-                    log.debug(
-                        "Waiting {} lines for response.".format(count)
-                    )
+                    log.debug("Waiting %s lines for response.", count)
         raise RuntimeWarning(
             'No response from serial port after {} seconds'.format(timeout))
 
@@ -345,7 +437,7 @@ class CNCDriver(object):
             self.disconnect()
             raise RuntimeWarning('Lost connection with serial port') from e
         if msg:
-            log.debug("Read: {}".format(msg))
+            log.debug("Read: %s", msg)
             self.detect_limit_hit(msg)  # raises RuntimeWarning if switch hit
 
         return msg
@@ -358,6 +450,8 @@ class CNCDriver(object):
         """
         if b'!!' in msg or b'limit' in msg:
             log.debug('home switch hit')
+            if not self.is_virtual():
+                LIMIT_SWITCH_HITS.inc()
             self.flush_port()
             self.calm_down()
             msg = msg.decode()
@@ -368,18 +462,50 @@ class CNCDriver(object):
             raise RuntimeWarning('{} limit switch hit'.format(axis.upper()))
 
     def set_coordinate_system(self, mode):
+        if self.peephole and \
+                self._coordinate_system == (self.connection, mode):
+            return
         if mode == 'absolute':
             self.send_command(self.ABSOLUTE_POSITIONING)
         elif mode == 'relative':
             self.send_command(self.RELATIVE_POSITIONING)
         else:
             raise ValueError('Invalid coordinate mode: ' + mode)
+        self._coordinate_system = (self.connection, mode)
+
+    def is_noop_move(self, position, mode='absolute', **kwargs):
+        """
+        Returns True if moving to :kwargs: from :position: (as returned by
+        :meth:`get_position`) would not move any axis
+        """
+        if mode == 'relative':
+            return all(
+                abs(kwargs[axis]) < self.NOOP_MOVE_TOLERANCE
+                for axis in 'xyzab' if axis in kwargs)
+
+        head = self.flip_coordinates(Vector(position['target']))
+        for axis in 'xyzab':
+            if axis not in kwargs:
+                continue
+            if axis in 'xyz':
+                current = head[axis]
+            else:
+                current = position['target'][axis]
+            if abs(kwargs[axis] - current) >= self.NOOP_MOVE_TOLERANCE:
+                return False
+        return True
 
     def move(self, mode='absolute', **kwargs):
         self.set_coordinate_system(mode)
 
-        current = self.get_head_position()['target']
-        log.debug('Current Head Position: {}'.format(current))
+        position = self.get_position()
+        if self.peephole and self.is_noop_move(position, mode, **kwargs):
+            self.check_paused_stopped()
+            log.debug("Skipping move to current position: %s", kwargs)
+            return (True, self.SMOOTHIE_SUCCESS)
+
+        current = self.flip_coordinates(Vector(position['target']))
+        log.debug('Current Head Position: %s', current)
         target_point = {
             axis: kwargs.get(
                 axis,
@@ -387,7 +513,11 @@ class CNCDriver(object):
             )
             for axis in 'xyz'
         }
-        log.debug('Destination: {}'.format(target_point))
+        log.debug('Destination: %s', target_point)
+
+        destination = Vector(target_point)
+        if mode == 'relative':
+            destination += current
 
         flipped_vector = self.flip_coordinates(
             Vector(target_point), mode)
@@ -401,7 +531,24 @@ class CNCDriver(object):
         args.update({"a": self.plunger_speed['a']})
         args.update({"b": self.plunger_speed['b']})
 
-        return self.consume_move_commands(args)
+        self._head_target = None
+        result = self.consume_move_commands(args)
+        if result[0]:
+            self._head_target = (self.connection, destination)
+        return result
+
+    def get_head_target(self):
+        """
+        Returns the head target of the last move sent on the current
+        connection, without asking the smoothie, or *None* if it is not
+        known (e.g. after homing or a failed move)
+        """
+        if self._head_target is None:
+            return None
+        connection, target = self._head_target
+        if connection is not self.connection:
+            return None
+        return target
 
     def move_plunger(self, mode='absolute', **kwargs):
         return self.move(mode, **kwargs)
@@ -412,22 +559,26 @@ class CNCDriver(object):
     def consume_move_commands(self, args):
         self.check_paused_stopped()
 
-        log.debug("Moving : {}".format(args))
+        log.debug("Moving : %s", args)
         res = self.send_command(self.MOVE, **args)
         if res != b'ok':
             return (False, self.SMOOTHIE_ERROR)
 
         self.wait_for_arrival()
 
-        arguments = {
-            'name': 'move-finished',
-            'position': {
-                'head': self.get_head_position()["current"],
-                'plunger': self.get_plunger_positions()["current"]
-            },
-            'class': type(self.connection).__name__
-        }
-        trace.EventBroker.get_instance().notify(arguments)
+        # reading positions costs two round trips to the smoothie,
+        # so only do it if somebody is listening
+        broker = trace.EventBroker.get_instance()
+        if broker.has_listeners('move-finished'):
+            arguments = {
+                'name': 'move-finished',
+                'position': {
+                    'head': self.get_head_position()["current"],
+                    'plunger': self.get_plunger_positions()["current"]
+                },
+                'class': type(self.connection).__name__
+            }
+            broker.notify(arguments)
         return (True, self.SMOOTHIE_SUCCESS)
 
     def flip_coordinates(self, coordinates, mode='absolute'):
@@ -440,6 +591,13 @@ class CNCDriver(object):
         return coordinates
 
     def wait_for_arrival(self, tolerance=0.1):
+        start = time.perf_counter()
+        try:
+            return self._wait_for_arrival(tolerance)
+        finally:
+            self.arrival_wait_seconds += time.perf_counter() - start
+
+    def _wait_for_arrival(self, tolerance):
         arrived = False
         coords = self.get_position()
         while not arrived:
@@ -487,25 +645,27 @@ class CNCDriver(object):
             for l in axis_to_home:
                 pos_args[l] = 0
 
-            arguments = {
-                'name': 'home',
-                'axis': axis_to_home,
-                'position': {
-                    'head': self.get_head_position()["current"],
-                    'plunger': self.get_plunger_positions()["current"]
+            broker = trace.EventBroker.get_instance()
+            if broker.has_listeners('home'):
+                arguments = {
+                    'name': 'home',
+                    'axis': axis_to_home,
+                    'position': {
+                        'head': self.get_head_position()["current"],
+                        'plunger': self.get_plunger_positions()["current"]
+                    }
                 }
-            }
-            trace.EventBroker.get_instance().notify(arguments)
+                broker.notify(arguments)
             return self.set_position(**pos_args)
         else:
             return False
 
     def wait(self, delay_time):
         start_time = time.time()
-        end_time = start_time + delay_time
+        end_time = start_time + self.get_wait_time(delay_time)
         arguments = {'name': 'delay-start', 'time': delay_time}
         trace.EventBroker.get_instance().notify(arguments)
-        if not isinstance(self.connection, VirtualSmoothie):
+        if end_time > start_time:
             while time.time() + 1.0 < end_time:
                 self.check_paused_stopped()
                 time.sleep(1)
@@ -521,10 +681,15 @@ class CNCDriver(object):
         return True
 
     def calm_down(self):
+        self._coordinate_system = None
+        self._head_target = None
         res = self.send_command(self.CALM_DOWN)
         return res == b'ok'
 
     def reset(self):
+        self._coordinate_system = None
+        self._head_target = None
+        self._handshakes = {}
         res = self.send_command(self.RESET)
         if b'Rebooting' in res:
             self.disconnect()
@@ -533,6 +698,7 @@ class CNCDriver(object):
         uppercase_args = {}
         for key in kwargs:
             uppercase_args[key.upper()] = kwargs[key]
+        self._head_target = None
         res = self.send_command(self.SET_POSITION, **uppercase_args)
         return res == b'ok'
 
@@ -555,6 +721,12 @@ class CNCDriver(object):
         return plunger_coords
 
     def get_position(self):
+        if self._use_state_cache('position'):
+            return {
+                state: dict(values)
+                for state, values in self._state_cache['position'].items()
+            }
+
         res = self.send_command(self.GET_POSITION)
         # remove the "ok " from beginning of response
         res = res.decode('utf-8')[3:]
@@ -568,6 +740,10 @@ class CNCDriver(object):
                 # the uppercase axis are the "target" values
                 coords['target'][letter] = response_dict.get(letter.upper(), 0)
 
+            self._state_cache['position'] = {
+                state: dict(values) for state, values in coords.items()
+            }
+
         except ValueError:
             log.critical("Error parsing JSON string from smoothie board:")
             log.critical(res)
@@ -589,7 +765,7 @@ class CNCDriver(object):
         return self.set_steps_per_mm(axis, current_steps_per_mm)
 
     def set_head_speed(self, rate=None):
-        if rate:
+        if rate and not (self.peephole and rate == self.head_speed):
             self.head_speed = rate
             self.saved_settings['state']['head_speed'] = str(self.head_speed)
             with open(CONFIG_FILE_PATH, 'w') as configfile:
@@ -631,48 +807,73 @@ class CNCDriver(object):
         return res
 
     def get_ot_version(self):
-        res = self.get_config_value(self.OT_VERSION)
+        handshake = self._get_handshake()
+        if 'ot_version' not in handshake:
+            handshake['ot_version'] = self.get_config_value(self.OT_VERSION)
+        res = handshake['ot_version']
         self.ot_version = None
         if res not in self.ot_one_dimensions:
-            log.debug('{} is not an ot_version'.format(res))
+            log.debug('%s is not an ot_version', res)
             return None
         self.ot_version = res
-        log.debug('Read ot_version {}'.format(res))
+        log.debug('Read ot_version %s', res)
         return self.ot_version
 
     def get_firmware_version(self):
-        res = self.send_command(self.GET_FIRMWARE_VERSION)
-        res = res.decode().split(' ')[-1]
-        # the version is returned as a JSON dict, the version is a string
-        # but not wrapped in double-quotes as JSON requires...
-        # aka --> {"version":v1.0.5}
-        self.firmware_version = res.split(':')[-1][:-1]
+        handshake = self._get_handshake()
+        if 'firmware' not in handshake:
+            res = self.send_command(self.GET_FIRMWARE_VERSION)
+            res = res.decode().split(' ')[-1]
+            # the version is returned as a JSON dict, the version is a string
+            # but not wrapped in double-quotes as JSON requires...
+            # aka --> {"version":v1.0.5}
+            handshake['firmware'] = res.split(':')[-1][:-1]
+        self.firmware_version = handshake['firmware']
         return self.firmware_version
 
     def get_config_version(self):
-        res = self.get_config_value(self.CONFIG_VERSION)
-        self.config_file_version = res
+        handshake = self._get_handshake()
+        if 'config' not in handshake:
+            handshake['config'] = self.get_config_value(self.CONFIG_VERSION)
+        self.config_file_version = handshake['config']
         return self.config_file_version
 
     def get_steps_per_mm(self, axis):
         if axis.lower() not in 'xyz':
             raise ValueError('Axis {} not supported'.format(axis))
+        return self.get_all_steps_per_mm()[axis.lower()]
 
-        res = self.send_command(self.STEPS_PER_MM)
-        self.wait_for_response()  # extra b'ok' sent from smoothie after M92
-        try:
-            value = json.loads(res.decode())[self.STEPS_PER_MM][axis.upper()]
-            return float(value)
-        except Exception:
-            raise RuntimeError(
-                '{0}: {1}'.format(self.SMOOTHIE_ERROR, res))
+    def get_all_steps_per_mm(self):
+        """
+        Returns the steps per mm of the x, y and z axis,
+        read with a single M92
+        """
+        handshake = self._get_handshake()
+        if 'steps_per_mm' not in handshake:
+            with self.arbiter.link():
+                res = self.send_command(self.STEPS_PER_MM)
+                # extra b'ok' sent from smoothie after M92
+                self.wait_for_response()
+            try:
+                response = json.loads(res.decode())[self.STEPS_PER_MM]
+                handshake['steps_per_mm'] = {
+                    axis: float(response[axis.upper()]) for axis in 'xyz'
+                }
+            except Exception:
+                raise RuntimeError(
+                    '{0}: {1}'.format(self.SMOOTHIE_ERROR, res))
+        return dict(handshake['steps_per_mm'])
 
     def set_steps_per_mm(self, axis, value):
         if axis.lower() not in 'xyz':
             raise ValueError('Axis {} not supported'.format(axis))
 
-        res = self.send_command(self.STEPS_PER_MM, **{axis.upper(): value})
-        self.wait_for_response()  # extra b'ok' sent from smoothie after M92
+        with self.arbiter.link():
+            res = self.send_command(
+                self.STEPS_PER_MM, **{axis.upper(): value})
+            # extra b'ok' sent from smoothie after M92
+            self.wait_for_response()
+        self._get_handshake().pop('steps_per_mm', None)
 
         key = self.CONFIG_STEPS_PER_MM[axis.lower()]
         try:
@@ -692,6 +893,8 @@ class CNCDriver(object):
         return res
 
     def set_config_value(self, key, value):
+        # versions are read from the config
+        self._handshakes = {}
         success = True
         if not self.ignore_smoothie_sd:
             command = '{0} {1} {2}'.format(self.CONFIG_SET, key, value)
@@ -703,14 +906,19 @@ class CNCDriver(object):
         return success
 
     def get_endstop_switches(self):
-        first_line = self.send_command(self.GET_ENDSTOPS)
-        second_line = self.wait_for_response()
+        if self._use_state_cache('switches'):
+            return copy.deepcopy(self._state_cache['switches'])
+
+        with self.arbiter.link():
+            first_line = self.send_command(self.GET_ENDSTOPS)
+            second_line = self.wait_for_response()
         if second_line == b'ok':
             res = json.loads(first_line.decode())
             res = res.get(self.GET_ENDSTOPS)
             obj = {}
             for axis in 'xyzab':
                 obj[axis] = bool(res.get('min_' + axis))
+            self._state_cache['switches'] = copy.deepcopy(obj)
             return obj
         else:
             return False
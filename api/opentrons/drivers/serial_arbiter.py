@@ -0,0 +1,116 @@
+"""
+Arbitration of the serial link between threads.
+
+The server drives the robot from a background thread while its HTTP
+handlers can query the same smoothie. A request/response exchange on the
+link must not be interleaved with another one, so every exchange is done
+while holding the :class:`SerialArbiter`. Threads waiting for the link are
+served in order of priority: the thread running a protocol (see
+:meth:`SerialArbiter.motion`) first, other requests after it. A waiting
+request is served at the latest after ``MAX_OVERTAKES`` exchanges of higher
+priority, so queries are slowed down but never starved by a run.
+"""
+from contextlib import contextmanager
+import itertools
+import threading
+
+
+MOTION = 0
+QUERY = 10
+
+# times a waiting request can be overtaken before it is served
+MAX_OVERTAKES = 20
+
+
+class _Request(object):
+    __slots__ = ('priority', 'sequence', 'overtaken')
+
+    def __init__(self, priority, sequence):
+        self.priority = priority
+        self.sequence = sequence
+        self.overtaken = 0
+
+    def get_rank(self):
+        if self.overtaken >= MAX_OVERTAKES:
+            return (MOTION - 1, self.sequence)
+        return (self.priority, self.sequence)
+
+
+class SerialArbiter(object):
+    """
+    Reentrant lock of the serial link, granted in order of priority
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._owner = None
+        self._depth = 0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._motion_thread = None
+
+    @contextmanager
+    def link(self, priority=None):
+        """
+        Holds the serial link for the duration of the ``with`` block
+        """
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def motion(self):
+        """
+        Marks the current thread as the one driving the robot for the
+        duration of the ``with`` block, its requests come first
+        """
+        previous = self._motion_thread
+        self._motion_thread = threading.get_ident()
+        try:
+            yield
+        finally:
+            self._motion_thread = previous
+
+    def is_motion_active(self):
+        return self._motion_thread is not None
+
+    def is_motion_thread(self):
+        return self._motion_thread == threading.get_ident()
+
+    def get_priority(self):
+        return MOTION if self.is_motion_thread() else QUERY
+
+    def acquire(self, priority=None):
+        thread = threading.get_ident()
+        with self._condition:
+            if self._owner == thread:
+                self._depth += 1
+                return
+
+            if priority is None:
+                priority = self.get_priority()
+            request = _Request(priority, next(self._sequence))
+            self._waiting.append(request)
+            while self._owner is not None or \
+                    self._get_next_request() is not request:
+                self._condition.wait()
+
+            self._waiting.remove(request)
+            for waiting in self._waiting:
+                if waiting.sequence < request.sequence:
+                    waiting.overtaken += 1
+            self._owner = thread
+            self._depth = 1
+
+    def release(self):
+        with self._condition:
+            if self._owner != threading.get_ident():
+                raise RuntimeError('Serial link released by another thread')
+            self._depth -= 1
+            if self._depth == 0:
+                self._owner = None
+                self._condition.notify_all()
+
+    def _get_next_request(self):
+        return min(self._waiting, key=_Request.get_rank)
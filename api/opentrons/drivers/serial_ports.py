@@ -0,0 +1,128 @@
+"""
+Discovery of the serial ports a robot may be connected to.
+
+Ports are enumerated from the operating system's device metadata (sysfs on
+Linux, IOKit on macOS, the registry on Windows) through
+``serial.tools.list_ports``, which does not open them. Ports whose USB
+vendor and product ids are a Smoothieboard's are listed right away. Other
+ports with a USB-serial like name are opened to check that they can be
+used, concurrently in a thread pool. Results are cached for ``CACHE_TTL``
+seconds, so polling the list does not probe the ports again.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import threading
+import time
+
+import serial
+from serial.tools import list_ports
+
+from opentrons.util.log import get_logger
+
+
+log = get_logger(__name__)
+
+# (vendor id, product id) of Smoothieboards
+SMOOTHIE_USB_IDS = {(0x1d50, 0x6015)}
+
+# ports without known ids are probed if their name contains one of these
+PORT_FILTER = ('usbmodem', 'COM', 'ACM', 'USB')
+
+CACHE_TTL = 2.0
+
+MAX_PROBE_WORKERS = 8
+
+
+def _get_port_name(device):
+    # macOS lists the call-out devices, the robot is used through tty.*
+    if sys.platform.startswith('darwin'):
+        return device.replace('/dev/cu.', '/dev/tty.', 1)
+    return device
+
+
+class PortScanner(object):
+    """
+    Lists the usable serial ports, see :mod:`serial_ports`
+
+    Parameters
+    ----------
+    ttl : float
+        Seconds a result is reused for
+
+    max_workers : int
+        Number of ports probed at once
+    """
+    def __init__(self, ttl=CACHE_TTL, max_workers=MAX_PROBE_WORKERS):
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._ports = None
+        self._scanned_at = 0
+
+    def list_ports(self, refresh=False):
+        """
+        Returns the names of the usable serial ports
+        """
+        with self._lock:
+            if refresh or self._ports is None or \
+                    time.monotonic() - self._scanned_at > self.ttl:
+                self._ports = self._scan()
+                self._scanned_at = time.monotonic()
+            return list(self._ports)
+
+    def clear(self):
+        with self._lock:
+            self._ports = None
+
+    def get_candidates(self):
+        """
+        Returns a list of (port name, needs probing) for every port
+        that may be a robot, without opening any of them
+        """
+        candidates = []
+        for info in list_ports.comports():
+            name = _get_port_name(info.device)
+            if (info.vid, info.pid) in SMOOTHIE_USB_IDS:
+                candidates.append((name, False))
+            elif any(f in name for f in PORT_FILTER):
+                candidates.append((name, True))
+        return candidates
+
+    def probe(self, port):
+        """
+        Returns True if :port: can be opened
+        """
+        try:
+            s = serial.Serial(port)
+            s.close()
+            return True
+        except Exception as e:
+            log.debug('Exception in testing port %s', port)
+            log.debug(e)
+            return False
+
+    def _scan(self):
+        candidates = self.get_candidates()
+        to_probe = [name for name, needs_probe in candidates if needs_probe]
+
+        usable = {}
+        if to_probe:
+            workers = min(self.max_workers, len(to_probe))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(self.probe, to_probe)
+                usable = dict(zip(to_probe, results))
+
+        return [
+            name for name, needs_probe in candidates
+            if not needs_probe or usable[name]
+        ]
+
+
+_scanner = PortScanner()
+
+
+def list_serial_ports(refresh=False):
+    """
+    Returns the names of the usable serial ports, see :class:`PortScanner`
+    """
+    return _scanner.list_ports(refresh=refresh)
@@ -0,0 +1,256 @@
+"""
+Recording and replay of the serial traffic with a smoothie.
+
+:class:`SerialRecorder` wraps the device given to ``CNCDriver.connect`` and
+writes every line sent and read to a session file, with the time it
+happened. :class:`ReplayDevice` plays a session file back as a device: it
+checks that the lines written are the recorded ones and answers them with
+the recorded responses after the recorded latency, divided by ``speed``.
+A run can so be reproduced offline with the timing of the robot it was
+recorded on, or faster. Both are used through :meth:`Robot.connect`::
+
+    robot.connect(port, options={'record': 'session.otsr'})
+    robot.connect(options={'replay': 'session.otsr', 'speed': 10})
+
+Session files start with ``MAGIC``, the format version and the name of the
+recorded port, followed by one record per event: a ``RECORD`` header (event
+kind, microseconds since the previous event, payload size) and the payload.
+"""
+import struct
+import threading
+import time
+
+from opentrons.util.log import get_logger
+
+
+log = get_logger(__name__)
+
+MAGIC = b'OTSR'
+VERSION = 1
+
+HEADER = struct.Struct('<BH')
+RECORD = struct.Struct('<BIH')
+
+WRITE = 1
+READ = 2
+OPEN = 3
+CLOSE = 4
+
+# longest time between two events that can be stored
+MAX_DELTA = 2 ** 32 - 1
+
+
+class ReplayMismatch(RuntimeError):
+    pass
+
+
+def get_device(device):
+    """
+    Returns the device recorded by :device: if it is a
+    :class:`SerialRecorder`, otherwise :device: itself
+    """
+    if isinstance(device, SerialRecorder):
+        return device.device
+    return device
+
+
+def read_session(file_path):
+    """
+    Returns the port name and the events of a session file, as a list
+    of (kind, seconds since the recording started, payload)
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('{} is not a serial session file'.format(file_path))
+    offset = len(MAGIC)
+    version, port_size = HEADER.unpack_from(data, offset)
+    if version != VERSION:
+        raise ValueError(
+            'Unsupported serial session version {}'.format(version))
+    offset += HEADER.size
+    port = data[offset:offset + port_size].decode()
+    offset += port_size
+
+    events = []
+    micros = 0
+    while offset < len(data):
+        kind, delta, size = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        micros += delta
+        events.append((kind, micros / 1e6, data[offset:offset + size]))
+        offset += size
+    return port, events
+
+
+class SerialRecorder(object):
+    """
+    Serial device passing everything to :device:, and recording
+    the lines written to and read from it in :file_path:
+    """
+    def __init__(self, device, file_path):
+        self.device = device
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._file = open(file_path, 'wb')
+        port = str(getattr(device, 'port', '') or '').encode()
+        self._file.write(MAGIC + HEADER.pack(VERSION, len(port)) + port)
+        self._last = time.perf_counter()
+
+    def __getattr__(self, name):
+        return getattr(self.device, name)
+
+    def _record(self, kind, payload=b'', when=None):
+        if when is None:
+            when = time.perf_counter()
+        with self._lock:
+            if self._file is None:
+                return
+            delta = min(MAX_DELTA, max(0, int((when - self._last) * 1e6)))
+            self._last = when
+            self._file.write(RECORD.pack(kind, delta, len(payload)))
+            self._file.write(payload)
+
+    def write(self, data):
+        when = time.perf_counter()
+        result = self.device.write(data)
+        if isinstance(data, str):
+            data = data.encode()
+        self._record(WRITE, data, when)
+        return result
+
+    def readline(self):
+        line = self.device.readline()
+        self._record(READ, line)
+        return line
+
+    def open(self):
+        self.device.open()
+        self._record(OPEN)
+
+    def close(self):
+        self.device.close()
+        self._record(CLOSE)
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def stop(self):
+        """
+        Closes the session file, the device is still used
+        but its traffic is no longer recorded
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class ReplayDevice(object):
+    """
+    Serial device answering with the responses of a session file
+
+    Parameters
+    ----------
+    file_path : str
+        Session file written by :class:`SerialRecorder`
+
+    speed : float
+        Recorded latencies are divided by :speed:, *None*
+        answers right away (Default: 1, the recorded timing)
+
+    timeout : float
+        Seconds :meth:`readline` waits for a response before returning
+        an empty line, like a serial port (Default: 0.1)
+
+    strict : bool
+        If *True*, writing another line than the recorded one raises
+        :class:`ReplayMismatch`, otherwise it is logged (Default: True)
+    """
+    def __init__(self, file_path, speed=1, timeout=0.1, strict=True):
+        self.file_path = file_path
+        self.speed = speed
+        self.timeout = timeout
+        self.strict = strict
+        self.port, events = read_session(file_path)
+        # only the traffic is replayed, opening and closing is not
+        self.events = [event for event in events if event[0] in (WRITE, READ)]
+        self.index = 0
+        self.is_open = False
+        self._anchor = (time.perf_counter(), 0)
+
+    def isOpen(self):
+        return self.is_open
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def get_replay_time(self, seconds):
+        """
+        Returns the seconds that :seconds: of the recording take to replay
+        """
+        return seconds / self.speed if self.speed else 0
+
+    def _get_delay(self, seconds):
+        if not self.speed:
+            return 0
+        real, recorded = self._anchor
+        return real + (seconds - recorded) / self.speed - time.perf_counter()
+
+    def _sleep(self, seconds):
+        if self.speed and seconds > 0:
+            time.sleep(seconds)
+
+    def write(self, data):
+        if not self.is_open:
+            raise RuntimeError('Replay device is not open')
+        if isinstance(data, str):
+            data = data.encode()
+
+        # responses the driver did not read are skipped
+        while self.index < len(self.events) and \
+                self.events[self.index][0] != WRITE:
+            self.index += 1
+        if self.index == len(self.events):
+            raise ReplayMismatch(
+                'Wrote {} past the end of {}'.format(data, self.file_path))
+
+        _, seconds, expected = self.events[self.index]
+        if data != expected:
+            msg = 'Wrote {} instead of {} (event #{})'.format(
+                data, expected, self.index)
+            if self.strict:
+                raise ReplayMismatch(msg)
+            log.warning(msg)
+        self.index += 1
+        # latencies are replayed relative to the write they answer
+        self._anchor = (time.perf_counter(), seconds)
+        return len(data)
+
+    def readline(self):
+        if not self.is_open:
+            raise RuntimeError('Replay device is not open')
+
+        while self.index < len(self.events):
+            kind, seconds, payload = self.events[self.index]
+            if kind != READ:
+                break
+            if not payload:
+                # empty reads are the recorded port timing out
+                self.index += 1
+                continue
+            delay = self._get_delay(seconds)
+            if delay > self.timeout:
+                self._sleep(self.timeout)
+                return b''
+            self._sleep(delay)
+            self.index += 1
+            return payload
+
+        # nothing to read until the next write
+        self._sleep(self.get_replay_time(self.timeout))
+        return b''
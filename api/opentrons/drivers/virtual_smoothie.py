@@ -1,11 +1,16 @@
 import re
 import json
+import math
 
 from opentrons.util import log
 
 log = log.get_logger(__name__)
 
 
+# estimated seconds a real smoothie takes to answer a command
+SERIAL_ROUND_TRIP = 0.01
+
+
 class VirtualSmoothie(object):
     def init_coordinates(self):
         self.coordinates = {
@@ -46,6 +51,41 @@ class VirtualSmoothie(object):
             'F': 60
         }
         self.init_coordinates()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {
+            'commands': 0,
+            'moves': 0,
+            'distance': 0.0,
+            'seconds': 0.0
+        }
+
+    def get_stats(self):
+        """
+        Returns the number of commands and moves received, the distance
+        travelled by the head in mm and an estimate of the seconds a real
+        robot would have spent communicating and moving
+        """
+        return dict(self.stats)
+
+    def _add_move_stats(self, start, end):
+        head_distance = math.sqrt(sum(
+            (end[axis] - start[axis]) ** 2 for axis in 'xyz'))
+        seconds = 0.0
+        if self.speed['head'] > 0:
+            seconds = max(
+                abs(end[axis] - start[axis]) for axis in 'xyz'
+            ) / (self.speed['head'] / 60.0)
+        for axis in 'ab':
+            speed = self.speed['plunger'][axis]
+            if speed > 0:
+                seconds = max(
+                    seconds, abs(end[axis] - start[axis]) / (speed / 60.0))
+
+        self.stats['moves'] += 1
+        self.stats['distance'] += head_distance
+        self.stats['seconds'] += seconds
 
     def isOpen(self):
         return self.is_open
@@ -114,6 +154,7 @@ class VirtualSmoothie(object):
         return 'ok'
 
     def process_move_command(self, arguments):
+        start = dict(self.coordinates['target'])
 
         for axis in arguments.keys():
             if axis.lower() in 'xyzab' and not self.absolute:
@@ -135,6 +176,8 @@ class VirtualSmoothie(object):
             if axis in arguments:
                 self.speed['plunger'][axis.lower()] = arguments[axis]
 
+        self._add_move_stats(start, self.coordinates['target'])
+
         if axis_hit and self.limit_switches:
             return 'ok\n{"limit":"' + axis_hit + '"}'
         return 'ok'
@@ -258,20 +301,21 @@ class VirtualSmoothie(object):
             if command in command_mapping:
                 command_func = command_mapping[command]
                 log.debug(
-                    'Processing {} calling {}'.format(
-                        parsed_command,
-                        command_func.__name__))
+                    'Processing %s calling %s',
+                    parsed_command,
+                    command_func.__name__)
                 message = command_func(arguments)
                 self.insert_response(message)
             else:
-                log.error(
-                    'Command {} is not supported'.format(command))
+                log.error('Command %s is not supported', command)
 
     def write(self, data):
         if not self.isOpen():
             raise Exception('Virtual Smoothie no currently connected')
         if not isinstance(data, str):
             data = data.decode('utf-8')
+        self.stats['commands'] += 1
+        self.stats['seconds'] += SERIAL_ROUND_TRIP
         # make it async later
         self.process_command(data)
 
@@ -0,0 +1,581 @@
+"""
+Planning of :any:`Pipette.transfer`, :any:`Pipette.distribute` and
+:any:`Pipette.consolidate`.
+
+A :class:`TransferPlan` is stored as parallel lists, one entry per step:
+    * ``flags``: :data:`ASPIRATE` and/or :data:`DISPENSE`
+    * ``source_index``: index into ``sources`` of the aspirate, or -1
+    * ``target_index``: index into ``targets`` of the dispense, or -1
+    * ``volume``: volume of the step's aspirate and/or dispense
+
+Each stage (source/target matching, volume gradients, carryover and
+repeater compression) works on these lists as a whole instead of building
+a dict per step, and the steps are only turned into the
+``{'aspirate': {...}, 'dispense': {...}}`` dicts the pipette consumes
+when iterating over the plan.
+
+With ``order='optimize'`` the dispenses of each distribute batch, and the
+aspirates of each consolidate batch, are reordered to shorten the head's
+travel between them (see :meth:`TransferPlan.optimize_order`). Each well
+keeps its own volume and every batch still aspirates and dispenses the same
+total, so only the order in which wells are visited within a batch changes.
+
+For multi-channel pipettes, :func:`group_wells_by_channels` collapses lists
+of individual wells that fill complete rows of a container (``A1`` to
+``H1`` for an 8-channel pipette) into one step per row before planning.
+"""
+import math
+
+from opentrons.containers.placeable import Container, Well, WellSeries
+
+
+ASPIRATE = 1
+DISPENSE = 2
+
+ORDER_OPTIONS = (None, 'optimize')
+
+# upper bound of 2-opt passes over a single batch
+MAX_TWO_OPT_PASSES = 50
+
+
+def _get_list(n):
+    if not hasattr(n, '__len__') or len(n) == 0 or isinstance(n, tuple):
+        n = [n]
+    return n
+
+
+def _get_identity_indices(items):
+    """
+    Returns for each item the index of the first item that is the same
+    object, so that comparing indices is the same as comparing identities
+    """
+    first_index = {}
+    return [
+        first_index.setdefault(id(item), i)
+        for i, item in enumerate(items)
+    ]
+
+
+def _create_source_target_indices(s, t):
+    """
+    Matches sources to targets, repeating the shorter list's items, and
+    returns the (sources, targets, source indices, target indices)
+    """
+    s = _get_list(s)
+    t = _get_list(t)
+    len_s = len(s)
+    len_t = len(t)
+    if len_s < len_t:
+        if (len_t / len_s) % 1 > 0:
+            raise ValueError(
+                'Source and destination lists must be divisible')
+    elif len_s > len_t:
+        if (len_s / len_t) % 1 > 0:
+            raise ValueError(
+                'Source and destination lists must be divisible')
+
+    total = max(len_s, len_t)
+    s_repeat = int(total / len_s)
+    t_repeat = int(total / len_t)
+    s_identity = _get_identity_indices(s)
+    t_identity = _get_identity_indices(t)
+    source_index = [s_identity[i // s_repeat] for i in range(total)]
+    target_index = [t_identity[i // t_repeat] for i in range(total)]
+    return (s, t, source_index, target_index)
+
+
+def _create_volume_list(v, total, gradient=None):
+    if isinstance(v, tuple):
+        return _create_volume_gradient(
+            v[0], v[-1], total, gradient=gradient)
+
+    v = _get_list(v)
+    t_vol = len(v)
+    if (t_vol < total and t_vol != 1) or t_vol > total:
+        raise RuntimeError(
+            '{0} volumes do not match with {1} transfers'.format(
+                t_vol, total))
+    if t_vol < total:
+        v = [v[0]] * total
+    return list(v)
+
+
+def _create_volume_gradient(min_v, max_v, total, gradient=None):
+    diff_vol = max_v - min_v
+    rel_x = [i / (total - 1) for i in range(total)]
+    if gradient:
+        rel_x = [gradient(x) for x in rel_x]
+    return [(rel_y * diff_vol) + min_v for rel_y in rel_x]
+
+
+def _expand_for_carryover(max_vol, source_index, target_index, volume):
+    """
+    Divide volumes larger than maximum volume into separate transfers
+    """
+    max_vol = float(max_vol)
+    volume = [float(v) for v in volume]
+    if all(v <= max_vol for v in volume):
+        return (source_index, target_index, volume)
+
+    new_source_index = []
+    new_target_index = []
+    new_volume = []
+    for s, t, v in zip(source_index, target_index, volume):
+        pieces = []
+        while v > max_vol * 2:
+            pieces.append(max_vol)
+            v -= max_vol
+        if v > max_vol:
+            v /= 2
+            pieces.append(v)
+        pieces.append(v)
+
+        new_source_index.extend([s] * len(pieces))
+        new_target_index.extend([t] * len(pieces))
+        new_volume.extend(pieces)
+    return (new_source_index, new_target_index, new_volume)
+
+
+def _get_groups(key_index, volume, max_vol):
+    """
+    Returns the (start, end) ranges of consecutive steps sharing the same
+    key whose summed volumes fit within the maximum volume
+    """
+    groups = []
+    start = 0
+    group_vol = 0
+    for i, (key, v) in enumerate(zip(key_index, volume)):
+        new_key = key != key_index[start]
+        if i > start and (new_key or v + group_vol > max_vol):
+            groups.append((start, i))
+            start = i
+            group_vol = 0
+        group_vol += v
+    if volume:
+        groups.append((start, len(volume)))
+    return groups
+
+
+def _compress_for_distribute(
+        max_vol, source_index, target_index, volume, disposal_vol=0):
+    """
+    Combines as many dispenses as can fit within the maximum volume
+    """
+    flags = []
+    new_source_index = []
+    new_target_index = []
+    new_volume = []
+    groups = _get_groups(source_index, volume, max_vol - disposal_vol)
+    for start, end in groups:
+        dispenses = end - start
+        aspirate_vol = 0
+        for v in volume[start:end]:
+            aspirate_vol += v
+        if dispenses > 1:
+            aspirate_vol += disposal_vol
+
+        flags.append(ASPIRATE)
+        flags.extend([DISPENSE] * dispenses)
+        new_source_index.append(source_index[start])
+        new_source_index.extend([-1] * dispenses)
+        new_target_index.append(-1)
+        new_target_index.extend(target_index[start:end])
+        new_volume.append(aspirate_vol)
+        new_volume.extend(volume[start:end])
+    return (flags, new_source_index, new_target_index, new_volume)
+
+
+def _compress_for_consolidate(max_vol, source_index, target_index, volume):
+    """
+    Combines as many aspirates as can fit within the maximum volume
+    """
+    flags = []
+    new_source_index = []
+    new_target_index = []
+    new_volume = []
+    groups = _get_groups(target_index, volume, max_vol)
+    for start, end in groups:
+        aspirates = end - start
+        dispense_vol = 0
+        for v in volume[start:end]:
+            dispense_vol += v
+
+        flags.extend([ASPIRATE] * aspirates)
+        flags.append(DISPENSE)
+        new_source_index.extend(source_index[start:end])
+        new_source_index.append(-1)
+        new_target_index.extend([-1] * aspirates)
+        new_target_index.append(target_index[start])
+        new_volume.extend(volume[start:end])
+        new_volume.append(dispense_vol)
+    return (flags, new_source_index, new_target_index, new_volume)
+
+
+def _get_runs(values):
+    """
+    Yields (value, start, end) of every run of equal consecutive values
+    """
+    start = 0
+    for end in range(1, len(values) + 1):
+        if end == len(values) or values[end] != values[start]:
+            yield values[start], start, end
+            start = end
+
+
+def _get_distance(a, b):
+    """
+    Returns the distance between two coordinates in the XY plane, the head
+    always arcs to the same height between wells
+    """
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+def _get_route_length(points, start=None, end=None):
+    route = list(points)
+    if start is not None:
+        route.insert(0, start)
+    if end is not None:
+        route.append(end)
+    return sum(
+        _get_distance(route[i], route[i + 1])
+        for i in range(len(route) - 1))
+
+
+def _order_nearest_neighbour(points, start):
+    """
+    Returns the indices of :points: ordered by always visiting the closest
+    remaining point, ties are visited in their original order
+    """
+    remaining = list(range(len(points)))
+    order = []
+    current = start
+    while remaining:
+        closest = min(
+            remaining, key=lambda i: _get_distance(current, points[i]))
+        remaining.remove(closest)
+        order.append(closest)
+        current = points[closest]
+    return order
+
+
+def _improve_with_two_opt(points, order, start, end=None):
+    """
+    Reverses sections of the route while doing so shortens it, the route
+    always begins at :start: and, if given, finishes at :end:
+    """
+    route = [start] + [points[i] for i in order]
+    order = list(order)
+    if end is not None:
+        route.append(end)
+    last = len(route) - 1 if end is not None else len(route)
+
+    for _ in range(MAX_TWO_OPT_PASSES):
+        improved = False
+        for i in range(1, last - 1):
+            for j in range(i + 1, last):
+                delta = (
+                    _get_distance(route[i - 1], route[j]) -
+                    _get_distance(route[i - 1], route[i]))
+                if j + 1 < len(route):
+                    delta += (
+                        _get_distance(route[i], route[j + 1]) -
+                        _get_distance(route[j], route[j + 1]))
+                if delta < -1e-9:
+                    route[i:j + 1] = reversed(route[i:j + 1])
+                    order[i - 1:j] = reversed(order[i - 1:j])
+                    improved = True
+        if not improved:
+            break
+    return order
+
+
+def _optimize_route(points, start=None, end=None):
+    """
+    Returns the indices of :points: in the order that visits them with the
+    least travel found, going from :start: and/or to :end:
+    """
+    if start is None:
+        if end is None:
+            start = points[0]
+        else:
+            # the shortest route to a fixed end is the reverse of the
+            # shortest route starting from it
+            order = _optimize_route(points[::-1], start=end)
+            return [len(points) - 1 - i for i in reversed(order)]
+
+    order = _order_nearest_neighbour(points, start)
+    order = _improve_with_two_opt(points, order, start, end)
+
+    given = list(range(len(points)))
+    if _get_route_length([points[i] for i in order], start, end) < \
+            _get_route_length(points, start, end):
+        return order
+    return given
+
+
+def _get_row_index(container, cache):
+    """
+    Returns a dict of well id to the container row holding it
+    """
+    key = id(container)
+    if key not in cache:
+        cache[key] = {
+            id(well): row
+            for row in container.rows
+            for well in row
+        }
+    return cache[key]
+
+
+def _is_row_well(location, channels, cache):
+    """
+    Returns True if :location: is a well in a row of :channels: wells
+    """
+    if not isinstance(location, Well) or location.get_parent() is None:
+        return False
+    row = _get_row_index(location.get_parent(), cache).get(id(location))
+    return row is not None and len(row) == channels
+
+
+def _get_channels_location(locations, channels, cache):
+    """
+    Returns the single location an N-channel pipette reaches :locations:
+    with, or *None*
+
+    That is either the location itself if all are the same, or the
+    container row if they are exactly the wells of one row, in order
+    """
+    first = locations[0]
+    if all(loc is first for loc in locations):
+        return first
+    if not isinstance(first, Well) or first.get_parent() is None:
+        return None
+    row = _get_row_index(first.get_parent(), cache).get(id(first))
+    if row is None or len(row) != channels:
+        return None
+    if all(a is b for a, b in zip(row, locations)):
+        return row
+    return None
+
+
+def _is_well_list(location):
+    """
+    Returns True for a list of locations or a whole container, which a
+    single-channel pipette visits well by well
+    """
+    if isinstance(location, WellSeries):
+        return False
+    return isinstance(location, (list, Container))
+
+
+def group_wells_by_channels(volume, source, target, channels):
+    """
+    Collapses consecutive transfers whose wells fill complete container rows
+    into single transfers of an N-channel pipette
+
+    Returns
+    -------
+    The (volume, source, target) to plan with, and the number of
+    transfers of a single well from a row that could not be collapsed
+    """
+    if channels < 2 or isinstance(volume, tuple):
+        return (volume, source, target, 0)
+    if not (_is_well_list(source) or _is_well_list(target)):
+        return (volume, source, target, 0)
+
+    sources, targets, source_index, target_index = \
+        _create_source_target_indices(source, target)
+    total = len(source_index)
+    volumes = _create_volume_list(volume, total)
+
+    cache = {}
+    new_sources = []
+    new_targets = []
+    new_volumes = []
+    single_wells = 0
+    i = 0
+    while i < total:
+        end = i + channels
+        s = None
+        t = None
+        if end <= total and len(set(volumes[i:end])) == 1:
+            s = _get_channels_location(
+                [sources[j] for j in source_index[i:end]], channels, cache)
+            t = _get_channels_location(
+                [targets[j] for j in target_index[i:end]], channels, cache)
+        if s is not None and t is not None:
+            new_sources.append(s)
+            new_targets.append(t)
+            new_volumes.append(volumes[i])
+            i = end
+        else:
+            s = sources[source_index[i]]
+            t = targets[target_index[i]]
+            new_sources.append(s)
+            new_targets.append(t)
+            new_volumes.append(volumes[i])
+            if _is_row_well(s, channels, cache) or \
+                    _is_row_well(t, channels, cache):
+                single_wells += 1
+            i += 1
+
+    if len(new_volumes) == total:
+        return (volume, source, target, single_wells)
+    if not isinstance(volume, list):
+        new_volumes = volume
+    return (new_volumes, new_sources, new_targets, single_wells)
+
+
+class TransferPlan(object):
+    """
+    Steps of a transfer, see the module documentation for the layout
+
+    Iterating over a plan yields each step as a dict with an
+    ``'aspirate'`` and/or a ``'dispense'`` entry, each holding the
+    ``'location'`` and ``'volume'``
+    """
+    def __init__(
+            self, sources, targets, flags, source_index, target_index,
+            volume):
+        self.sources = sources
+        self.targets = targets
+        self.flags = flags
+        self.source_index = source_index
+        self.target_index = target_index
+        self.volume = volume
+
+    def __len__(self):
+        return len(self.flags)
+
+    def __iter__(self):
+        sources = self.sources
+        targets = self.targets
+        for flags, s, t, v in zip(
+                self.flags, self.source_index, self.target_index,
+                self.volume):
+            step = {}
+            if flags & ASPIRATE:
+                step['aspirate'] = {'location': sources[s], 'volume': v}
+            if flags & DISPENSE:
+                step['dispense'] = {'location': targets[t], 'volume': v}
+            yield step
+
+    def has_aspirate(self, i):
+        return bool(self.flags[i] & ASPIRATE)
+
+    def get_locations(self):
+        """
+        Returns the locations visited by the plan, in order
+        """
+        locations = []
+        for flags, s, t in zip(
+                self.flags, self.source_index, self.target_index):
+            if flags & ASPIRATE:
+                locations.append(self.sources[s])
+            if flags & DISPENSE:
+                locations.append(self.targets[t])
+        return locations
+
+    def get_travel_distance(self, get_coordinates):
+        """
+        Returns the XY distance travelled between the plan's locations
+
+        Parameters
+        ----------
+        get_coordinates : callable
+            Returns the deck coordinates of a location
+        """
+        points = [get_coordinates(loc) for loc in self.get_locations()]
+        return _get_route_length(points)
+
+    def optimize_order(self, get_coordinates):
+        """
+        Reorders the dispenses of every distribute batch and the aspirates
+        of every consolidate batch to shorten the travel between them
+
+        The dispenses following an aspirate are routed starting from the
+        aspirated well, and the aspirates preceding a dispense are routed
+        towards the dispensed well, using a nearest-neighbour route
+        improved with 2-opt. Single transfers have nothing to reorder.
+
+        Parameters
+        ----------
+        get_coordinates : callable
+            Returns the deck coordinates of a location
+
+        Returns
+        -------
+        The travel distance before and after the reordering
+        """
+        source_coordinates = {}
+        target_coordinates = {}
+
+        def _get_point(flags, i):
+            if flags & DISPENSE:
+                index, locations, cache = (
+                    self.target_index[i], self.targets, target_coordinates)
+            else:
+                index, locations, cache = (
+                    self.source_index[i], self.sources, source_coordinates)
+            if index not in cache:
+                cache[index] = get_coordinates(locations[index])
+            return cache[index]
+
+        before = self.get_travel_distance(get_coordinates)
+        total = len(self.flags)
+        for flags, i, end in _get_runs(self.flags):
+            if flags not in (ASPIRATE, DISPENSE) or end - i < 2:
+                continue
+            points = [_get_point(flags, j) for j in range(i, end)]
+            start_point = None
+            end_point = None
+            if flags == DISPENSE and i > 0:
+                start_point = _get_point(ASPIRATE, i - 1)
+            if flags == ASPIRATE and end < total:
+                end_point = _get_point(DISPENSE, end)
+            order = _optimize_route(points, start_point, end_point)
+            for attr in ('source_index', 'target_index', 'volume'):
+                values = getattr(self, attr)
+                values[i:end] = [values[i + j] for j in order]
+        after = self.get_travel_distance(get_coordinates)
+        return (before, after)
+
+
+def create_transfer_plan(volume, source, target, max_vol, **kwargs):
+    """
+    Returns the :class:`TransferPlan` for moving :volume: from :source: to
+    :target: with a pipette holding up to :max_vol:
+
+    Accepts the same keyword arguments as :any:`Pipette.transfer`
+    (``mode``, ``gradient``, ``carryover``, ``divide``, ``disposal_vol``),
+    the visiting ``order`` is applied by :meth:`TransferPlan.optimize_order`
+    """
+    if kwargs.get('order', None) not in ORDER_OPTIONS:
+        raise ValueError(
+            'Unknown "order" option: {}'.format(kwargs.get('order')))
+
+    sources, targets, source_index, target_index = \
+        _create_source_target_indices(source, target)
+    volume = _create_volume_list(
+        volume, len(target_index), gradient=kwargs.get('gradient', None))
+
+    if kwargs.get('divide', True) and kwargs.get('carryover', True):
+        source_index, target_index, volume = _expand_for_carryover(
+            max_vol, source_index, target_index, volume)
+
+    max_vol = float(max_vol)
+    mode = kwargs.get('mode', 'transfer')
+    if mode == 'distribute':
+        flags, source_index, target_index, volume = \
+            _compress_for_distribute(
+                max_vol, source_index, target_index, volume,
+                disposal_vol=kwargs.get('disposal_vol', 0))
+    elif mode == 'consolidate':
+        flags, source_index, target_index, volume = \
+            _compress_for_consolidate(
+                max_vol, source_index, target_index, volume)
+    else:
+        flags = [ASPIRATE | DISPENSE] * len(volume)
+
+    return TransferPlan(
+        sources, targets, flags, source_index, target_index, volume)
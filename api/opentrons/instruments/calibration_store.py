@@ -0,0 +1,273 @@
+"""
+Process-wide store of instrument calibrations.
+
+The ``CALIBRATIONS_FILE`` is parsed once and kept in memory, keyed by each
+instrument's ``calibration_key``. Updating an instrument marks its entry as
+dirty, and dirty entries are written together by a background timer
+``WRITE_DELAY`` seconds after the first change, so a burst of calibrations
+only rewrites the file once. The file is replaced atomically (written to a
+temporary file, then renamed) and all pending writes are flushed when the
+process exits, or by calling :func:`flush`.
+
+Vectors are saved as ``{"__vector__": [x, y, z]}`` since version 2 of the
+file format. Version 1 files, which saved them as JSON strings, are still
+read and are written back as version 2.
+
+If the file is changed by somebody else it is read again on the next
+access, keeping the entries that were changed here but not yet written.
+"""
+import atexit
+import copy
+import json
+import os
+import tempfile
+import threading
+
+from opentrons.util import environment
+from opentrons.util.log import get_logger
+from opentrons.util.vector import Vector
+
+
+log = get_logger(__name__)
+
+# 2: vectors are type-tagged dicts instead of JSON strings
+CALIBRATION_DATA_VERSION = 2
+
+# seconds between the first change and writing the file
+WRITE_DELAY = 0.5
+
+VECTOR_TAG = '__vector__'
+
+
+def encode_vectors(obj):
+    """
+    Returns a copy of :obj: where every :any:`Vector` is replaced by
+    its type-tagged JSON representation
+    """
+    if isinstance(obj, Vector):
+        return {VECTOR_TAG: list(obj.to_tuple())}
+    if isinstance(obj, dict):
+        return {key: encode_vectors(val) for key, val in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [encode_vectors(val) for val in obj]
+    return obj
+
+
+def decode_vectors(obj, version=CALIBRATION_DATA_VERSION):
+    """
+    Reverses :func:`encode_vectors`, in place for dicts
+
+    Data of version 1 files has its vectors saved as JSON strings
+    """
+    if isinstance(obj, dict):
+        if len(obj) == 1 and VECTOR_TAG in obj:
+            return Vector(obj[VECTOR_TAG])
+        for key, val in obj.items():
+            obj[key] = decode_vectors(val, version)
+    elif isinstance(obj, list):
+        return [decode_vectors(val, version) for val in obj]
+    elif version == 1 and isinstance(obj, str) and obj.startswith('{"x"'):
+        try:
+            return Vector(json.loads(obj))
+        except ValueError:
+            pass
+    return obj
+
+
+class CalibrationStore(object):
+    """
+    In-memory copy of one calibrations file
+
+    Parameters
+    ----------
+    file_path : str
+        The calibrations file, created if missing
+    """
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._lock = threading.RLock()
+        # calibration key -> persisted attributes, with Vectors
+        self._data = None
+        # calibration key -> JSON-ready copy of the persisted attributes
+        self._encoded = {}
+        self._dirty = set()
+        self._timer = None
+        # os.stat() of the file when it was last read or written
+        self._file_stat = None
+
+    def get(self, key):
+        """
+        Returns a copy of the attributes saved under :key:,
+        or *None* if there are none
+        """
+        with self._lock:
+            self._load()
+            attributes = self._data.get(key)
+            return copy.deepcopy(attributes)
+
+    def get_all(self):
+        """
+        Returns a copy of all saved attributes
+        """
+        with self._lock:
+            self._load()
+            return copy.deepcopy(self._data)
+
+    def set(self, key, attributes):
+        """
+        Saves a copy of :attributes: under :key:, the file is written
+        in the background
+        """
+        with self._lock:
+            self._load()
+            self._data[key] = copy.deepcopy(attributes)
+            self._dirty.add(key)
+            self._schedule_write()
+
+    def clear(self):
+        """
+        Forgets all calibrations and writes an empty file right away
+        """
+        with self._lock:
+            self._data = {}
+            self._encoded = {}
+            self._dirty = set()
+            self._write()
+
+    def is_dirty(self):
+        with self._lock:
+            return bool(self._dirty)
+
+    def flush(self):
+        """
+        Writes pending changes to the file now
+        """
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            if self._dirty:
+                self._write()
+
+    def _schedule_write(self):
+        if self._timer:
+            return
+        self._timer = threading.Timer(WRITE_DELAY, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _get_file_stat(self):
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _load(self):
+        """
+        Reads the file if it was not read yet or was changed by somebody
+        else, keeping the entries that were not written yet
+        """
+        file_stat = self._get_file_stat()
+        if self._data is not None and file_stat == self._file_stat:
+            return
+
+        pending = {key: self._data[key] for key in self._dirty} \
+            if self._data else {}
+
+        version, data = self._read()
+        if data is None:
+            self._data = {}
+            self._encoded = {}
+            self._write()
+        elif version == CALIBRATION_DATA_VERSION:
+            self._encoded = data
+            self._data = decode_vectors(copy.deepcopy(data))
+            self._file_stat = file_stat
+        else:
+            # rewritten in the current format with the next change
+            self._data = decode_vectors(data, version)
+            self._encoded = encode_vectors(self._data)
+            self._file_stat = file_stat
+
+        self._data.update(pending)
+        self._dirty = set(pending)
+        if self._dirty:
+            self._schedule_write()
+
+    def _read(self):
+        """
+        Returns the version and the saved data, the data is *None* if the
+        file is missing or invalid
+        """
+        try:
+            with open(self.file_path) as f:
+                file = json.load(f)
+        except FileNotFoundError:
+            return None, None
+        except ValueError as e:
+            log.error(
+                'Error parsing calibration data (file: {}): {}'.format(
+                    self.file_path, e))
+            return None, None
+
+        if not isinstance(file, dict) or len(file.keys()) != 2:
+            return None, None
+        version = file.get('version')
+        data = file.get('data')
+        if not version or not isinstance(data, dict):
+            return None, None
+        return version, data
+
+    def _write(self):
+        for key in self._dirty:
+            if key in self._data:
+                self._encoded[key] = encode_vectors(self._data[key])
+        self._dirty = set()
+
+        dir_path = os.path.dirname(self.file_path)
+        if not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+        fd, tmp_path = tempfile.mkstemp(dir=dir_path)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    'version': CALIBRATION_DATA_VERSION,
+                    'data': self._encoded
+                }, f)
+            os.replace(tmp_path, self.file_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        self._file_stat = self._get_file_stat()
+
+
+# file path -> CalibrationStore
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_calibration_store():
+    """
+    Returns the store of the current ``CALIBRATIONS_FILE``
+    """
+    file_path = environment.get_path('CALIBRATIONS_FILE')
+    with _stores_lock:
+        store = _stores.get(file_path)
+        if store is None:
+            store = CalibrationStore(file_path)
+            _stores[file_path] = store
+        return store
+
+
+def flush():
+    """
+    Writes the pending changes of every store
+    """
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
+
+
+atexit.register(flush)
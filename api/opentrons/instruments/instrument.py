@@ -1,10 +1,8 @@
 import copy
-import json
 import os
-import sys
 
 from opentrons.containers.calibrator import Calibrator
-from opentrons.util.vector import (Vector, VectorEncoder)
+from opentrons.instruments import calibration_store
 from opentrons.util import environment
 from opentrons.robot.command import Command
 from opentrons import Robot
@@ -12,13 +10,6 @@ from opentrons import Robot
 from opentrons.util.log import get_logger
 
 
-JSON_ERROR = None
-if sys.version_info > (3, 4):
-    JSON_ERROR = ValueError
-else:
-    JSON_ERROR = json.decoder.JSONDecodeError
-
-
 log = get_logger(__name__)
 
 
@@ -31,13 +22,25 @@ class Instrument(object):
     and gives access to some common methods across instruments
     """
 
-    calibration_data_version = 1
-
     calibration_key = "unique_name"
     persisted_attributes = []
     persisted_defaults = {}
 
-    calibrator = Calibrator(Robot()._deck, {})
+    _calibrator = None
+
+    @property
+    def calibrator(self):
+        """
+        The instrument's :any:`Calibrator`, an uncalibrated one on the
+        robot's deck until the instrument sets its own
+        """
+        if self._calibrator is None:
+            self._calibrator = Calibrator(Robot()._deck, {})
+        return self._calibrator
+
+    @calibrator.setter
+    def calibrator(self, calibrator):
+        self._calibrator = calibrator
 
     def reset(self):
         """
@@ -57,7 +60,19 @@ class Instrument(object):
         """
         pass
 
-    def create_command(self, do, setup=None, description=None, enqueue=True):
+    def teardown_run(self):
+        """
+        Placeholder for instruments to save their state once a run ended,
+        called even if one of its commands failed
+        """
+        pass
+
+    def create_command(self,
+                       do,
+                       setup=None,
+                       description=None,
+                       enqueue=True,
+                       ir=None):
         """
         Creates an instance of Command to be appended to the
         :any:`Robot` run queue.
@@ -81,6 +96,10 @@ class Instrument(object):
             :any:`run` or :any:`simulate`. If set to `False`, the
             method will skip the command queue and execute immediately
 
+        ir : tuple
+            The `(opcode, axis, args, kwargs)` call that re-creates this
+            command, used by :any:`export_ir` (Default: `None`)
+
         Examples
         --------
         ..
@@ -98,7 +117,8 @@ class Instrument(object):
         hello world
         """
 
-        command = Command(do=do, setup=setup, description=description)
+        command = Command(
+            do=do, setup=setup, description=description, ir=ir)
 
         if enqueue:
             Robot().add_command(command)
@@ -123,24 +143,13 @@ class Instrument(object):
             for key in attributes:
                 self.persisted_defaults[key] = copy.copy(getattr(self, key))
 
-        if not os.path.isfile(self._get_calibration_file_path()):
-            self._write_blank_calibrations_file()
-
     def update_calibrations(self):
         """
-        Saves the instrument's peristed attributes to file
+        Saves the instrument's peristed attributes, the calibrations file
+        is written in the background (see :mod:`calibration_store`)
         """
-        last_persisted_data = self._read_calibrations()
-
-        last_persisted_data['data'][self.calibration_key] = (
-            self._strip_vector(
-                self._build_calibration_data())
-        )
-
-        last_persisted_data = self._strip_vector(last_persisted_data)
-
-        with open(self._get_calibration_file_path(), 'w') as f:
-            f.write(json.dumps(last_persisted_data, indent=4))
+        self._get_calibration_store().set(
+            self.calibration_key, self._build_calibration_data())
 
     def load_persisted_data(self):
         """
@@ -148,7 +157,6 @@ class Instrument(object):
         """
         last_persisted_data = self._get_calibration()
         if last_persisted_data:
-            last_persisted_data = self._restore_vector(last_persisted_data)
             for key, val in last_persisted_data.items():
                 setattr(self, key, val)
 
@@ -165,17 +173,13 @@ class Instrument(object):
         """
         Deletes the entire calibrations file
         """
+        self._get_calibration_store().flush()
         file_path = self._get_calibration_file_path()
         if os.path.exists(file_path):
             os.remove(file_path)
 
     def _write_blank_calibrations_file(self):
-        self._delete_calibration_file()
-        with open(self._get_calibration_file_path(), 'w') as f:
-            f.write(json.dumps({
-                'version': self.calibration_data_version,
-                'data': {}
-            }))
+        self._get_calibration_store().clear()
 
     def _get_calibration_file_path(self):
         """
@@ -183,12 +187,14 @@ class Instrument(object):
         """
         return environment.get_path('CALIBRATIONS_FILE')
 
+    def _get_calibration_store(self):
+        return calibration_store.get_calibration_store()
+
     def _get_calibration(self):
         """
         :return: this instrument's saved calibrations data
         """
-        data = self._read_calibrations()['data']
-        return data.get(self.calibration_key)
+        return self._get_calibration_store().get(self.calibration_key)
 
     def _build_calibration_data(self):
         """
@@ -201,72 +207,14 @@ class Instrument(object):
 
     def _read_calibrations(self):
         """
-        Reads calibration data from file system.
-        Expects a valid valibration format
-        :return: json of calibration data
-        """
-        file_path = self._get_calibration_file_path()
-        self._validate_calibration_file(file_path)
-        loaded_json = ""
-        with open(file_path) as f:
-            loaded_json = json.load(f)
-
-        return self._restore_vector(loaded_json)
-
-    def _validate_calibration_file(self, file_path):
-        """
-        Read calibration file, and checks for version number
-        If no version number, file is replaced with version number
-        """
-        valid = False
-        with open(file_path) as f:
-            try:
-                file = json.load(f)
-                version = file.get('version')
-                data = file.get('data')
-                if version and data and len(file.keys()) == 2:
-                    valid = True
-            except json.decoder.JSONDecodeError as e:
-                log.error(
-                    'Error parsing calibration data (file: {}): {}'.format(
-                        file_path, e))
-
-        if not valid:
-            self._write_blank_calibrations_file()
-
-    def _strip_vector(self, obj, root=True):
-        """
-        Iterates through a dictionary, converting Vector classes
-        to serializable dictionaries
-        :return: json of calibration data
-        """
-        obj = (copy.deepcopy(obj) if root else obj)
-        for key, val in obj.items():
-            if isinstance(val, Vector):
-                res = json.dumps(val, cls=VectorEncoder)
-                obj[key] = res
-            elif isinstance(val, dict):
-                self._strip_vector(val, root=False)
-
-        return obj
-
-    def _restore_vector(self, obj, root=True):
-        """
-        Iterates through a dictionary, converting serializable
-        Vector dictionaries to Vector classes
+        Reads calibration data, replacing a missing or invalid
+        calibrations file with an empty one
         :return: json of calibration data
         """
-        obj = (copy.deepcopy(obj) if root else obj)
-        for key, val in obj.items():
-            if isinstance(val, dict):
-                self._restore_vector(val, root=False)
-            elif isinstance(val, str):
-                try:
-                    res = Vector(json.loads(val))
-                    obj[key] = res
-                except JSON_ERROR:
-                    pass
-        return obj
+        return {
+            'version': calibration_store.CALIBRATION_DATA_VERSION,
+            'data': self._get_calibration_store().get_all()
+        }
 
     @property
     def robot(self):
@@ -61,7 +61,8 @@ class Magbead(Instrument):
             do=_do,
             setup=_setup,
             description=_description,
-            enqueue=enqueue)
+            enqueue=enqueue,
+            ir=('engage', self.axis, (), {}))
 
         return self
 
@@ -91,7 +92,8 @@ class Magbead(Instrument):
             do=_do,
             setup=_setup,
             description=_description,
-            enqueue=enqueue)
+            enqueue=enqueue,
+            ir=('disengage', self.axis, (), {}))
 
         return self
 
@@ -116,6 +118,7 @@ class Magbead(Instrument):
         def _do():
             self.motor.wait(seconds)
 
+        _ir = ('delay', self.axis, (seconds, minutes), {})
         minutes += int(seconds / 60)
         seconds = int(seconds % 60)
         _description = "Delaying {} minutes and {} seconds".format(
@@ -125,7 +128,8 @@ class Magbead(Instrument):
             do=_do,
             setup=_setup,
             description=_description,
-            enqueue=enqueue)
+            enqueue=enqueue,
+            ir=_ir)
 
         return self
 
@@ -1,12 +1,73 @@
+from collections import OrderedDict, namedtuple
 import copy
-import itertools
 
 from opentrons import containers
 from opentrons.containers.calibrator import Calibrator
-from opentrons.containers.placeable import Placeable, WellSeries, Container
+from opentrons.containers.placeable import (
+    Placeable, WellSeries, Container, Well
+)
 from opentrons.containers.placeable import humanize_location
 from opentrons.instruments.instrument import Instrument
-from opentrons.helpers import helpers
+from opentrons.instruments import tip_tracker
+from opentrons.helpers.transfer_plan import (
+    create_transfer_plan, group_wells_by_channels
+)
+from opentrons.util.log import get_logger
+
+
+log = get_logger(__name__)
+
+# number of location changes kept in Pipette.placeables
+PLACEABLES_HISTORY_SIZE = 1000
+
+PLUNGER_POSITIONS = ('top', 'bottom', 'blow_out', 'drop_tip')
+
+
+class PlungerTable(namedtuple(
+        'PlungerTable', PLUNGER_POSITIONS + ('mm_per_ul',))):
+    """
+    Immutable snapshot of a pipette's plunger calibration
+
+    Positions that are not calibrated are *None*, as is ``mm_per_ul``
+    (the plunger travel per uL) while top or bottom are not calibrated
+    """
+    __slots__ = ()
+
+    @classmethod
+    def create(cls, positions, max_volume):
+        def _get_value(position):
+            value = positions.get(position)
+            if isinstance(value, (int, float, complex)):
+                return value
+            return None
+
+        values = [_get_value(position) for position in PLUNGER_POSITIONS]
+        top, bottom = values[:2]
+        mm_per_ul = None
+        if top is not None and bottom is not None and max_volume:
+            mm_per_ul = (bottom - top) / max_volume
+        return cls(*values, mm_per_ul=mm_per_ul)
+
+    def get_position(self, position):
+        """
+        Returns the calibrated coordinate of :position:
+
+        Raises RuntimeError if it has not been calibrated
+        """
+        value = getattr(self, position)
+        if value is None:
+            raise RuntimeError(
+                'Plunger position "{}" not yet calibrated'.format(position))
+        return value
+
+    def get_volume_position(self, volume):
+        """
+        Returns the plunger coordinate holding :volume: uL
+        """
+        if self.mm_per_ul is None:
+            self.get_position('top')
+            self.get_position('bottom')
+        return self.bottom - volume * self.mm_per_ul
 
 
 class Pipette(Instrument):
@@ -51,6 +112,11 @@ class Pipette(Instrument):
     dispense_speed : int
         The speed (in mm/minute) the plunger will move while dispensing
         (Default: 500)
+    persist_tips : bool
+        If `True`, the tips used while running on a robot are saved, and
+        the next runs continue from the first unused tip instead of
+        starting with full tip racks (see :meth:`refill_tip_racks`)
+        (Default: `False`)
 
     Returns
     -------
@@ -78,7 +144,8 @@ class Pipette(Instrument):
             trash_container=None,
             tip_racks=[],
             aspirate_speed=300,
-            dispense_speed=500):
+            dispense_speed=500,
+            persist_tips=False):
 
         self.axis = axis
         self.channels = channels
@@ -92,6 +159,7 @@ class Pipette(Instrument):
         self.trash_container = trash_container
         self.tip_racks = tip_racks
         self.starting_tip = None
+        self.persist_tips = persist_tips
 
         # default mm above tip to execute drop-tip
         # this gives room for the drop-tip mechanism to work
@@ -102,8 +170,14 @@ class Pipette(Instrument):
         self.robot.add_instrument(self.axis, self)
 
         self.placeables = []
+        self.used_containers = OrderedDict()
+        self.used_wells = OrderedDict()
         self.previous_placeable = None
         self.current_volume = 0
+        # part of current_volume that was aspirated by `air_gap`
+        self.air_volume = 0
+        # set by `air_gap` for the aspirate it queues next
+        self._aspirating_air = False
 
         self.speeds = {
             'aspirate': aspirate_speed,
@@ -142,6 +216,8 @@ class Pipette(Instrument):
             self.max_volume = max_volume
             self.update_calibrations()
 
+        self._update_plunger_table()
+
     def update_calibrator(self):
         self.calibrator = Calibrator(self.robot._deck, self.calibration_data)
 
@@ -151,9 +227,16 @@ class Pipette(Instrument):
         setting current volume to zero, and resetting tip tracking
         """
         self.placeables = []
+        self.used_containers = OrderedDict()
+        self.used_wells = OrderedDict()
         self.previous_placeable = None
         self.current_volume = 0
+        self.air_volume = 0
+        self._aspirating_air = False
         self.reset_tip_tracking()
+        # picks up positions and max_volume changed without
+        # calibrate_plunger or set_max_volume
+        self._update_plunger_table()
 
     def setup_simulate(self, **kwargs):
         """
@@ -165,12 +248,23 @@ class Pipette(Instrument):
         self.positions['bottom'] = 10
         self.positions['blow_out'] = 12
         self.positions['drop_tip'] = 14
+        self._update_plunger_table()
 
     def teardown_simulate(self):
         """
         Re-assigns any previously-calibrated plunger positions
         """
         self.positions = self.calibrated_positions
+        self._update_plunger_table()
+
+    def teardown_run(self):
+        """
+        Saves the tips used by the run with `persist_tips`, once per run
+        rather than after each pick-up
+        """
+        if self.persist_tips and not self.robot.is_simulating():
+            tip_tracker.save_tip_state(
+                self._get_tip_state_key(), self.tip_tracker)
 
     def has_tip_rack(self):
         """
@@ -183,22 +277,38 @@ class Pipette(Instrument):
     def reset_tip_tracking(self):
         """
         Resets the :any:`Pipette` tip tracking, "refilling" the tip racks
+
+        With `persist_tips`, the tip racks are instead restored to the
+        tips left by the last run on a robot
         """
         self.current_tip(None)
-        self.tip_rack_iter = iter([])
+        self.tip_tracker = tip_tracker.TipTracker(
+            self.tip_racks if self.has_tip_rack() else [], self.channels)
 
-        if self.has_tip_rack():
-            iterables = self.tip_racks
+        if self.persist_tips:
+            tip_tracker.load_tip_state(
+                self._get_tip_state_key(), self.tip_tracker)
 
-            if self.channels > 1:
-                iterables = [r for rack in self.tip_racks for r in rack.rows]
-            else:
-                iterables = [w for rack in self.tip_racks for w in rack]
+        if self.starting_tip:
+            self.tip_tracker.start_at(self.starting_tip)
 
-            if self.starting_tip:
-                iterables = iterables[iterables.index(self.starting_tip):]
+    def refill_tip_racks(self):
+        """
+        Forgets the saved tip usage of this :any:`Pipette`, to be called
+        once its tip racks were replaced with full ones
+        """
+        tip_tracker.delete_tip_state(self._get_tip_state_key())
+        self.reset_tip_tracking()
+
+    def tips_remaining(self):
+        """
+        Returns the number of unused tips (or rows of tips for multi-channel
+        pipettes) left in the tip racks
+        """
+        return self.tip_tracker.tips_remaining()
 
-            self.tip_rack_iter = itertools.chain(iterables)
+    def _get_tip_state_key(self):
+        return '{axis}:{name}'.format(axis=self.axis, name=self.name)
 
     def current_tip(self, *args):
         if len(args) and (isinstance(args[0], Placeable) or args[0] is None):
@@ -213,9 +323,8 @@ class Pipette(Instrument):
     def get_next_tip(self):
         next_tip = None
         if self.has_tip_rack():
-            try:
-                next_tip = next(self.tip_rack_iter)
-            except StopIteration as e:
+            next_tip = self.tip_tracker.next_tip()
+            if next_tip is None:
                 raise RuntimeWarning(
                     '{0} has run out of tips'.format(self.name))
         else:
@@ -232,8 +341,46 @@ class Pipette(Instrument):
 
         placeable, _ = containers.unpack_location(location)
         self.previous_placeable = placeable
-        if not self.placeables or (placeable != self.placeables[-1]):
-            self.placeables.append(placeable)
+        if self.placeables and placeable == self.placeables[-1]:
+            return
+
+        self.placeables.append(placeable)
+        # keep only the most recent location changes, trimming in chunks
+        # so appending stays O(1) on average
+        if len(self.placeables) > PLACEABLES_HISTORY_SIZE * 2:
+            del self.placeables[:-PLACEABLES_HISTORY_SIZE]
+
+        if isinstance(placeable, WellSeries):
+            placeable = placeable[0]
+        if placeable in self.used_wells:
+            return
+        if isinstance(placeable, Well):
+            self.used_wells[placeable] = None
+        while placeable is not None and placeable not in self.used_containers:
+            if isinstance(placeable, Container):
+                self.used_containers[placeable] = None
+            placeable = placeable.get_parent()
+
+    def has_used(self, placeable):
+        """
+        Returns *True* if a command was queued at :placeable:,
+        a :any:`Container` or a :any:`Well`, since the last :meth:`reset`
+        """
+        if isinstance(placeable, Container):
+            return placeable in self.used_containers
+        return placeable in self.used_wells
+
+    def get_used_containers(self):
+        """
+        Returns the containers this pipette visits, in order of first use
+        """
+        return list(self.used_containers)
+
+    def get_used_wells(self):
+        """
+        Returns the wells this pipette visits, in order of first use
+        """
+        return list(self.used_wells)
 
     # QUEUEABLE
     def move_to(self,
@@ -358,28 +505,21 @@ class Pipette(Instrument):
                     location = volume
                 volume = self.max_volume - self.current_volume
 
-            if self.current_volume + volume > self.max_volume:
-                raise RuntimeWarning(
-                    'Pipette ({0}) cannot hold volume {1}'
-                    .format(
-                        self.max_volume,
-                        self.current_volume + volume)
-                )
-
             if self.current_volume == 0:
                 plunger_empty = True
+                self.air_volume = 0
             self.current_volume += volume
 
             self._associate_placeable(location)
+            self._track_aspirate(location, volume)
 
         def _do():
             nonlocal volume
             nonlocal location
             nonlocal rate
             nonlocal plunger_empty
-            distance = self._plunge_distance(self.current_volume)
-            bottom = self._get_plunger_position('bottom')
-            destination = bottom - distance
+            destination = self._plunger_table.get_volume_position(
+                self.current_volume)
 
             speed = self.speeds['aspirate'] * rate
 
@@ -392,6 +532,18 @@ class Pipette(Instrument):
         if volume is 0:
             return self
 
+        # validated once, when enqueued, not when the run sets it up
+        if isinstance(volume, (int, float, complex)):
+            held_volume = self.current_volume + volume
+        else:
+            held_volume = self.max_volume
+        if held_volume > self.max_volume:
+            raise RuntimeWarning(
+                'Pipette ({0}) cannot hold volume {1}'
+                .format(self.max_volume, held_volume)
+            )
+        self._check_plunger_volume(held_volume)
+
         _description = "Aspirating {0} {1}".format(
             volume,
             ('at ' + humanize_location(location) if location else '')
@@ -400,7 +552,8 @@ class Pipette(Instrument):
             do=_do,
             setup=_setup,
             description=_description,
-            enqueue=enqueue)
+            enqueue=enqueue,
+            ir=('aspirate', self.axis, (volume, location, rate), {}))
 
         return self
 
@@ -481,12 +634,16 @@ class Pipette(Instrument):
             if volume is None or (self.current_volume - volume < 0):
                 volume = self.current_volume
 
+            # a WellSeries turns into its first well below
+            target = location
+
             if isinstance(location, Placeable):
                 location = location.bottom(1)
 
             self.current_volume -= volume
 
             self._associate_placeable(location)
+            self._track_dispense(target, volume)
 
         def _do():
             nonlocal location
@@ -495,9 +652,8 @@ class Pipette(Instrument):
 
             self.move_to(location, strategy='arc', enqueue=False)
 
-            distance = self._plunge_distance(self.current_volume)
-            bottom = self._get_plunger_position('bottom')
-            destination = bottom - distance
+            destination = self._plunger_table.get_volume_position(
+                self.current_volume)
 
             speed = self.speeds['dispense'] * rate
 
@@ -508,6 +664,12 @@ class Pipette(Instrument):
         if volume is 0:
             return self
 
+        # validated once, when enqueued, not when the run sets it up
+        held_volume = 0
+        if isinstance(volume, (int, float, complex)):
+            held_volume = max(self.current_volume - volume, 0)
+        self._check_plunger_volume(held_volume)
+
         _description = "Dispensing {0} {1}".format(
             volume,
             ('at ' + humanize_location(location) if location else '')
@@ -516,7 +678,8 @@ class Pipette(Instrument):
             do=_do,
             setup=_setup,
             description=_description,
-            enqueue=enqueue)
+            enqueue=enqueue,
+            ir=('dispense', self.axis, (volume, location, rate), {}))
         return self
 
     def _position_for_aspirate(self, location=None, plunger_empty=False):
@@ -532,7 +695,7 @@ class Pipette(Instrument):
 
         # setup the plunger above the liquid
         if plunger_empty:
-            self.motor.move(self._get_plunger_position('bottom'))
+            self.motor.move(self._plunger_table.get_position('bottom'))
 
         # then go inside the location
         if location:
@@ -621,7 +784,8 @@ class Pipette(Instrument):
             do=_do,
             setup=_setup,
             description=_description,
-            enqueue=enqueue)
+            enqueue=enqueue,
+            ir=('comment', None, (_description,), {}))
 
         if not location and self.previous_placeable:
             location = self.previous_placeable
@@ -674,13 +838,14 @@ class Pipette(Instrument):
         """
         def _setup():
             nonlocal location
-            self.current_volume = 0
             self._associate_placeable(location)
+            self._track_dispense(location, self.current_volume)
+            self.current_volume = 0
 
         def _do():
             nonlocal location
             self.move_to(location, strategy='arc', enqueue=False)
-            self.motor.move(self._get_plunger_position('blow_out'))
+            self.motor.move(self._plunger_table.get_position('blow_out'))
 
         _description = "Blowing out {}".format(
             'at ' + humanize_location(location) if location else ''
@@ -689,7 +854,8 @@ class Pipette(Instrument):
             do=_do,
             setup=_setup,
             description=_description,
-            enqueue=enqueue)
+            enqueue=enqueue,
+            ir=('blow_out', self.axis, (location,), {}))
         return self
 
     # QUEUEABLE
@@ -792,7 +958,8 @@ class Pipette(Instrument):
             do=_do,
             setup=_setup,
             description=_description,
-            enqueue=enqueue)
+            enqueue=enqueue,
+            ir=('touch_tip', self.axis, (location, radius), {}))
 
         return self
 
@@ -833,7 +1000,7 @@ class Pipette(Instrument):
         """
 
         def _setup():
-            pass
+            self._aspirating_air = True
 
         def _do():
             pass
@@ -847,7 +1014,8 @@ class Pipette(Instrument):
             do=_do,
             setup=_setup,
             description=_description,
-            enqueue=enqueue)
+            enqueue=enqueue,
+            ir=('comment', None, (_description,), {}))
 
         if height is None:
             height = 20
@@ -911,7 +1079,8 @@ class Pipette(Instrument):
             do=_do,
             setup=_setup,
             description=_description,
-            enqueue=enqueue)
+            enqueue=enqueue,
+            ir=('comment', None, (_description,), {}))
 
         if not self.current_tip():
             self.robot.add_warning(
@@ -932,6 +1101,11 @@ class Pipette(Instrument):
         is passed, the Pipette will pick up the next available tip in
         it's `tip_racks` list (see :any:`Pipette`)
 
+        That tip is chosen again when the command runs. With `persist_tips`
+        a run continues from the tips left by the previous run, so it can
+        pick up other tips than the ones chosen when the commands were
+        enqueued, which the calibration step list was built from.
+
         Parameters
         ----------
         location : :any:`Placeable` or tuple(:any:`Placeable`, :any:`Vector`)
@@ -967,13 +1141,17 @@ class Pipette(Instrument):
         >>> p200.return_tip() # doctest: +ELLIPSIS
         <opentrons.instruments.pipette.Pipette object at ...>
         """
+        tip = location
+
         def _setup():
             nonlocal location
-            if not location:
-                location = self.get_next_tip()
+            # chosen again when the command runs, the tip racks were reset
+            # to the tips left by the last run (see `reset_tip_tracking`)
+            location = tip or self.get_next_tip()
             self.current_tip(None)
             if location:
                 placeable, _ = containers.unpack_location(location)
+                self.tip_tracker.use_tip(placeable)
                 self.current_tip(placeable)
 
             if isinstance(location, Placeable):
@@ -1003,7 +1181,8 @@ class Pipette(Instrument):
             do=_do,
             setup=_setup,
             description=_description,
-            enqueue=enqueue)
+            enqueue=enqueue,
+            ir=('pick_up_tip', self.axis, (location,), {}))
         return self
 
     # QUEUEABLE
@@ -1073,10 +1252,10 @@ class Pipette(Instrument):
             if location:
                 self.move_to(location, strategy='arc', enqueue=False)
 
-            self.motor.move(self._get_plunger_position('drop_tip'))
+            self.motor.move(self._plunger_table.get_position('drop_tip'))
             self.motor.home()
 
-            self.motor.move(self._get_plunger_position('bottom'))
+            self.motor.move(self._plunger_table.get_position('bottom'))
 
         _description = "Drop_tip {}".format(
             ('at ' + humanize_location(location) if location else '')
@@ -1086,7 +1265,8 @@ class Pipette(Instrument):
             do=_do,
             setup=_setup,
             description=_description,
-            enqueue=enqueue)
+            enqueue=enqueue,
+            ir=('drop_tip', self.axis, (location,), {}))
         return self
 
     # QUEUEABLE
@@ -1132,7 +1312,8 @@ class Pipette(Instrument):
             do=_do,
             setup=_setup,
             description=_description,
-            enqueue=enqueue)
+            enqueue=enqueue,
+            ir=('home', self.axis, (), {}))
         return self
 
     # QUEUEABLE
@@ -1265,6 +1446,13 @@ class Pipette(Instrument):
             be passed with the `gradient` keyword argument to create a
             custom curve.
 
+        order : str
+            If `'optimize'`, the dispenses of each :any:`distribute` batch
+            and the aspirates of each :any:`consolidate` batch are reordered
+            to shorten the travel between wells. Each well still receives or
+            gives the same volume. By default wells are visited in the
+            order they are given.
+
         Returns
         -------
 
@@ -1324,6 +1512,7 @@ class Pipette(Instrument):
             nonlocal seconds
             self.motor.wait(seconds)
 
+        _ir = ('delay', self.axis, (seconds, minutes), {})
         minutes += int(seconds / 60)
         seconds = seconds % 60
         _description = "Delaying {} minutes and {} seconds".format(
@@ -1333,7 +1522,8 @@ class Pipette(Instrument):
             do=_do,
             setup=_setup,
             description=_description,
-            enqueue=enqueue)
+            enqueue=enqueue,
+            ir=_ir)
         return self
 
     def calibrate(self, position):
@@ -1411,6 +1601,7 @@ class Pipette(Instrument):
         if drop_tip is not None:
             self.positions['drop_tip'] = drop_tip
 
+        self._update_plunger_table()
         self.update_calibrations()
 
         return self
@@ -1484,10 +1675,25 @@ class Pipette(Instrument):
                 'min volume ({0} < {1})'.format(
                     self.max_volume, self.min_volume))
 
+        self._update_plunger_table()
         self.update_calibrations()
 
         return self
 
+    def _update_plunger_table(self):
+        self._plunger_table = PlungerTable.create(
+            self.positions, self.max_volume)
+
+    def _check_plunger_volume(self, volume):
+        """
+        Validates the volume held after a command, when it is enqueued,
+        so setting it up and running it only look up the plunger position
+        """
+        self._volume_percentage(volume)
+        table = self._plunger_table
+        if table.mm_per_ul is not None and table.mm_per_ul <= 0:
+            self.robot.add_warning('Plunger calibrated incorrectly')
+
     def _get_plunger_position(self, position):
         """
         Returns the calibrated coordinate of a given plunger position
@@ -1552,6 +1758,15 @@ class Pipette(Instrument):
         # Else, single channel pipettes will flatten a multi-dimensional
         # WellSeries into a 1 dimensional list of wells
         if self.channels > 1:
+            # individually listed wells that fill complete rows
+            # are reached in a single step
+            v, s, t, single_wells = group_wells_by_channels(
+                v, s, t, self.channels)
+            if single_wells:
+                self.robot.add_warning(
+                    '{0} transfers {1} wells one at a time, they do not '
+                    'fill complete rows of {2} wells'.format(
+                        self.name, single_wells, self.channels))
             if isinstance(s, WellSeries) and not isinstance(s[0], WellSeries):
                 s = [s]
             if isinstance(t, WellSeries) and not isinstance(t[0], WellSeries):
@@ -1562,29 +1777,67 @@ class Pipette(Instrument):
             if isinstance(t, WellSeries) and isinstance(t[0], WellSeries):
                 t = [well for series in t for well in series]
 
-        # create list of volumes, sources, and targets of equal length
-        s, t = helpers._create_source_target_lists(s, t, **kwargs)
-        total_transfers = len(t)
-        v = helpers._create_volume_list(v, total_transfers, **kwargs)
-
-        transfer_plan = []
-        for i in range(total_transfers):
-            transfer_plan.append({
-                'aspirate': {'location': s[i], 'volume': v[i]},
-                'dispense': {'location': t[i], 'volume': v[i]}
-            })
-
         max_vol = self.max_volume
         max_vol -= kwargs.get('air_gap', 0)  # air
 
-        if kwargs.get('divide', True):
-            transfer_plan = helpers._expand_for_carryover(
-                max_vol, transfer_plan, **kwargs)
+        plan = create_transfer_plan(v, s, t, max_vol, **kwargs)
+
+        if kwargs.get('order') == 'optimize':
+            before, after = plan.optimize_order(
+                self._get_transfer_coordinates)
+            log.info(
+                '%s optimized transfer order, travel %.1fmm -> %.1fmm',
+                self.name, before, after)
+
+        return plan
 
-        transfer_plan = helpers._compress_for_repeater(
-            max_vol, transfer_plan, **kwargs)
+    def _track_aspirate(self, location, volume):
+        """
+        Takes :volume: from :location:, or from the current position if it
+        is *None*, in the robot's liquid tracker, unless it is an air gap
+        """
+        if self._aspirating_air:
+            self._aspirating_air = False
+            self.air_volume += volume
+            return
+        target = location or self.previous_placeable
+        if target and self.robot.liquid_tracker:
+            self.robot.liquid_tracker.aspirate(
+                target, self._get_volume_per_well(target, volume))
+
+    def _track_dispense(self, location, volume):
+        """
+        Adds the liquid part of :volume: to :location:, or to the current
+        position if it is *None*, in the robot's liquid tracker
+        """
+        # air aspirated last is dispensed first
+        air_volume = min(self.air_volume, volume)
+        self.air_volume -= air_volume
+        target = location or self.previous_placeable
+        if target and self.robot.liquid_tracker:
+            self.robot.liquid_tracker.dispense(
+                target,
+                self._get_volume_per_well(target, volume - air_volume))
 
-        return transfer_plan
+    def _get_volume_per_well(self, location, volume):
+        """
+        Returns the volume each well of :location: gives or receives, all
+        channels of a multi-channel pipette share a single well
+        """
+        if isinstance(location, tuple):
+            location = location[0]
+        if isinstance(location, WellSeries):
+            return volume
+        return volume * self.channels
+
+    def _get_transfer_coordinates(self, location):
+        """
+        Returns the calibrated deck coordinates of a transfer location
+        """
+        while isinstance(location, WellSeries):
+            location = location[0]
+        placeable, coordinates = containers.unpack_location(location)
+        return self.calibrator.convert(placeable, coordinates)
 
     def _run_transfer_plan(self, tips, plan, **kwargs):
         enqueue = kwargs.get('enqueue', True)
@@ -1607,7 +1860,7 @@ class Pipette(Instrument):
                     dispense['volume'], dispense['location'], **kwargs)
                 if touch_tip or touch_tip is 0:
                     self.touch_tip(touch_tip, enqueue=enqueue)
-                if step is plan[-1] or plan[i + 1].get('aspirate'):
+                if i + 1 == total_transfers or plan.has_aspirate(i + 1):
                     self._blowout_during_transfer(
                         dispense['location'], **kwargs)
                     tips = self._drop_tip_during_transfer(
@@ -0,0 +1,223 @@
+"""
+Tip tracking for :any:`Pipette`.
+
+A :class:`TipTracker` keeps one integer per tip rack as a bitmap of the
+tips still available (bit ``i`` is the rack's ``i``-th tip, or ``i``-th row
+for multi-channel pipettes), so picking the next tip, marking a tip as used
+and counting the remaining tips do not depend on the number of racks.
+
+The bitmaps of a pipette can be saved to the ``TIP_STATE_FILE`` with
+:func:`save_tip_state` and restored with :func:`load_tip_state`, so racks
+partially used by a run are continued by the next one.
+"""
+import json
+import os
+import tempfile
+
+from opentrons.util import environment
+from opentrons.util.log import get_logger
+
+
+log = get_logger(__name__)
+
+TIP_STATE_VERSION = 1
+
+
+def get_rack_key(rack):
+    """
+    Returns the key a tip rack's state is saved with
+    """
+    parent = rack.get_parent()
+    slot = parent.get_name() if parent else ''
+    return '{0}:{1}:{2}'.format(slot, rack.get_name(), rack.get_type())
+
+
+class TipTracker(object):
+    """
+    Available tips of a pipette's tip racks
+
+    Parameters
+    ----------
+    tip_racks : list
+        The tip rack :any:`Container` objects, used in order
+
+    channels : int
+        Number of channels of the pipette, multi-channel pipettes
+        use a whole row of a rack at once
+    """
+    def __init__(self, tip_racks, channels=1):
+        self.tip_racks = list(tip_racks)
+        self.channels = channels
+
+        self._tips = []
+        for rack in self.tip_racks:
+            if channels > 1:
+                self._tips.append(list(rack.rows))
+            else:
+                self._tips.append(rack.get_children_list())
+
+        # id(tip) -> (rack index, position)
+        self._positions = {
+            id(tip): (i, position)
+            for i, tips in enumerate(self._tips)
+            for position, tip in enumerate(tips)
+        }
+        self._available = [(1 << len(tips)) - 1 for tips in self._tips]
+        self._remaining = sum(len(tips) for tips in self._tips)
+        # racks before this one have no tips left
+        self._rack = 0
+
+    def __len__(self):
+        return self._remaining
+
+    def tips_remaining(self):
+        return self._remaining
+
+    def has_tip(self, tip):
+        """
+        Returns True if :tip: is one of the tracked tips and still available
+        """
+        position = self._positions.get(id(tip))
+        if position is None:
+            return False
+        i, bit = position
+        return bool(self._available[i] >> bit & 1)
+
+    def next_tip(self):
+        """
+        Marks the first available tip as used and returns it,
+        or *None* if no tips are left
+        """
+        while self._rack < len(self._available) and \
+                not self._available[self._rack]:
+            self._rack += 1
+        if self._rack == len(self._available):
+            return None
+
+        available = self._available[self._rack]
+        bit = (available & -available).bit_length() - 1
+        self._available[self._rack] = available & ~(1 << bit)
+        self._remaining -= 1
+        return self._tips[self._rack][bit]
+
+    def use_tip(self, tip):
+        """
+        Marks :tip: as used, returns False if it is not a tracked tip
+        """
+        position = self._positions.get(id(tip))
+        if position is None:
+            return False
+        i, bit = position
+        if self._available[i] >> bit & 1:
+            self._available[i] &= ~(1 << bit)
+            self._remaining -= 1
+        return True
+
+    def start_at(self, tip):
+        """
+        Marks every tip before :tip: as used
+        """
+        position = self._positions.get(id(tip))
+        if position is None:
+            raise ValueError('{0} is not in the tip racks'.format(tip))
+        i, bit = position
+        for rack in range(i):
+            self._available[rack] = 0
+        self._available[i] &= ~((1 << bit) - 1)
+        self._rack = i
+        self._count_remaining()
+
+    def get_state(self):
+        """
+        Returns the available tips as a dict of rack key to bitmap
+        """
+        return {
+            get_rack_key(rack): available
+            for rack, available in zip(self.tip_racks, self._available)
+        }
+
+    def set_state(self, state):
+        """
+        Restores the available tips of the racks found in :state:
+        (see :meth:`get_state`), other racks are left as they are
+        """
+        for i, rack in enumerate(self.tip_racks):
+            available = state.get(get_rack_key(rack))
+            if available is not None:
+                self._available[i] = available & (
+                    (1 << len(self._tips[i])) - 1)
+        self._rack = 0
+        self._count_remaining()
+
+    def _count_remaining(self):
+        self._remaining = sum(
+            bin(available).count('1') for available in self._available)
+
+
+def _get_tip_state_file_path():
+    return environment.get_path('TIP_STATE_FILE')
+
+
+def _read_tip_states():
+    file_path = _get_tip_state_file_path()
+    if not os.path.isfile(file_path):
+        return {}
+    try:
+        with open(file_path) as f:
+            data = json.load(f)
+    except ValueError:
+        log.warning('Ignoring unreadable tip state file {}'.format(file_path))
+        return {}
+    if data.get('version') != TIP_STATE_VERSION:
+        return {}
+    return data.get('data', {})
+
+
+def _write_tip_states(data):
+    """
+    Replaces the tip state file atomically
+    """
+    file_path = _get_tip_state_file_path()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path))
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': TIP_STATE_VERSION, 'data': data}, f)
+        os.replace(tmp_path, file_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def load_tip_state(key, tracker):
+    """
+    Restores the saved state of :tracker:, saved under :key:
+    """
+    state = _read_tip_states().get(key)
+    if state:
+        tracker.set_state({
+            rack_key: int(available, 16)
+            for rack_key, available in state.items()
+        })
+
+
+def save_tip_state(key, tracker):
+    """
+    Saves the state of :tracker: under :key:
+    """
+    data = _read_tip_states()
+    data[key] = {
+        rack_key: '{:x}'.format(available)
+        for rack_key, available in tracker.get_state().items()
+    }
+
+    _write_tip_states(data)
+
+
+def delete_tip_state(key):
+    """
+    Forgets the saved state under :key:
+    """
+    data = _read_tip_states()
+    if key in data:
+        del data[key]
+        _write_tip_states(data)
@@ -1,9 +1,15 @@
 class Command(object):
-    def __init__(self, do=None, setup=None, description=None):
+    def __init__(self, do=None, setup=None, description=None, ir=None):
         assert callable(do)
         self.setup = setup
         self.do = do
         self.description = description
+        # (opcode, target, args, kwargs) used by opentrons.robot.protocol_ir
+        # to re-create this command without pickling its closures
+        self.ir = ir
+        # (filename, line number) of the protocol line that enqueued this
+        # command, set by Robot.add_command
+        self.source = None
 
     def __call__(self):
         if self.setup:
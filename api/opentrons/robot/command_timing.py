@@ -0,0 +1,144 @@
+"""
+Timing of the commands run by :meth:`Robot.run`.
+
+Instrumentation is off by default. With ``robot.command_timing.enabled`` set
+to *True*, each run records for every command:
+
+    * ``setup``: seconds spent in the command's setup (state updates)
+    * ``total``: seconds spent running the command, setup included
+    * ``serial_exchanges``: number of request/response exchanges with the
+      smoothie
+    * ``bytes_sent``: bytes written to the smoothie
+    * ``arrival_wait``: seconds spent polling the smoothie until the head
+      arrived (see ``CNCDriver.wait_for_arrival``)
+
+The values of every command are kept in a bounded list, and aggregated per
+command type (``aspirate``, ``move_to``, ...) and overall in fixed-size
+:class:`~opentrons.util.histogram.Histogram`, so the cost of a command
+does not depend on the length of the run. The data of the last run can be
+exported with :meth:`CommandTiming.to_json` and :meth:`CommandTiming.to_csv`,
+also from another thread while a run records it.
+"""
+from collections import deque, OrderedDict
+import csv
+import io
+import json
+import threading
+import time
+
+from opentrons.util.histogram import Histogram
+
+
+METRICS = ('setup', 'total', 'serial_exchanges', 'bytes_sent', 'arrival_wait')
+
+# values of the last commands kept for exporting
+MAX_RECORDS = 100000
+
+
+def get_command_type(command):
+    """
+    Returns the opcode of :command:, or the first word
+    of its description if it has no IR
+    """
+    if command.ir:
+        return command.ir[0]
+    if command.description:
+        return command.description.split(None, 1)[0].lower()
+    return 'unknown'
+
+
+class CommandTiming(object):
+    """
+    Records the timing of the commands of a run, see :mod:`command_timing`
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        # held while recording a command and while copying the records
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.records = deque(maxlen=MAX_RECORDS)
+            self.histograms = OrderedDict()
+
+    def _get_histograms(self, command_type):
+        histograms = self.histograms.get(command_type)
+        if histograms is None:
+            histograms = OrderedDict(
+                (metric, Histogram()) for metric in METRICS)
+            self.histograms[command_type] = histograms
+        return histograms
+
+    def run_command(self, index, command, driver):
+        """
+        Runs :command: like calling it, recording its timing and
+        the serial traffic of :driver: it caused
+        """
+        exchanges = driver.serial_exchanges
+        bytes_sent = driver.serial_bytes_sent
+        arrival_wait = driver.arrival_wait_seconds
+
+        start = time.perf_counter()
+        if command.setup:
+            command.setup()
+        setup_end = time.perf_counter()
+        command.do()
+        end = time.perf_counter()
+
+        values = (
+            setup_end - start,
+            end - start,
+            driver.serial_exchanges - exchanges,
+            driver.serial_bytes_sent - bytes_sent,
+            driver.arrival_wait_seconds - arrival_wait
+        )
+        command_type = get_command_type(command)
+        with self._lock:
+            self.records.append(
+                (index, command_type, command.description) + values)
+            for histograms in (self._get_histograms(command_type),
+                               self._get_histograms('all')):
+                for histogram, value in zip(histograms.values(), values):
+                    histogram.add(value)
+
+    def get_summary(self):
+        """
+        Returns ``{command type: {metric: histogram summary}}``, with the
+        summary of every command under ``all``
+        """
+        with self._lock:
+            return OrderedDict(
+                (command_type, OrderedDict(
+                    (metric, histogram.as_dict())
+                    for metric, histogram in histograms.items()))
+                for command_type, histograms in self.histograms.items()
+            )
+
+    def _get_records(self):
+        with self._lock:
+            return list(self.records)
+
+    def get_commands(self):
+        """
+        Returns the values recorded for each command as a list of dicts
+        """
+        keys = ('index', 'type', 'description') + METRICS
+        return [
+            OrderedDict(zip(keys, record)) for record in self._get_records()]
+
+    def to_json(self):
+        return json.dumps({
+            'summary': self.get_summary(),
+            'commands': self.get_commands()
+        })
+
+    def to_csv(self):
+        """
+        Returns the values recorded for each command as CSV
+        """
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(('index', 'type', 'description') + METRICS)
+        writer.writerows(self._get_records())
+        return output.getvalue()
@@ -0,0 +1,87 @@
+"""
+Removal of redundant work from a queued protocol.
+
+Queued commands are closures, so they cannot be merged once enqueued.
+Instead redundancy is removed where it can still be seen:
+    * the driver skips moves to the position it is already at, coordinate
+      mode switches to the current mode and head speed changes to the
+      current speed (see ``CNCDriver.peephole``)
+    * :meth:`Robot.move_to` only moves vertically when the head is already
+      above or below the destination, instead of arcing over the deck
+    * :meth:`Robot.run` skips ``move_to`` commands that repeat the previous
+      command (see :func:`get_redundant_commands`)
+
+Aspirates, dispenses and every other command touching a well are always
+run, so the sequence of liquid handling steps is unchanged.
+:func:`get_runtime_report` simulates the protocol with and without these
+optimizations to show what they save. They are off by default, set
+``robot._driver.peephole = True`` to turn them on.
+"""
+import copy
+
+
+def _is_same_argument(arg, previous):
+    # placeables only equal themselves, and comparing a Vector to anything
+    # but a Vector raises, so only compare values of the same type
+    if type(arg) is not type(previous):
+        return False
+    if isinstance(arg, (tuple, list)):
+        return len(arg) == len(previous) and all(
+            _is_same_argument(a, b) for a, b in zip(arg, previous))
+    if isinstance(arg, dict):
+        return arg.keys() == previous.keys() and all(
+            _is_same_argument(arg[key], previous[key]) for key in arg)
+    return arg is previous or arg == previous
+
+
+def _is_same_move(ir, previous_ir):
+    return ir[:2] == previous_ir[:2] and \
+        _is_same_argument(ir[2:], previous_ir[2:])
+
+
+def get_redundant_commands(commands):
+    """
+    Returns the set of indices of the ``move_to`` commands in :commands:
+    that move the same instrument to the same location as the command
+    right before them
+    """
+    redundant = set()
+    previous_ir = None
+    for i, command in enumerate(commands):
+        ir = command.ir
+        if ir and previous_ir and ir[0] == 'move_to' and \
+                _is_same_move(ir, previous_ir):
+            redundant.add(i)
+        previous_ir = ir
+    return redundant
+
+
+def _simulate_with_stats(robot, peephole, coordinates):
+    connection = robot.connections['simulate']
+    connection.coordinates = copy.deepcopy(coordinates)
+    connection.reset_stats()
+
+    robot._driver.peephole = peephole
+    robot.simulate()
+    return connection.get_stats()
+
+
+def get_runtime_report(robot):
+    """
+    Simulates the queued commands of :robot: without and with the peephole
+    optimizations and returns the statistics of both runs, as returned by
+    ``VirtualSmoothie.get_stats``
+
+    Returns
+    -------
+    A dict with the ``before`` and ``after`` statistics
+    """
+    connection = robot.connections['simulate']
+    coordinates = copy.deepcopy(connection.coordinates)
+    peephole = robot._driver.peephole
+    try:
+        before = _simulate_with_stats(robot, False, coordinates)
+        after = _simulate_with_stats(robot, True, coordinates)
+    finally:
+        robot._driver.peephole = peephole
+    return {'before': before, 'after': after}
@@ -0,0 +1,338 @@
+"""
+Compact, versioned intermediate representation (IR) of a protocol.
+
+Instead of pickling the whole :class:`Robot` (deck, every well, instruments
+and all command closures) the IR only stores:
+    * the deck layout, as ``[slot, label, labware type]`` per container
+    * the instruments and the arguments needed to re-create them
+    * a flat list of ``[opcode, axis, args, kwargs]`` commands, where wells
+      are referenced by ``(container index, well index)``
+
+Importing an IR re-creates the containers and instruments on a robot and
+replays the opcodes through the public API, so every command gets its
+``setup`` / ``do`` closures rebuilt locally.
+"""
+from collections import OrderedDict
+import json
+import zlib
+
+from opentrons.containers.placeable import (
+    Container,
+    Deck,
+    Placeable,
+    Slot,
+    Well,
+    WellSeries
+)
+from opentrons.util.vector import Vector
+
+
+IR_VERSION = 1
+
+# prefix used to tell an IR payload apart from a legacy dill payload
+MAGIC = b'OTIR'
+
+ROBOT_OPCODES = {'comment', 'home', 'move_to'}
+INSTRUMENT_OPCODES = {
+    'aspirate',
+    'blow_out',
+    'delay',
+    'disengage',
+    'dispense',
+    'drop_tip',
+    'engage',
+    'home',
+    'pick_up_tip',
+    'touch_tip'
+}
+
+
+class _Encoder(object):
+    """
+    Turns command arguments into JSON-friendly values, replacing
+    placeables with references into the IR's deck layout
+    """
+    def __init__(self, robot):
+        self.containers = []
+        self._container_index = {}
+        self._well_index = {}
+        for slot in robot._deck:
+            for container in slot:
+                self._add_container(container)
+
+    def _add_container(self, container):
+        container_type = container.properties.get('type')
+        if not container_type:
+            raise ValueError(
+                'Container "{}" has no labware type and cannot be '
+                'exported'.format(container.get_name()))
+        self._container_index[container] = len(self.containers)
+        self._well_index[container] = {
+            well: i for i, well in enumerate(container)}
+        self.containers.append([
+            container.get_parent().get_name(),
+            container.get_name(),
+            container_type
+        ])
+
+    def _container_ref(self, container):
+        try:
+            return self._container_index[container]
+        except KeyError:
+            raise ValueError(
+                '{} is not on the robot deck'.format(repr(container)))
+
+    def _well_ref(self, well):
+        container = well.get_parent()
+        index = self._container_ref(container)
+        return [index, self._well_index[container][well]]
+
+    def encode(self, value):
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, Vector):
+            return ['V', list(value)]
+        if isinstance(value, tuple):
+            return ['T', [self.encode(v) for v in value]]
+        if isinstance(value, list):
+            return ['A', [self.encode(v) for v in value]]
+        if isinstance(value, WellSeries):
+            return [
+                'R',
+                value.name,
+                list(value.items.keys()),
+                [self.encode(v) for v in value.values]
+            ]
+        if isinstance(value, Placeable):
+            return self._encode_placeable(value)
+        if hasattr(value, 'axis') and hasattr(value, 'calibration_key'):
+            return ['I', value.axis]
+
+        raise ValueError(
+            'Cannot export value of type {}'.format(type(value).__name__))
+
+    def _encode_placeable(self, placeable):
+        if isinstance(placeable, Deck):
+            return ['D']
+        if isinstance(placeable, Slot):
+            return ['S', placeable.get_name()]
+        if isinstance(placeable, Container):
+            return ['C', self._container_ref(placeable)]
+        if isinstance(placeable, Well):
+            return ['W'] + self._well_ref(placeable)
+
+        raise ValueError('Cannot export {}'.format(repr(placeable)))
+
+
+class _Decoder(object):
+    """
+    Reverses :class:`_Encoder` against the containers loaded on a robot
+    """
+    def __init__(self, robot, containers):
+        self.robot = robot
+        self.containers = containers
+        self._wells = {}
+        self._handlers = {
+            'V': lambda value: Vector(value[1]),
+            'T': lambda value: tuple(self.decode(v) for v in value[1]),
+            'A': lambda value: [self.decode(v) for v in value[1]],
+            'W': lambda value: self._get_well(value[1], value[2]),
+            'C': lambda value: self.containers[value[1]],
+            'S': lambda value: self.robot._deck[value[1]],
+            'D': lambda value: self.robot._deck,
+            'R': self._decode_series,
+            'I': lambda value: self.robot._instruments[value[1].upper()]
+        }
+
+    def _get_well(self, container_index, well_index):
+        wells = self._wells.get(container_index)
+        if wells is None:
+            wells = self.containers[container_index].get_children_list()
+            self._wells[container_index] = wells
+        return wells[well_index]
+
+    def _decode_series(self, value):
+        _, name, keys, values = value
+        values = [self.decode(v) for v in values]
+        series = WellSeries(values, name=name)
+        series.items = OrderedDict(zip(keys, values))
+        return series
+
+    def decode(self, value):
+        if not isinstance(value, list):
+            return value
+
+        tag = value[0]
+        handler = self._handlers.get(tag)
+        if handler is None:
+            raise ValueError('Unknown protocol IR value tag "{}"'.format(tag))
+        return handler(value)
+
+
+def _export_instrument(instrument, encoder):
+    # imported here, opentrons.instruments imports the Robot singleton
+    from opentrons.instruments import Magbead, Pipette
+
+    if isinstance(instrument, Pipette):
+        return ['Pipette', {
+            'axis': instrument.axis,
+            'name': instrument.name,
+            'channels': instrument.channels,
+            'min_volume': instrument.min_volume,
+            'max_volume': instrument.max_volume,
+            'trash_container': encoder.encode(instrument.trash_container),
+            'tip_racks': encoder.encode(list(instrument.tip_racks or [])),
+            'aspirate_speed': instrument.speeds['aspirate'],
+            'dispense_speed': instrument.speeds['dispense'],
+            'persist_tips': instrument.persist_tips,
+            'starting_tip': encoder.encode(instrument.starting_tip)
+        }]
+    if isinstance(instrument, Magbead):
+        return ['Magbead', {
+            'name': instrument.name,
+            'mosfet': instrument.mosfet_index,
+            'container': encoder.encode(instrument.container)
+        }]
+
+    raise ValueError(
+        'Instrument of type {} cannot be exported'.format(
+            type(instrument).__name__))
+
+
+def _import_instrument(instrument_type, options, decoder):
+    from opentrons.instruments import Magbead, Pipette
+
+    if instrument_type == 'Pipette':
+        # max_volume is assigned after __init__ so the sender's value
+        # does not overwrite this robot's persisted calibrations
+        pipette = Pipette(
+            axis=options['axis'],
+            name=options['name'],
+            channels=options['channels'],
+            min_volume=options['min_volume'],
+            trash_container=decoder.decode(options['trash_container']),
+            tip_racks=decoder.decode(options['tip_racks']),
+            aspirate_speed=options['aspirate_speed'],
+            dispense_speed=options['dispense_speed'],
+            persist_tips=options.get('persist_tips', False))
+        pipette.max_volume = options['max_volume']
+        starting_tip = decoder.decode(options['starting_tip'])
+        if starting_tip:
+            pipette.start_at_tip(starting_tip)
+        return pipette
+    if instrument_type == 'Magbead':
+        return Magbead(
+            name=options['name'],
+            mosfet=options['mosfet'],
+            container=decoder.decode(options['container']))
+
+    raise ValueError(
+        'Unknown protocol IR instrument "{}"'.format(instrument_type))
+
+
+def export_protocol(robot):
+    """
+    Returns the IR of the robot's deck, instruments and command queue
+    as a JSON-serializable dict
+
+    Raises ValueError if a command was not created through the
+    public API (e.g. :meth:`Robot.register`) and cannot be represented
+    """
+    encoder = _Encoder(robot)
+
+    instruments = [
+        _export_instrument(instrument, encoder)
+        for _, instrument in robot.get_instruments()
+    ]
+
+    commands = []
+    for command in robot._commands:
+        if not command.ir:
+            raise ValueError(
+                'Command "{}" cannot be exported'.format(command))
+        opcode, axis, args, kwargs = command.ir
+        commands.append([
+            opcode,
+            axis,
+            [encoder.encode(arg) for arg in args],
+            {k: encoder.encode(v) for k, v in kwargs.items()}
+        ])
+
+    return {
+        'version': IR_VERSION,
+        'deck': encoder.containers,
+        'instruments': instruments,
+        'commands': commands
+    }
+
+
+def _replay(robot, opcode, axis, args, kwargs):
+    if axis is None and opcode in ROBOT_OPCODES:
+        if opcode == 'comment':
+            return robot.comment(*args)
+        return getattr(robot, opcode)(*args, enqueue=True, **kwargs)
+
+    if axis is not None and opcode in INSTRUMENT_OPCODES:
+        instrument = robot._instruments[axis.upper()]
+        return getattr(instrument, opcode)(*args, enqueue=True, **kwargs)
+
+    raise ValueError('Unknown protocol IR opcode "{}"'.format(opcode))
+
+
+def import_protocol(robot, ir):
+    """
+    Resets the robot and re-creates the deck, instruments and command queue
+    described by an IR dict returned from :func:`export_protocol`
+    """
+    version = ir.get('version')
+    if version != IR_VERSION:
+        raise ValueError(
+            'Unsupported protocol IR version {0} (expected {1})'.format(
+                version, IR_VERSION))
+
+    robot.reset()
+
+    containers = [
+        robot.add_container(container_type, slot, label)
+        for slot, label, container_type in ir['deck']
+    ]
+    decoder = _Decoder(robot, containers)
+
+    for instrument_type, options in ir['instruments']:
+        _import_instrument(instrument_type, options, decoder)
+
+    for opcode, axis, args, kwargs in ir['commands']:
+        _replay(
+            robot,
+            opcode,
+            axis,
+            [decoder.decode(arg) for arg in args],
+            {k: decoder.decode(v) for k, v in kwargs.items()})
+
+    return robot
+
+
+def is_protocol_ir(data):
+    """
+    Returns *True* if :data: bytes were produced by :func:`dumps`
+    """
+    return data[:len(MAGIC)] == MAGIC
+
+
+def dumps(robot):
+    """
+    Returns the robot's protocol IR as compressed bytes
+    """
+    ir = export_protocol(robot)
+    encoded = json.dumps(ir, separators=(',', ':')).encode()
+    return MAGIC + zlib.compress(encoded)
+
+
+def loads(data, robot):
+    """
+    Loads bytes returned by :func:`dumps` into :robot:
+    """
+    if not is_protocol_ir(data):
+        raise ValueError('Data is not a serialized protocol IR')
+    ir = json.loads(zlib.decompress(data[len(MAGIC):]).decode())
+    return import_protocol(robot, ir)
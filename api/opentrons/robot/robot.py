@@ -1,19 +1,21 @@
 import copy
 import os
+import sys
 from threading import Event
 
-import dill
-import requests
-import serial
-
 from opentrons import containers
 from opentrons.drivers import motor as motor_drivers
+from opentrons.drivers import serial_recorder
 from opentrons.drivers.virtual_smoothie import VirtualSmoothie
+from opentrons.robot import peephole
+from opentrons.robot.command_timing import CommandTiming, get_command_type
 from opentrons.robot.command import Command
+from opentrons.util import metrics
+from opentrons.util import profiler
 from opentrons.util import trace
 from opentrons.util.vector import Vector
 from opentrons.util.log import get_logger
-from opentrons.drivers import virtual_smoothie
+from opentrons.containers.liquid_tracker import LiquidTracker
 from opentrons.helpers import helpers
 from opentrons.util.trace import traceable
 from opentrons.util.singleton import Singleton
@@ -22,6 +24,10 @@ from opentrons.util.environment import settings
 
 log = get_logger(__name__)
 
+COMMANDS_EXECUTED = metrics.counter(
+    'opentrons_commands_executed_total',
+    'Commands run on a real robot')
+
 
 class InstrumentMosfet(object):
     """
@@ -187,6 +193,11 @@ class Robot(object, metaclass=Singleton):
             )
         }
         self._driver = motor_drivers.CNCDriver()
+        # set command_timing.enabled to time the commands of each run
+        self.command_timing = CommandTiming()
+        # set by simulate(profile=True)
+        self.last_profile = None
+        self._running_command = None
         self.reset()
 
     @classmethod
@@ -210,7 +221,7 @@ class Robot(object, metaclass=Singleton):
         """
         Deprecated.
         """
-        del Singleton._instances[cls]
+        Singleton._instances.pop(cls, None)
         robot = Robot.get_instance()
         return robot
 
@@ -233,6 +244,7 @@ class Robot(object, metaclass=Singleton):
 
         self._ingredients = {}  # TODO needs to be discusses/researched
         self._instruments = {}
+        self.liquid_tracker = None
 
         self.axis_homed = {
             'x': False, 'y': False, 'z': False, 'a': False, 'b': False}
@@ -265,6 +277,30 @@ class Robot(object, metaclass=Singleton):
         axis = axis.upper()
         self._instruments[axis] = instrument
 
+    def enable_liquid_tracking(self):
+        """
+        Starts tracking the liquid volume of each well, returns the
+        :class:`LiquidTracker` used to set the starting volumes
+
+        Underflowing or overflowing wells are reported as warnings
+        by :func:`run` and :func:`simulate`.
+
+        Examples
+        --------
+        ..
+        >>> robot.reset() # doctest: +ELLIPSIS
+        <opentrons.robot.robot.Robot object at ...>
+        >>> trough = containers.load('trough-12row', 'A1')
+        >>> tracker = robot.enable_liquid_tracking()
+        >>> tracker.set_volume(trough['A1'], 10000)
+        """
+        if self.liquid_tracker is None:
+            self.liquid_tracker = LiquidTracker()
+        return self.liquid_tracker
+
+    def disable_liquid_tracking(self):
+        self.liquid_tracker = None
+
     def add_warning(self, warning_msg):
         """
         Internal. Add a runtime warning to the queue.
@@ -345,6 +381,8 @@ class Robot(object, metaclass=Singleton):
         -------
         Serial device instance to be supplied to :func:`connect`
         """
+        import serial
+
         try:
             device = serial.Serial(
                 port=port,
@@ -353,8 +391,7 @@ class Robot(object, metaclass=Singleton):
             )
             return device
         except serial.SerialException as e:
-            log.debug(
-                "Error connecting to {}".format(port))
+            log.debug("Error connecting to %s", port)
             log.error(e)
 
         return None
@@ -417,17 +454,33 @@ class Robot(object, metaclass=Singleton):
             if :attr:`port` is set to ``'Virtual Smoothie'``, provide
             the list of options to be passed to :func:`get_virtual_device`
 
+            ``record``: path of a file to record the serial traffic in,
+            ``replay``: path of a recording to connect to instead of
+            :attr:`port`, played back with the recorded timing divided
+            by ``speed`` (see :mod:`opentrons.drivers.serial_recorder`)
+
         Returns
         -------
         ``True`` for success, ``False`` for failure.
         """
+        options = options or {}
         device = None
-        if not port or port == self.VIRTUAL_SMOOTHIE_PORT:
+        if options.get('replay'):
+            device = serial_recorder.ReplayDevice(
+                options['replay'],
+                speed=options.get('speed', 1),
+                timeout=self._driver.serial_timeout)
+        elif not port or port == self.VIRTUAL_SMOOTHIE_PORT:
             device = self.get_virtual_device(
                 port=self.VIRTUAL_SMOOTHIE_PORT, options=options)
         else:
             device = self.get_serial_device(port)
 
+        if device is not None and options.get('record'):
+            device = serial_recorder.SerialRecorder(
+                device, options['record'])
+
+        self._stop_recording()
         res = self._driver.connect(device)
 
         if res:
@@ -435,6 +488,14 @@ class Robot(object, metaclass=Singleton):
 
         return res
 
+    def _stop_recording(self):
+        """
+        Closes the session file of the live connection, if it is recorded
+        """
+        device = self.connections['live']
+        if isinstance(device, serial_recorder.SerialRecorder):
+            device.stop()
+
     def _update_axis_homed(self, *args):
         for a in args:
             for letter in a:
@@ -485,7 +546,10 @@ class Robot(object, metaclass=Singleton):
 
         if kwargs.get('enqueue'):
             description = "Homing Robot"
-            self.add_command(Command(do=_do, description=description))
+            self.add_command(Command(
+                do=_do,
+                description=description,
+                ir=('home', None, args, {})))
         else:
             log.info('Executing: Home now')
             return _do()
@@ -497,13 +561,19 @@ class Robot(object, metaclass=Singleton):
         def _setup():
             pass
 
-        c = Command(do=_do, setup=_setup, description=description)
+        c = Command(
+            do=_do,
+            setup=_setup,
+            description=description,
+            ir=('comment', None, (description,), {}))
         self.add_command(c)
 
     def add_command(self, command):
 
         if command.description:
-            log.info("Enqueuing: {}".format(command.description))
+            log.info("Enqueuing: %s", command.description)
+        # only resolved while a profiler is running
+        command.source = profiler.get_protocol_source(sys._getframe(1))
         if command.setup:
             command.setup()
         self._commands.append(command)
@@ -614,7 +684,13 @@ class Robot(object, metaclass=Singleton):
 
         if enqueue:
             _description = 'Moving to {}'.format(placeable)
-            self.add_command(Command(do=_do, description=_description))
+            _ir = (
+                'move_to',
+                None,
+                (location,),
+                {'instrument': instrument, 'strategy': strategy})
+            self.add_command(
+                Command(do=_do, description=_description, ir=_ir))
         else:
             _do()
 
@@ -674,6 +750,11 @@ class Robot(object, metaclass=Singleton):
         if this_container and (self._previous_container == this_container):
             ref_container = this_container
 
+        if self._driver.peephole and self._is_above_or_below(destination):
+            # already at the destination's x and y, so only move vertically
+            self._previous_container = this_container
+            return [{'z': destination[2]}]
+
         _, _, tallest_z = self._calibrated_max_dimension(ref_container)
         tallest_z += 5
 
@@ -688,6 +769,18 @@ class Robot(object, metaclass=Singleton):
             {'z': destination[2]}
         ]
 
+    def _is_above_or_below(self, destination, tolerance=0.1):
+        """
+        Returns True if the target of the last move has the x and y of
+        :destination:, known without asking the smoothie
+        """
+        target = self._driver.get_head_target()
+        if target is None:
+            return False
+        return all(
+            abs(target[axis] - destination[axis]) < tolerance
+            for axis in (0, 1))
+
     @property
     def actions(self):
         """
@@ -712,6 +805,9 @@ class Robot(object, metaclass=Singleton):
         for instrument in self._instruments.values():
             instrument.reset()
 
+        if self.liquid_tracker:
+            self.liquid_tracker.reset()
+
     def run(self, **kwargs):
         """
         Run the command queue on a device provided in :func:`connect`.
@@ -742,39 +838,92 @@ class Robot(object, metaclass=Singleton):
         cmd_run_event = {}
         cmd_run_event.update(kwargs)
 
-        mode = 'live'
-        if isinstance(self._driver.connection,
-                      virtual_smoothie.VirtualSmoothie):
-            mode = 'simulate'
+        mode = 'simulate' if self.is_simulating() else 'live'
 
         cmd_run_event['mode'] = mode
         cmd_run_event['name'] = 'command-run'
-        for i, command in enumerate(self._commands):
-            cmd_run_event.update({
-                'command_description': command.description,
-                'command_index': i,
-                'commands_total': len(self._commands)
-            })
-            trace.EventBroker.get_instance().notify(cmd_run_event)
-            try:
-                self.can_pop_command.wait()
-                if command.description:
-                    log.info("Executing: {}".format(command.description))
-                command()
-            except Exception as e:
-                trace.EventBroker.get_instance().notify({
-                    'mode': mode,
-                    'name': 'command-failed',
-                    'error': str(e)
-                })
-                raise RuntimeError(
-                    'Command #{0} failed (\"{1}\"").\nError: \"{2}\"'.format(
-                        i, command.description, str(e))) from e
+
+        timing = self.command_timing if self.command_timing.enabled else None
+        if timing is not None:
+            timing.clear()
+
+        redundant = set()
+        if self._driver.peephole:
+            redundant = peephole.get_redundant_commands(self._commands)
+
+        try:
+            # queries of other threads are answered from the driver's cache,
+            # or wait for the link between the commands of this run
+            with self._driver.arbiter.motion():
+                for i, command in enumerate(self._commands):
+                    if i in redundant:
+                        log.debug('Skipping repeated command #%s', i)
+                        continue
+                    cmd_run_event.update({
+                        'command_description': command.description,
+                        'command_index': i,
+                        'commands_total': len(self._commands)
+                    })
+                    trace.EventBroker.get_instance().notify(cmd_run_event)
+                    self._execute_command(i, command, timing, mode)
+        finally:
+            for instrument in self._instruments.values():
+                instrument.teardown_run()
+
+        if self.liquid_tracker:
+            for warning in self.liquid_tracker.get_warnings():
+                self.add_warning(warning)
 
         return self._runtime_warnings
 
+    def _execute_command(self, i, command, timing, mode):
+        """
+        Runs the :i:-th queued command, timed if :timing: is not *None*
+        """
+        self._running_command = command
+        try:
+            self.can_pop_command.wait()
+            if command.description:
+                log.info("Executing: %s", command.description)
+            if timing is not None:
+                timing.run_command(i, command, self._driver)
+            else:
+                command()
+            if mode == 'live':
+                COMMANDS_EXECUTED.inc()
+        except Exception as e:
+            trace.EventBroker.get_instance().notify({
+                'mode': mode,
+                'name': 'command-failed',
+                'error': str(e)
+            })
+            raise RuntimeError(
+                'Command #{0} failed (\"{1}\"").\nError: \"{2}\"'
+                .format(i, command.description, str(e))) from e
+        finally:
+            self._running_command = None
+
+    def export_ir(self):
+        """
+        Returns the deck, instruments and queued commands as a compact
+        JSON-serializable dict (see :mod:`opentrons.robot.protocol_ir`)
+        """
+        from opentrons.robot import protocol_ir
+        return protocol_ir.export_protocol(self)
+
+    def import_ir(self, ir):
+        """
+        Resets the robot and loads a protocol from a dict returned by
+        :meth:`export_ir`
+        """
+        from opentrons.robot import protocol_ir
+        return protocol_ir.import_protocol(self, ir)
+
     def send_to_app(self):
-        robot_as_bytes = dill.dumps(self)
+        import requests
+        from opentrons.robot import protocol_ir
+
+        robot_as_bytes = protocol_ir.dumps(self)
         try:
             resp = requests.get(settings.get('APP_IS_ALIVE_URL'))
             if not resp.ok:
@@ -794,7 +943,14 @@ class Robot(object, metaclass=Singleton):
         if not resp.ok:
             raise Exception('App failed to accept protocol upload')
 
-    def simulate(self, switches=False):
+    def is_simulating(self):
+        """
+        Returns True if commands run on a virtual robot (see
+        :func:`simulate`) or on a replayed recording, not on a live one
+        """
+        return self._driver.is_virtual()
+
+    def simulate(self, switches=False, profile=False):
         """
         Simulate a protocol run on a virtual robot.
 
@@ -806,6 +962,22 @@ class Robot(object, metaclass=Singleton):
         switches : bool
             If ``True`` tells the robot to stop
             execution and throw an error if limit switch was hit.
+
+        profile : bool or str
+            If ``True`` the run is sampled by
+            :class:`opentrons.util.profiler.SamplingProfiler` and the
+            :class:`Profile` is kept in :attr:`last_profile`. A path also
+            writes its collapsed stacks there, for flamegraph tools.
+            Commands enqueued while a profiler was running are attributed
+            to the protocol lines that enqueued them.
+
+        Examples
+        --------
+        ..
+        >>> with SamplingProfiler(): # doctest: +SKIP
+        >>>     p200.transfer(50, plate[0], plate[1]) # doctest: +SKIP
+        >>> robot.simulate(profile='simulate.folded') # doctest: +SKIP
+        >>> print(robot.last_profile.get_summary()) # doctest: +SKIP
         """
         if switches:
             self.set_connection('simulate_switches')
@@ -814,7 +986,12 @@ class Robot(object, metaclass=Singleton):
         for instrument in self._instruments.values():
             instrument.setup_simulate()
 
-        self.run()
+        if profile:
+            self._profile_run(sys._getframe(1).f_code.co_filename)
+            if isinstance(profile, str):
+                self.last_profile.write_collapsed_stacks(profile)
+        else:
+            self.run()
 
         self.set_connection('live')
 
@@ -823,6 +1000,27 @@ class Robot(object, metaclass=Singleton):
 
         return self._runtime_warnings
 
+    def _get_profile_context(self):
+        """
+        Labels the profiler's samples with the type of the running command,
+        and attributes them to the protocol line that enqueued it
+        """
+        command = self._running_command
+        if command is None:
+            return None
+        return 'command:' + get_command_type(command), command.source
+
+    def _profile_run(self, protocol_file):
+        run_profiler = profiler.SamplingProfiler(
+            protocol_files=[protocol_file],
+            get_context=self._get_profile_context)
+        run_profiler.start()
+        try:
+            self.run()
+        finally:
+            self.last_profile = run_profiler.stop()
+        log.info('Simulation profile:\n%s', self.last_profile.get_summary())
+
     def set_connection(self, mode):
         if mode in self.connections:
             connection = self.connections[mode]
@@ -842,6 +1040,7 @@ class Robot(object, metaclass=Singleton):
         """
         if self._driver:
             self._driver.disconnect()
+        self._stop_recording()
 
         self.axis_homed = {
             'x': False, 'y': False, 'z': False, 'a': False, 'b': False}
@@ -1021,13 +1220,13 @@ class Robot(object, metaclass=Singleton):
             * ``steps_per_mm`` — steps per millimeter calibration
             values for ``x`` and ``y`` axis.
         """
-        # TODO: Store these versions in config
+        steps_per_mm = self._driver.get_all_steps_per_mm()
         return {
             'axis_homed': self.axis_homed,
             'switches': self._driver.get_endstop_switches(),
             'steps_per_mm': {
-                'x': self._driver.get_steps_per_mm('x'),
-                'y': self._driver.get_steps_per_mm('y')
+                'x': steps_per_mm['x'],
+                'y': steps_per_mm['y']
             }
         }
 
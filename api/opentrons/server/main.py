@@ -1,5 +1,5 @@
 import datetime as dt
-import json
+import io
 import logging
 import os
 import sys
@@ -10,16 +10,25 @@ import traceback
 import dill
 import flask
 from flask import Flask, render_template, request
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, join_room, leave_room
 from flask_cors import CORS
 
-from opentrons import robot, Robot, containers, instruments
+from opentrons import robot, Robot
+from opentrons.robot import protocol_ir
+from opentrons.util import log as util_log
+from opentrons.util import metrics
 from opentrons.util import trace
-from opentrons.util.vector import VectorEncoder
+from opentrons.util.profiler import SamplingProfiler
 from opentrons.util.singleton import Singleton
 
 sys.path.insert(0, os.path.abspath('..'))  # NOQA
-from opentrons.server import helpers
+from opentrons.server import helpers, telemetry
+from opentrons.server.step_list import StepList
+from opentrons.server.protocol_cache import (
+    ProtocolCache,
+    get_calibrations_digest,
+    get_protocol_key
+)
 from opentrons.server.process_manager import run_once
 
 
@@ -38,18 +47,39 @@ app.jinja_env.autoescape = False
 app.config['ALLOWED_EXTENSIONS'] = set(['json', 'py'])
 socketio = SocketIO(app, async_mode='gevent')
 
+# created by start() in the app's data directory, so that importing the
+# server (e.g. in tests) does not read or write cached protocols
+protocol_cache = None
+
+UPLOAD_SIMULATE_TIME = metrics.summary(
+    'opentrons_upload_simulate_seconds',
+    'Seconds spent simulating uploaded protocols not found in the cache')
+
+# file name of the uploaded Python protocols' code
+PROTOCOL_FILENAME = '<protocol>'
+
 filename = "N/A"
 last_modified = "N/A"
 
 
+# events forwarded to the socket clients, without move-finished and
+# move-to, so the driver does not read positions after every move
+NOTIFIED_EVENTS = (
+    'command-run',
+    'command-failed',
+    'home',
+    'delay-start',
+    'countdown',
+    'delay-finish'
+)
+
+
 def notify(info):
-    s = json.dumps(info, cls=VectorEncoder)
-    name = json.loads(s).get('name')
-    if name != 'move-finished' and name != 'move-to':
-        socketio.emit('event', json.loads(s))
+    socketio.emit('event', telemetry.to_json_safe(info))
 
 
-trace.EventBroker.get_instance().add(notify)
+trace.EventBroker.get_instance().add(notify, NOTIFIED_EVENTS)
+robot_telemetry = telemetry.Telemetry(socketio)
 
 
 @app.route("/")
@@ -80,7 +110,8 @@ def load_python(stream):
     )
     try:
         try:
-            exec(code, globals())
+            # named, so that the profiler can find the protocol's lines
+            exec(compile(code, PROTOCOL_FILENAME, 'exec'), globals())
         except Exception as e:
             tb = e.__traceback__
             stack_list = traceback.extract_tb(tb)
@@ -113,6 +144,64 @@ def load_python(stream):
     return api_response
 
 
+def load_from_cache(cache_key):
+    """
+    Loads a previously compiled protocol onto the robot, returns
+    the upload response or *None* if it is not in the cache
+    """
+    global robot, current_step_list
+    if protocol_cache is None:
+        return None
+    entry = protocol_cache.get(cache_key)
+    if entry is None:
+        return None
+
+    robot = Robot.get_instance()
+    try:
+        robot.import_ir(entry['ir'])
+    except Exception:
+        app.logger.exception('Failed to load protocol from cache')
+        return None
+
+    current_step_list = StepList(robot, entry['step_list'])
+    return {'errors': [], 'warnings': entry['warnings']}
+
+
+def save_to_cache(cache_key, calibrations, warnings, calibrations_digest):
+    if protocol_cache is not None:
+        protocol_cache.put(
+            cache_key,
+            Robot.get_instance(),
+            calibrations,
+            warnings,
+            calibrations_digest)
+
+
+def _simulate_upload(source, extension, profile):
+    """
+    Loads the protocol :source:, sampled by a SamplingProfiler if
+    :profile: is set
+
+    Returns (api_response, Profile or None)
+    """
+    profiler = None
+    if profile:
+        profiler = SamplingProfiler(
+            protocol_files=[PROTOCOL_FILENAME],
+            get_context=Robot.get_instance()._get_profile_context)
+        profiler.start()
+    start = time.perf_counter()
+    try:
+        if extension == 'py':
+            api_response = load_python(io.BytesIO(source))
+        else:
+            api_response = helpers.load_json(io.BytesIO(source))
+    finally:
+        upload_profile = profiler.stop() if profiler else None
+    UPLOAD_SIMULATE_TIME.observe(time.perf_counter() - start)
+    return api_response, upload_profile
+
+
 @app.route("/upload", methods=["POST"])
 def upload():
     global filename
@@ -129,19 +218,25 @@ def upload():
         })
 
     extension = file.filename.split('.')[-1].lower()
-
-    api_response = None
-    if extension == 'py':
-        api_response = load_python(file.stream)
-    elif extension == 'json':
-        api_response = helpers.load_json(file.stream)
-    else:
+    if extension not in ('py', 'json'):
         return flask.jsonify({
             'status': 'error',
             'data': '{} is not a valid extension. Expected'
             '.py or .json'.format(extension)
         })
 
+    source = file.stream.read()
+    cache_key = get_protocol_key(source, extension)
+    # profiled uploads are always compiled
+    profile = request.form.get('profile', '').lower() in ('1', 'true')
+
+    api_response = None if profile else load_from_cache(cache_key)
+    cached = api_response is not None
+    if not cached:
+        calibrations_digest = get_calibrations_digest()
+        api_response, upload_profile = _simulate_upload(
+            source, extension, profile)
+
     if len(api_response['errors']) > 0:
         # TODO: no need for both http response and socket emit
         emit_notifications(api_response['errors'], 'danger')
@@ -152,33 +247,54 @@ def upload():
         emit_notifications(
             ["Successfully uploaded {}".format(file.filename)], 'success')
         status = 'success'
-        calibrations = create_step_list()
+        if cached:
+            calibrations = update_step_list()
+        else:
+            calibrations = create_step_list()
+            save_to_cache(
+                cache_key,
+                calibrations,
+                api_response['warnings'],
+                calibrations_digest)
+
+    data = {
+        'errors': api_response['errors'],
+        'warnings': api_response['warnings'],
+        'calibrations': calibrations,
+        'fileName': filename,
+        'lastModified': last_modified
+    }
+    if profile:
+        data['profile'] = {
+            'summary': upload_profile.get_summary(),
+            'collapsed': upload_profile.get_collapsed_stacks()
+        }
 
     return flask.jsonify({
         'status': status,
-        'data': {
-            'errors': api_response['errors'],
-            'warnings': api_response['warnings'],
-            'calibrations': calibrations,
-            'fileName': filename,
-            'lastModified': last_modified
-        }
+        'data': data
     })
 
 
 @app.route("/upload-jupyter", methods=["POST"])
 def upload_jupyter():
-    global robot, filename, last_modified, current_protocol_step_list
+    global robot, filename, last_modified
     robot = Robot.get_instance()
 
     try:
-        jupyter_robot = dill.loads(request.data)
-        # These attributes need to be persisted from existing robot
-        jupyter_robot._driver = robot._driver
-        jupyter_robot.connections = robot.connections
-        jupyter_robot.can_pop_command = robot.can_pop_command
-        Singleton._instances[Robot] = jupyter_robot
-        robot = jupyter_robot
+        if protocol_ir.is_protocol_ir(request.data):
+            # Replays the protocol onto the existing robot, so its
+            # driver and connections are kept as they are
+            jupyter_robot = protocol_ir.loads(request.data, robot)
+        else:
+            # Legacy upload of a dill-pickled robot
+            jupyter_robot = dill.loads(request.data)
+            # These attributes need to be persisted from existing robot
+            jupyter_robot._driver = robot._driver
+            jupyter_robot.connections = robot.connections
+            jupyter_robot.can_pop_command = robot.can_pop_command
+            Singleton._instances[Robot] = jupyter_robot
+            robot = jupyter_robot
 
         # Reload instrument calibrations
         [instr.load_persisted_data()
@@ -186,8 +302,7 @@ def upload_jupyter():
         [instr.update_calibrator()
             for _, instr in jupyter_robot.get_instruments()]
 
-        current_protocol_step_list = None
-        calibrations = update_step_list()
+        calibrations = create_step_list()
         filename = 'JUPYTER UPLOAD'
         last_modified = dt.datetime.now().strftime('%a %b %d %Y')
         upload_data = {
@@ -355,6 +470,37 @@ def get_versions():
     })
 
 
+@app.route("/robot/command_timing", methods=["GET", "POST"])
+def command_timing():
+    """
+    Returns the timing of the commands of the last run as JSON, or as CSV
+    with ``?format=csv``. POST ``{"enabled": true}`` to time the next runs
+    """
+    timing = Robot.get_instance().command_timing
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict) or 'enabled' not in data:
+            return flask.jsonify({
+                'status': 'error',
+                'data': 'Expected {"enabled": true} or {"enabled": false}'
+            }), 400
+        timing.enabled = bool(data['enabled'])
+        return flask.jsonify({'enabled': timing.enabled})
+
+    if request.args.get('format') == 'csv':
+        return flask.Response(timing.to_csv(), mimetype='text/csv')
+    return flask.jsonify({
+        'enabled': timing.enabled,
+        'summary': timing.get_summary(),
+        'commands': timing.get_commands()
+    })
+
+
+@app.route("/metrics")
+def get_metrics():
+    return flask.Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route("/app_version")
 def app_version():
     return flask.jsonify({
@@ -454,169 +600,38 @@ def placeables():
     })
 
 
-def _sort_containers(container_list):
-    """
-    Returns the passed container list, sorted with tipracks first
-    then alphabetically by name
-    """
-    _tipracks = []
-    _other = []
-    for c in container_list:
-        _type = c.get_type().lower()
-        if 'tip' in _type:
-            _tipracks.append(c)
-        else:
-            _other.append(c)
-
-    _tipracks = sorted(
-        _tipracks,
-        key=lambda c: c.get_name().lower()
-    )
-    _other = sorted(
-        _other,
-        key=lambda c: c.get_name().lower()
-    )
-
-    return _tipracks + _other
-
-
-def _get_all_pipettes():
-    robot = Robot.get_instance()
-    pipette_list = []
-    for _, p in robot.get_instruments():
-        if isinstance(p, instruments.Pipette):
-            pipette_list.append(p)
-    return sorted(
-        pipette_list,
-        key=lambda p: p.name.lower()
-    )
-
-
-def _get_all_containers():
-    """
-    Returns all containers currently on the deck
-    """
-    all_containers = list()
-    robot = Robot.get_instance()
-    for slot in robot._deck:
-        if slot.has_children():
-            all_containers += slot.get_children_list()
-
-    return _sort_containers(all_containers)
-
-
-def _get_unique_containers(instrument):
-    """
-    Returns all associated containers for an instrument
-    """
-    unique_containers = set()
-    for location in instrument.placeables:
-        if isinstance(location, containers.placeable.WellSeries):
-            location = location[0]
-        for c in location.get_trace():
-            if isinstance(c, containers.placeable.Container):
-                unique_containers.add(c)
-
-    return _sort_containers(list(unique_containers))
-
-
-def _check_if_calibrated(instrument, container):
-    """
-    Returns True if instrument holds calibration data for a Container
-    """
-    slot = container.get_parent().get_name()
-    label = container.get_name()
-    data = instrument.calibration_data
-    if slot in data:
-        if label in data[slot].get('children'):
-            return True
-    return False
-
-
-def _check_if_instrument_calibrated(instrument):
-    # TODO: rethink calibrating instruments other than Pipette
-    if not isinstance(instrument, instruments.Pipette):
-        return True
-
-    positions = instrument.positions
-    for p in positions:
-        if positions.get(p) is None:
-            return False
-
-    return True
-
-
-def _get_container_from_step(step):
-    """
-    Retruns the matching Container for a given placeable step in the step-list
-    """
-    all_containers = _get_all_containers()
-    for container in all_containers:
-        match = [
-            container.get_name() == step['label'],
-            container.get_parent().get_name() == step['slot'],
-            container.get_type() == step['type']
-
-        ]
-        if all(match):
-            return container
-    return None
-
-
-current_protocol_step_list = None
+current_step_list = None
 
 
 def create_step_list():
-    global current_protocol_step_list
+    global current_step_list
     try:
-        current_protocol_step_list = [{
-            'axis': instrument.axis,
-            'label': instrument.name,
-            'channels': instrument.channels,
-            'placeables': [
-                {
-                    'type': container.get_type(),
-                    'label': container.get_name(),
-                    'slot': container.get_parent().get_name()
-                }
-                for container in _get_unique_containers(instrument)
-            ]
-        } for instrument in _get_all_pipettes()]
+        current_step_list = StepList(Robot.get_instance())
     except Exception as e:
         app.logger.exception('Error creating step list')
         emit_notifications([str(e)], 'danger')
+        return None
 
     return update_step_list()
 
 
-def update_step_list():
-    global current_protocol_step_list
-    robot = Robot.get_instance()
-    if current_protocol_step_list is None:
-        create_step_list()
+def update_step_list(axis=None):
+    """
+    Refreshes the calibration state of the current step list, only for the
+    steps of :axis: if given, and returns it
+    """
+    stale = (
+        current_step_list is None or
+        current_step_list.robot is not Robot.get_instance()
+    )
+    if stale:
+        return create_step_list()
     try:
-        for step in current_protocol_step_list:
-            t_axis = str(step['axis']).upper()
-            instrument = robot._instruments[t_axis]
-            step.update({
-                'top': instrument.positions['top'],
-                'bottom': instrument.positions['bottom'],
-                'blow_out': instrument.positions['blow_out'],
-                'drop_tip': instrument.positions['drop_tip'],
-                'max_volume': instrument.max_volume,
-                'calibrated': _check_if_instrument_calibrated(instrument)
-            })
-
-            for placeable_step in step['placeables']:
-                c = _get_container_from_step(placeable_step)
-                if c:
-                    placeable_step.update({
-                        'calibrated': _check_if_calibrated(instrument, c)
-                    })
+        current_step_list.update(axis)
     except Exception as e:
         emit_notifications([str(e)], 'danger')
 
-    return current_protocol_step_list
+    return current_step_list.serialize()
 
 
 @app.route('/home/<axis>')
@@ -879,7 +894,7 @@ def calibrate_placeable():
     slot = request.json.get("slot")
     try:
         _calibrate_placeable(name, slot, axis)
-        calibrations = update_step_list()
+        calibrations = update_step_list(axis)
         emit_notifications([
             'Saved {0} for the {1} axis'.format(name, axis)], 'success')
     except Exception as e:
@@ -927,7 +942,7 @@ def calibrate_plunger():
             'data': str(e)
         })
 
-    calibrations = update_step_list()
+    calibrations = update_step_list(axis)
 
     # TODO change calibration key to steplist
     return flask.jsonify({
@@ -947,15 +962,35 @@ def on_connect():
     app.logger.info('Socketio connected to front end...')
 
 
+@socketio.on('telemetry-subscribe')
+def on_telemetry_subscribe(level):
+    try:
+        previous = robot_telemetry.subscribe(request.sid, level)
+    except ValueError as e:
+        return {'status': 'error', 'data': str(e)}
+    if previous:
+        leave_room(telemetry.get_room(previous))
+    join_room(telemetry.get_room(level))
+    return {'status': 'success', 'data': level}
+
+
+@socketio.on('telemetry-unsubscribe')
+def on_telemetry_unsubscribe():
+    previous = robot_telemetry.unsubscribe(request.sid)
+    if previous:
+        leave_room(telemetry.get_room(previous))
+    return {'status': 'success', 'data': None}
+
+
+@socketio.on('disconnect')
+def on_disconnect(*args):
+    robot_telemetry.unsubscribe(request.sid)
+
+
 @app.before_request
 def log_before_request():
     logger = logging.getLogger('opentrons-app')
-    log_msg = "[BR] {method} {url} | {data}".format(
-        method=request.method,
-        url=request.url,
-        data=request.data,
-    )
-    logger.info(log_msg)
+    logger.info("[BR] %s %s | %s", request.method, request.url, request.data)
 
 
 @app.after_request
@@ -964,19 +999,35 @@ def log_after_request(response):
     if response.mimetype in ('text/html', 'application/javascript'):
         return response
     logger = logging.getLogger('opentrons-app')
-    log_msg = "[AR] {data}".format(data=response.data)
-    logger.info(log_msg)
+    logger.info("[AR] %s", response.data)
     return response
 
 
+def _start_queue_logging():
+    """
+    Log files are written by a background thread, not the motion thread
+
+    The root logger is queued too: records of the opentrons loggers
+    propagate to its 'opentrons-app' file handler
+    """
+    util_log.start_queue_logging(None, 'opentrons-app', 'opentrons')
+
+
 def start():
+    global protocol_cache
+    protocol_cache = ProtocolCache()
+
     data_dir = os.environ.get('APP_DATA_DIR', os.getcwd())
     IS_DEBUG = os.environ.get('DEBUG', '').lower() == 'true'
     if not IS_DEBUG:
         run_once(data_dir)
     _start_connection_watcher()
 
+    # keeps slow socket clients from holding up the motion loop
+    trace.EventBroker.get_instance().start_async()
+
     from opentrons.server import log  # NOQA
+    _start_queue_logging()
     lg = logging.getLogger('opentrons-app')
     lg.info('Starting Flask Server')
     [app.logger.addHandler(handler) for handler in lg.handlers]
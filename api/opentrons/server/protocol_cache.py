@@ -0,0 +1,227 @@
+"""
+Content-addressed cache of compiled protocols.
+
+Uploading a protocol executes it (or runs the JSON importer) to build the
+deck and command queue. The result only depends on the protocol source,
+the API version and the labware definitions it loads, so it is stored as a
+:mod:`opentrons.robot.protocol_ir` document together with the step list and
+warnings, and a re-upload of an unchanged protocol replays the IR instead.
+
+Entries are JSON files in ``PROTOCOL_CACHE_DIR``, named after the sha256 of
+the API version and the protocol source. Each entry records a digest per
+labware type it uses and is discarded if one of those definitions changed.
+The least recently used entries are evicted once the cache grows past
+``max_size`` bytes.
+
+Protocols may also read or change instrument calibrations while being
+compiled (e.g. ``delete_calibration_data()``). An entry is therefore only
+stored if compiling left the calibrations file untouched, and only used
+while the calibrations file is the same as when it was stored.
+"""
+import hashlib
+import json
+import os
+
+import opentrons
+from opentrons.containers import persisted_containers
+from opentrons.instruments import calibration_store
+from opentrons.util import environment
+from opentrons.util import metrics
+from opentrons.util.log import get_logger
+from opentrons.util.vector import VectorEncoder
+
+
+log = get_logger(__name__)
+
+DEFAULT_MAX_SIZE = 50 * 1024 * 1024
+
+CACHE_HITS = metrics.counter(
+    'opentrons_protocol_cache_hits_total',
+    'Uploads loaded from the protocol cache')
+CACHE_MISSES = metrics.counter(
+    'opentrons_protocol_cache_misses_total',
+    'Uploads missing or stale in the protocol cache')
+
+
+def get_labware_digest(container_type):
+    """
+    Returns a digest of the definition of a container type
+    """
+    persisted_containers.ensure_persisted_containers_loaded()
+    definition = persisted_containers.persisted_containers_dict.get(
+        container_type)
+    encoded = json.dumps(definition, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def get_calibrations_digest():
+    """
+    Returns a digest of the instrument calibrations file
+    """
+    calibration_store.flush()
+    try:
+        with open(environment.get_path('CALIBRATIONS_FILE'), 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def get_protocol_key(source, extension):
+    """
+    Returns the cache key of a protocol
+
+    Parameters
+    ----------
+    source : bytes
+        Protocol file contents
+
+    extension : str
+        Protocol file extension, ``py`` or ``json``
+    """
+    digest = hashlib.sha256()
+    digest.update(opentrons.__version__.encode())
+    digest.update(b'\0')
+    digest.update(extension.lower().encode())
+    digest.update(b'\0')
+    digest.update(source)
+    return digest.hexdigest()
+
+
+class ProtocolCache(object):
+    """
+    Stores compiled protocols on disk keyed by their source
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory holding the entries
+        (Default: ``PROTOCOL_CACHE_DIR`` environment setting)
+
+    max_size : int
+        Total size in bytes of all entries before the least recently
+        used ones are evicted (Default: 50MB)
+    """
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def get_cache_dir(self):
+        if self.cache_dir is None:
+            return environment.get_path('PROTOCOL_CACHE_DIR')
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        return self.cache_dir
+
+    def get_key(self, source, extension):
+        return get_protocol_key(source, extension)
+
+    def _get_entry_path(self, key):
+        return os.path.join(self.get_cache_dir(), key + '.json')
+
+    def get(self, key):
+        """
+        Returns the entry stored under :key: as a dict with
+        ``ir``, ``step_list`` and ``warnings`` or *None*
+        if it is missing or stale
+        """
+        path = self._get_entry_path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            CACHE_MISSES.inc()
+            return None
+
+        stale = (
+            entry.get('api_version') != opentrons.__version__ or
+            entry.get('calibrations') != get_calibrations_digest() or
+            any(
+                get_labware_digest(container_type) != digest
+                for container_type, digest in entry['labware'].items()
+            )
+        )
+        if stale:
+            log.debug('Discarding stale protocol cache entry {}'.format(key))
+            self._remove(path)
+            CACHE_MISSES.inc()
+            return None
+
+        CACHE_HITS.inc()
+        # mtime is used as the access time for LRU eviction
+        os.utime(path, None)
+        return entry
+
+    def put(self, key, robot, step_list, warnings, calibrations_digest):
+        """
+        Stores the robot's deck, instruments and commands under :key:
+
+        Parameters
+        ----------
+        calibrations_digest : str
+            :func:`get_calibrations_digest` before the protocol was compiled
+
+        Returns *False* if the protocol was not cached, because it
+        changed calibrations or could not be represented as an IR
+        """
+        if calibrations_digest != get_calibrations_digest():
+            log.debug('Protocol not cached: it changed calibrations')
+            return False
+
+        try:
+            ir = robot.export_ir()
+        except ValueError as e:
+            log.debug('Protocol not cached: {}'.format(e))
+            return False
+
+        entry = {
+            'api_version': opentrons.__version__,
+            'calibrations': calibrations_digest,
+            'labware': {
+                container_type: get_labware_digest(container_type)
+                for _, _, container_type in ir['deck']
+            },
+            'ir': ir,
+            'step_list': step_list,
+            'warnings': warnings
+        }
+
+        path = self._get_entry_path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f, cls=VectorEncoder, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+        self.evict()
+        return True
+
+    def evict(self):
+        """
+        Removes least recently used entries until the total size
+        of the cache is below ``max_size``
+        """
+        cache_dir = self.get_cache_dir()
+        entries = []
+        for name in os.listdir(cache_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            self._remove(path)
+            total_size -= size
+
+    def clear(self):
+        cache_dir = self.get_cache_dir()
+        for name in os.listdir(cache_dir):
+            self._remove(os.path.join(cache_dir, name))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
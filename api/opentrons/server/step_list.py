@@ -0,0 +1,196 @@
+"""
+The calibration step list shown by the app: every pipette with the plunger
+positions it needs calibrated and the containers it visits.
+
+A :class:`StepList` is built once per uploaded protocol. It resolves each
+step's container through a ``(slot, label, type)`` index at build time, so
+refreshing the calibration state after a calibration only touches the
+steps of that instrument and never rescans the deck.
+"""
+from opentrons import instruments
+
+
+def _sort_containers(container_list):
+    """
+    Returns the passed container list, sorted with tipracks first
+    then alphabetically by name
+    """
+    _tipracks = []
+    _other = []
+    for c in container_list:
+        _type = c.get_type().lower()
+        if 'tip' in _type:
+            _tipracks.append(c)
+        else:
+            _other.append(c)
+
+    _tipracks = sorted(
+        _tipracks,
+        key=lambda c: c.get_name().lower()
+    )
+    _other = sorted(
+        _other,
+        key=lambda c: c.get_name().lower()
+    )
+
+    return _tipracks + _other
+
+
+def _get_all_pipettes(robot):
+    pipette_list = []
+    for _, p in robot.get_instruments():
+        if isinstance(p, instruments.Pipette):
+            pipette_list.append(p)
+    return sorted(
+        pipette_list,
+        key=lambda p: p.name.lower()
+    )
+
+
+def _get_all_containers(robot):
+    """
+    Returns all containers currently on the deck
+    """
+    all_containers = list()
+    for slot in robot._deck:
+        if slot.has_children():
+            all_containers += slot.get_children_list()
+
+    return _sort_containers(all_containers)
+
+
+def _get_container_key(container):
+    return (
+        container.get_parent().get_name(),
+        container.get_name(),
+        container.get_type()
+    )
+
+
+def _get_unique_containers(instrument):
+    """
+    Returns all associated containers for an instrument
+    """
+    return _sort_containers(instrument.get_used_containers())
+
+
+def _check_if_calibrated(instrument, container):
+    """
+    Returns True if instrument holds calibration data for a Container
+    """
+    slot = container.get_parent().get_name()
+    label = container.get_name()
+    data = instrument.calibration_data
+    if slot in data:
+        if label in data[slot].get('children'):
+            return True
+    return False
+
+
+def _check_if_instrument_calibrated(instrument):
+    # TODO: rethink calibrating instruments other than Pipette
+    if not isinstance(instrument, instruments.Pipette):
+        return True
+
+    positions = instrument.positions
+    for p in positions:
+        if positions.get(p) is None:
+            return False
+
+    return True
+
+
+class StepList(object):
+    """
+    Calibration steps of the protocol loaded on :robot:
+
+    Parameters
+    ----------
+    robot : Robot
+        Robot with the protocol loaded
+
+    steps : list
+        Previously serialized steps (see :meth:`serialize`) to restore
+        instead of building them from the robot's instruments
+    """
+    def __init__(self, robot, steps=None):
+        self.robot = robot
+
+        # (slot, label, type) -> Container
+        self.containers = {
+            _get_container_key(c): c
+            for c in _get_all_containers(robot)
+        }
+
+        if steps is None:
+            steps = [{
+                'axis': instrument.axis,
+                'label': instrument.name,
+                'channels': instrument.channels,
+                'placeables': [
+                    {
+                        'type': container.get_type(),
+                        'label': container.get_name(),
+                        'slot': container.get_parent().get_name()
+                    }
+                    for container in _get_unique_containers(instrument)
+                ]
+            } for instrument in _get_all_pipettes(robot)]
+        self.steps = steps
+
+        # axis -> (step, [(placeable step, Container), ...])
+        self._steps_by_axis = {}
+        for step in self.steps:
+            placeables = [
+                (placeable_step, self.get_container(
+                    placeable_step['slot'],
+                    placeable_step['label'],
+                    placeable_step['type']))
+                for placeable_step in step['placeables']
+            ]
+            self._steps_by_axis[str(step['axis']).upper()] = (
+                step, placeables)
+
+    def get_container(self, slot, label, container_type):
+        """
+        Returns the Container matching a placeable step, or *None*
+        """
+        return self.containers.get((slot, label, container_type))
+
+    def update(self, axis=None):
+        """
+        Refreshes the calibration state of the steps of :axis:,
+        or of all steps if no axis is given
+        """
+        if axis is None:
+            axes = list(self._steps_by_axis)
+        elif axis.upper() in self._steps_by_axis:
+            axes = [axis.upper()]
+        else:
+            axes = []
+
+        for t_axis in axes:
+            step, placeables = self._steps_by_axis[t_axis]
+            instrument = self.robot._instruments[t_axis]
+            step.update({
+                'top': instrument.positions['top'],
+                'bottom': instrument.positions['bottom'],
+                'blow_out': instrument.positions['blow_out'],
+                'drop_tip': instrument.positions['drop_tip'],
+                'max_volume': instrument.max_volume,
+                'calibrated': _check_if_instrument_calibrated(instrument)
+            })
+
+            for placeable_step, c in placeables:
+                if c:
+                    placeable_step.update({
+                        'calibrated': _check_if_calibrated(instrument, c)
+                    })
+
+        return self.steps
+
+    def serialize(self):
+        """
+        Returns the steps as sent to the app
+        """
+        return self.steps
@@ -0,0 +1,220 @@
+"""
+Batched robot telemetry for the app over socket.io.
+
+Instead of emitting every ``move-finished`` and ``command-run`` event,
+:class:`Telemetry` keeps the latest robot state and sends one
+``telemetry`` message per tick (20 per second by default) to each
+subscription level that has clients:
+
+    * ``progress``: command progress, as the fields that changed since
+      the previous message
+    * ``positions``: progress and the x, y, z, a, b positions packed as
+      five little endian float32 (see :func:`unpack_positions`)
+    * ``full``: all of the above and every other event since the previous
+      message
+
+A message is only sent when something changed.
+"""
+import struct
+import threading
+import time
+
+from opentrons.util import trace
+from opentrons.util.vector import Vector
+
+
+LEVELS = ('progress', 'positions', 'full')
+
+POSITION_AXES = 'xyzab'
+POSITION_FORMAT = '<5f'
+
+# events that update the tracked state instead of being forwarded
+POSITION_EVENTS = ('move-finished', 'home')
+PROGRESS_EVENTS = ('command-run',)
+
+# events kept per tick for the 'full' level, older ones are dropped
+MAX_EVENTS_PER_TICK = 100
+
+
+def to_json_safe(value):
+    """
+    Returns :value: with vectors as ``{'x', 'y', 'z'}`` dicts and any object
+    that is not JSON serializable as its string representation
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): to_json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_safe(v) for v in value]
+    if isinstance(value, Vector):
+        return dict(zip('xyz', value))
+    return str(value)
+
+
+def pack_positions(positions):
+    return struct.pack(POSITION_FORMAT, *positions)
+
+
+def unpack_positions(data):
+    """
+    Returns a dict of axis to position from a packed positions message
+    """
+    return dict(zip(POSITION_AXES, struct.unpack(POSITION_FORMAT, data)))
+
+
+def get_room(level):
+    return 'telemetry-' + level
+
+
+class Telemetry(object):
+    """
+    Collects robot events and emits them to socket.io clients in batches
+
+    Parameters
+    ----------
+    socketio : flask_socketio.SocketIO
+        Used to emit the ``telemetry`` messages
+
+    rate : int
+        Messages per second (Default: 20)
+    """
+    def __init__(self, socketio, rate=20):
+        self.socketio = socketio
+        self.interval = 1.0 / rate
+        self.subscriptions = {}
+
+        self._lock = threading.Lock()
+        self._positions = None
+        self._progress = {}
+        self._events = []
+        self._changed = False
+        self._sent_positions = None
+        self._sent_progress = {}
+        self._tick = 0
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def subscribe(self, sid, level):
+        """
+        Sets the detail level of client :sid:, returns the previous one
+        """
+        if level not in LEVELS:
+            raise ValueError(
+                'Unknown telemetry level "{0}", expected one of {1}'.format(
+                    level, ', '.join(LEVELS)))
+        if not self.subscriptions:
+            self.start()
+        previous = self.subscriptions.get(sid)
+        self.subscriptions[sid] = level
+
+        # the next message carries the whole state for the new subscriber
+        with self._lock:
+            self._sent_positions = None
+            self._sent_progress = {}
+            self._changed = True
+        return previous
+
+    def unsubscribe(self, sid):
+        """
+        Stops sending to client :sid:, returns its previous level
+        """
+        previous = self.subscriptions.pop(sid, None)
+        if not self.subscriptions:
+            self.stop()
+        return previous
+
+    def start(self):
+        if self._thread:
+            return
+        trace.EventBroker.get_instance().add(self.record)
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='telemetry', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        trace.EventBroker.get_instance().remove(self.record)
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def record(self, info):
+        """
+        EventBroker listener, updates the state sent on the next tick
+        """
+        name = info.get('name')
+        with self._lock:
+            self._changed = True
+            if name in POSITION_EVENTS:
+                head = info['position']['head']
+                plunger = info['position']['plunger']
+                self._positions = (
+                    head['x'], head['y'], head['z'],
+                    plunger['a'], plunger['b'])
+            elif name in PROGRESS_EVENTS:
+                self._progress = {
+                    'index': info.get('command_index'),
+                    'total': info.get('commands_total'),
+                    'description': info.get('command_description'),
+                    'mode': info.get('mode')
+                }
+            else:
+                if len(self._events) == MAX_EVENTS_PER_TICK:
+                    self._events.pop(0)
+                self._events.append(info)
+
+    def get_messages(self):
+        """
+        Returns a dict of level to the message to send for this tick,
+        empty if nothing changed since the previous tick
+        """
+        with self._lock:
+            if not self._changed:
+                return {}
+            self._changed = False
+            events, self._events = self._events, []
+
+            self._tick += 1
+            message = {'tick': self._tick}
+            messages = {}
+
+            progress_delta = {
+                k: v for k, v in self._progress.items()
+                if self._sent_progress.get(k) != v
+            }
+            self._sent_progress = self._progress
+            if progress_delta:
+                message['progress'] = progress_delta
+                messages['progress'] = message
+
+            positions = self._positions
+            if positions is not None and positions != self._sent_positions:
+                message = dict(message)
+                message['positions'] = pack_positions(positions)
+                self._sent_positions = positions
+            if len(message) > 1:
+                messages['positions'] = message
+
+        if events:
+            message = dict(message)
+            message['events'] = [to_json_safe(e) for e in events]
+        if len(message) > 1:
+            messages['full'] = message
+
+        return messages
+
+    def tick(self):
+        levels = set(self.subscriptions.values())
+        for level, message in self.get_messages().items():
+            if level in levels:
+                self.socketio.emit(
+                    'telemetry', message, room=get_room(level))
+
+    def _run(self):
+        while not self._stopping.is_set():
+            start = time.time()
+            self.tick()
+            self._stopping.wait(max(0, self.interval - (time.time() - start)))
@@ -106,3 +106,60 @@ class ConnectDiagnosticsTestCase(unittest.TestCase):
             sorted(list(response['versions'].keys())),
             sorted(list(expected.keys()))
         )
+
+    def test_command_timing(self):
+        response = self.app.post(
+            '/robot/command_timing',
+            data=json.dumps({'enabled': True}),
+            content_type='application/json')
+        self.assertTrue(json.loads(response.data.decode())['enabled'])
+
+        self.upload_protocol()
+        self.robot.simulate()
+
+        response = self.app.get('/robot/command_timing')
+        response = json.loads(response.data.decode())
+        self.assertEqual(
+            len(response['commands']), len(self.robot.commands()))
+        self.assertEqual(
+            response['summary']['all']['total']['count'],
+            len(self.robot.commands()))
+
+        response = self.app.get('/robot/command_timing?format=csv')
+        self.assertEqual(response.mimetype, 'text/csv')
+        lines = response.data.decode().splitlines()
+        self.assertEqual(len(lines), len(self.robot.commands()) + 1)
+
+    def test_command_timing_invalid_body(self):
+        for kwargs in (
+                {},
+                {'data': 'enabled', 'content_type': 'text/plain'},
+                {'data': '{', 'content_type': 'application/json'},
+                {'data': '{}', 'content_type': 'application/json'},
+                {'data': '["enabled"]', 'content_type': 'application/json'}):
+            response = self.app.post('/robot/command_timing', **kwargs)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(
+                json.loads(response.data.decode())['status'], 'error')
+
+    def test_metrics(self):
+        self.upload_protocol()
+        response = self.app.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+
+        lines = response.data.decode().splitlines()
+        for name in ('opentrons_commands_executed_total',
+                     'opentrons_serial_exchanges_total',
+                     'opentrons_serial_latency_seconds',
+                     'opentrons_limit_switch_hits_total',
+                     'opentrons_event_queue_depth',
+                     'opentrons_upload_simulate_seconds',
+                     'opentrons_protocol_cache_hits_total',
+                     'opentrons_protocol_cache_misses_total'):
+            self.assertIn('# HELP ' + name, '\n'.join(lines))
+        samples = dict(
+            line.split(' ') for line in lines if not line.startswith('#'))
+        self.assertGreaterEqual(
+            int(samples['opentrons_upload_simulate_seconds_count']) +
+            int(samples['opentrons_protocol_cache_hits_total']), 1)
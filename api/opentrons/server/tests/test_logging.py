@@ -0,0 +1,46 @@
+import logging
+import threading
+import unittest
+
+from opentrons.util import log as util_log
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.threads = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+        self.threads.append(threading.get_ident())
+
+
+class QueueLoggingTestCase(unittest.TestCase):
+    def setUp(self):
+        from main import _start_queue_logging
+        self.start_queue_logging = _start_queue_logging
+
+        self.handler = RecordingHandler()
+        self.root = logging.getLogger()
+        self.root.addHandler(self.handler)
+        opentrons_logger = logging.getLogger('opentrons')
+        self.addCleanup(opentrons_logger.setLevel, opentrons_logger.level)
+        opentrons_logger.setLevel(logging.DEBUG)
+
+    def tearDown(self):
+        util_log.stop_queue_logging()
+        self.root.removeHandler(self.handler)
+
+    def test_propagated_records(self):
+        self.start_queue_logging()
+        self.assertNotIn(self.handler, self.root.handlers)
+
+        logging.getLogger('opentrons.drivers.motor').debug(
+            'Write: %r', b'G0 X1\r\n')
+        util_log.stop_queue_logging()
+
+        self.assertIn(self.handler, self.root.handlers)
+        self.assertEqual(self.handler.messages, ["Write: b'G0 X1\\r\\n'"])
+        # written by the listener thread, not the motion thread
+        self.assertNotIn(threading.get_ident(), self.handler.threads)
@@ -0,0 +1,159 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from opentrons import containers, instruments
+from opentrons.containers import persisted_containers
+from opentrons.robot import Robot
+from opentrons.server.protocol_cache import (
+    ProtocolCache,
+    get_calibrations_digest
+)
+
+
+class ProtocolCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        Robot.reset_for_tests()
+        self.robot = Robot.get_instance()
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = ProtocolCache(self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def load_protocol(self):
+        plate = containers.load('96-flat', 'B1', 'plate')
+        p200 = instruments.Pipette(axis='b', max_volume=200)
+        for well in plate.rows[0]:
+            p200.aspirate(well).dispense(well)
+
+    def test_key(self):
+        key = self.cache.get_key(b'print(1)', 'py')
+        self.assertEqual(key, self.cache.get_key(b'print(1)', 'PY'))
+        self.assertNotEqual(key, self.cache.get_key(b'print(2)', 'py'))
+        self.assertNotEqual(key, self.cache.get_key(b'print(1)', 'json'))
+        with mock.patch('opentrons.__version__', 'other'):
+            self.assertNotEqual(
+                key, self.cache.get_key(b'print(1)', 'py'))
+
+    def test_put_and_get(self):
+        self.load_protocol()
+        key = self.cache.get_key(b'protocol', 'py')
+        self.assertIsNone(self.cache.get(key))
+
+        self.assertTrue(self.cache.put(
+            key,
+            self.robot,
+            [{'axis': 'b'}],
+            ['warning'],
+            get_calibrations_digest()))
+        entry = self.cache.get(key)
+        self.assertEqual(entry['step_list'], [{'axis': 'b'}])
+        self.assertEqual(entry['warnings'], ['warning'])
+        self.assertEqual(entry['labware'].keys(), {'96-flat'})
+
+        expected = self.robot.commands()
+        self.robot.reset()
+        self.robot.import_ir(entry['ir'])
+        self.assertEqual(self.robot.commands(), expected)
+
+    def test_labware_change_invalidates_entry(self):
+        self.load_protocol()
+        key = self.cache.get_key(b'protocol', 'py')
+        self.cache.put(key, self.robot, [], [], get_calibrations_digest())
+
+        definition = json.loads(json.dumps(
+            persisted_containers.persisted_containers_dict['96-flat']))
+        definition['origin-offset'] = {'x': 1, 'y': 1}
+        with mock.patch.dict(
+                persisted_containers.persisted_containers_dict,
+                {'96-flat': definition}):
+            self.assertIsNone(self.cache.get(key))
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_calibrations_change(self):
+        self.load_protocol()
+        key = self.cache.get_key(b'protocol', 'py')
+        self.assertFalse(
+            self.cache.put(key, self.robot, [], [], 'before-compiling'))
+
+        self.cache.put(key, self.robot, [], [], get_calibrations_digest())
+        self.assertIsNotNone(self.cache.get(key))
+
+        self.robot._instruments['B'].max_volume = 150
+        self.robot._instruments['B'].update_calibrations()
+        self.assertIsNone(self.cache.get(key))
+
+    def test_uncacheable_protocol(self):
+        self.robot.register('custom', lambda: None)
+        self.robot.custom()
+        key = self.cache.get_key(b'protocol', 'py')
+        self.assertFalse(self.cache.put(
+            key, self.robot, [], [], get_calibrations_digest()))
+        self.assertIsNone(self.cache.get(key))
+
+    def test_lru_eviction(self):
+        self.load_protocol()
+        keys = [self.cache.get_key(str(i).encode(), 'py') for i in range(3)]
+        for i, key in enumerate(keys):
+            self.cache.put(key, self.robot, [], [], get_calibrations_digest())
+            path = os.path.join(self.cache_dir, key + '.json')
+            os.utime(path, (i, i))
+        entry_size = os.path.getsize(path)
+
+        # reading the oldest entry makes it the most recently used
+        self.cache.get(keys[0])
+        self.cache.max_size = entry_size * 2
+        self.cache.evict()
+
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+
+
+class UploadCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        Robot.reset_for_tests()
+        import main
+        self.main = main
+        self.app = main.app.test_client()
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = ProtocolCache(self.cache_dir)
+        self.main.protocol_cache = self.cache
+
+        self.data_path = os.path.join(
+            os.path.dirname(__file__) + '/data/'
+        )
+
+    def tearDown(self):
+        self.main.protocol_cache = None
+        shutil.rmtree(self.cache_dir)
+
+    def upload(self):
+        response = self.app.post('/upload', data={
+            'file': (open(self.data_path + 'protocol.py', 'rb'), 'protocol.py')
+        })
+        return json.loads(response.data.decode())
+
+    def test_reupload_skips_execution(self):
+        # the test protocol resets calibrations, so it is only
+        # cached once calibrations are already in that state
+        self.upload()
+        first = self.upload()
+        self.assertEqual(first['status'], 'success')
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        commands = Robot.get_instance().commands()
+
+        with mock.patch.object(self.main, 'load_python') as load_python:
+            second = self.upload()
+            self.assertFalse(load_python.called)
+
+        self.assertEqual(second['status'], 'success')
+        self.assertEqual(
+            second['data']['calibrations'], first['data']['calibrations'])
+        self.assertEqual(
+            second['data']['warnings'], first['data']['warnings'])
+        self.assertEqual(Robot.get_instance().commands(), commands)
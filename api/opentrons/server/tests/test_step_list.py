@@ -0,0 +1,72 @@
+import unittest
+
+from opentrons import containers, instruments
+from opentrons.robot import Robot
+from opentrons.server.step_list import StepList
+
+
+class StepListTestCase(unittest.TestCase):
+    def setUp(self):
+        Robot.reset_for_tests()
+        self.robot = Robot.get_instance()
+        self.robot.connect()
+
+        self.tiprack = containers.load('tiprack-200ul', 'A1', 'tiprack')
+        self.plate = containers.load('96-flat', 'B1', 'plate')
+        self.trough = containers.load('trough-12row', 'B2', 'trough')
+        self.p200 = instruments.Pipette(
+            axis='b',
+            name='p200-step-list',
+            max_volume=200,
+            tip_racks=[self.tiprack])
+        self.p10 = instruments.Pipette(
+            axis='a', name='p10-step-list', max_volume=10)
+        self.p200.delete_calibration_data()
+        self.p10.delete_calibration_data()
+
+        self.p200.pick_up_tip()
+        for well in self.plate:
+            self.p200.aspirate(10, self.trough[0]).dispense(well)
+        self.p10.aspirate(10, self.trough[1])
+
+    def test_build(self):
+        step_list = StepList(self.robot)
+        steps = step_list.serialize()
+
+        self.assertEqual(
+            [step['label'] for step in steps],
+            ['p10-step-list', 'p200-step-list'])
+        self.assertEqual(steps[1]['placeables'], [
+            {'type': 'tiprack-200ul', 'label': 'tiprack', 'slot': 'A1'},
+            {'type': '96-flat', 'label': 'plate', 'slot': 'B1'},
+            {'type': 'trough-12row', 'label': 'trough', 'slot': 'B2'}
+        ])
+        self.assertIs(
+            step_list.get_container('B1', 'plate', '96-flat'), self.plate)
+        self.assertIsNone(
+            step_list.get_container('B1', 'plate', 'tiprack-200ul'))
+
+    def test_update_single_axis(self):
+        step_list = StepList(self.robot)
+        steps = step_list.update()
+        self.assertFalse(steps[1]['placeables'][1]['calibrated'])
+        self.assertEqual(steps[0]['max_volume'], self.p10.max_volume)
+
+        self.p200.calibrate_position((self.plate, self.plate[0].center()))
+        self.p10.max_volume = 15
+
+        steps = step_list.update('b')
+        self.assertTrue(steps[1]['placeables'][1]['calibrated'])
+        self.assertNotEqual(steps[0]['max_volume'], 15)
+
+        steps = step_list.update()
+        self.assertEqual(steps[0]['max_volume'], 15)
+
+    def test_restore_from_steps(self):
+        steps = StepList(self.robot).serialize()
+        step_list = StepList(self.robot, steps)
+        self.assertIs(step_list.serialize(), steps)
+
+        self.p200.calibrate_position((self.plate, self.plate[0].center()))
+        step_list.update('b')
+        self.assertTrue(steps[1]['placeables'][1]['calibrated'])
@@ -0,0 +1,190 @@
+import json
+import unittest
+from unittest import mock
+
+from opentrons.robot import Robot
+from opentrons.server import telemetry
+from opentrons.util import trace
+from opentrons.util.vector import Vector
+
+
+def move_finished(x, y, z, a=0, b=0):
+    return {
+        'name': 'move-finished',
+        'position': {
+            'head': Vector(x, y, z),
+            'plunger': {'a': a, 'b': b}
+        },
+        'class': 'VirtualSmoothie'
+    }
+
+
+def command_run(index, total=10):
+    return {
+        'name': 'command-run',
+        'mode': 'simulate',
+        'command_index': index,
+        'commands_total': total,
+        'command_description': 'Command {}'.format(index)
+    }
+
+
+class TelemetryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.socketio = mock.Mock()
+        self.telemetry = telemetry.Telemetry(self.socketio)
+
+    def test_to_json_safe(self):
+        value = telemetry.to_json_safe({
+            'position': Vector(1, 2, 3),
+            'items': (1, 'a', None),
+            'robot': Robot.get_instance()
+        })
+        self.assertEqual(value['position'], {'x': 1, 'y': 2, 'z': 3})
+        self.assertEqual(value['items'], [1, 'a', None])
+        self.assertIsInstance(value['robot'], str)
+        json.dumps(value)
+
+    def test_pack_positions(self):
+        data = telemetry.pack_positions((1.5, 2, 3, 4, 5.25))
+        self.assertEqual(len(data), 20)
+        self.assertEqual(
+            telemetry.unpack_positions(data),
+            {'x': 1.5, 'y': 2, 'z': 3, 'a': 4, 'b': 5.25})
+
+    def test_coalesces_positions(self):
+        for i in range(10):
+            self.telemetry.record(move_finished(i, 0, 0))
+        messages = self.telemetry.get_messages()
+        self.assertEqual(messages.keys(), {'positions', 'full'})
+        self.assertEqual(
+            telemetry.unpack_positions(messages['positions']['positions']),
+            {'x': 9, 'y': 0, 'z': 0, 'a': 0, 'b': 0})
+        self.assertNotIn('events', messages['full'])
+
+        # nothing changed
+        self.assertEqual(self.telemetry.get_messages(), {})
+
+        # same positions are not sent again
+        self.telemetry.record(move_finished(9, 0, 0))
+        self.assertEqual(self.telemetry.get_messages(), {})
+
+    def test_progress_deltas(self):
+        self.telemetry.record(command_run(0))
+        self.telemetry.record(command_run(1))
+        messages = self.telemetry.get_messages()
+        self.assertEqual(messages['progress']['progress'], {
+            'index': 1,
+            'total': 10,
+            'mode': 'simulate',
+            'description': 'Command 1'
+        })
+
+        self.telemetry.record(command_run(2))
+        messages = self.telemetry.get_messages()
+        self.assertEqual(messages['progress']['progress'], {
+            'index': 2,
+            'description': 'Command 2'
+        })
+        self.assertEqual(messages['full']['progress'], {
+            'index': 2,
+            'description': 'Command 2'
+        })
+
+    def test_full_level_events(self):
+        self.telemetry.record({'name': 'delay-start', 'time': 5})
+        messages = self.telemetry.get_messages()
+        self.assertEqual(messages.keys(), {'full'})
+        self.assertEqual(
+            messages['full']['events'], [{'name': 'delay-start', 'time': 5}])
+
+    def test_subscriptions(self):
+        self.assertRaises(
+            ValueError, self.telemetry.subscribe, 'client-a', 'everything')
+
+        broker = trace.EventBroker.get_instance()
+        self.telemetry.subscribe('client-a', 'progress')
+        self.assertTrue(broker.has_listeners('move-finished'))
+        try:
+            self.assertEqual(
+                self.telemetry.subscribe('client-a', 'positions'),
+                'progress')
+            self.telemetry.record(command_run(0))
+            self.telemetry.record(move_finished(1, 2, 3))
+            self.telemetry.tick()
+        finally:
+            self.telemetry.unsubscribe('client-a')
+
+        self.assertIsNone(self.telemetry._thread)
+        emitted_rooms = [
+            kwargs['room']
+            for _, args, kwargs in self.socketio.emit.mock_calls
+        ]
+        self.assertIn('telemetry-positions', emitted_rooms)
+        self.assertNotIn('telemetry-progress', emitted_rooms)
+        self.assertNotIn('telemetry-full', emitted_rooms)
+
+
+class TelemetrySocketTestCase(unittest.TestCase):
+    def setUp(self):
+        Robot.reset_for_tests()
+        import main
+        self.main = main
+        self.client = main.socketio.test_client(main.app)
+
+    def tearDown(self):
+        self.client.disconnect()
+
+    def test_subscribe(self):
+        ack = self.client.emit('telemetry-subscribe', 'full', callback=True)
+        self.assertEqual(ack['status'], 'success')
+        ack = self.client.emit('telemetry-subscribe', 'fast', callback=True)
+        self.assertEqual(ack['status'], 'error')
+
+        self.main.robot_telemetry.record(command_run(3))
+        self.main.robot_telemetry.tick()
+        received = [
+            message for message in self.client.get_received()
+            if message['name'] == 'telemetry'
+        ]
+        self.assertEqual(
+            received[-1]['args'][0]['progress']['index'], 3)
+
+        self.client.emit('telemetry-unsubscribe', callback=True)
+        self.assertEqual(self.main.robot_telemetry.subscriptions, {})
+
+
+class NotifyTestCase(unittest.TestCase):
+    def setUp(self):
+        Robot.reset_for_tests()
+        from main import app
+        self.app = app.test_client()
+        self.robot = Robot.get_instance()
+        self.robot.connect()
+        self.robot.home(enqueue=False)
+
+    def test_no_position_query_after_move(self):
+        broker = trace.EventBroker.get_instance()
+        # without the catch-all listeners left by other tests
+        patcher = mock.patch.object(broker, 'listeners', [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.assertFalse(broker.has_listeners('move-finished'))
+        self.assertTrue(broker.has_listeners('command-run'))
+
+        driver = self.robot._driver
+        with mock.patch.object(
+                driver, 'get_head_position',
+                wraps=driver.get_head_position) as get_head_position, \
+                mock.patch.object(
+                    driver, 'get_plunger_positions',
+                    wraps=driver.get_plunger_positions) as get_plungers:
+            response = self.app.post(
+                '/jog',
+                data=json.dumps({'x': 10}),
+                content_type='application/json')
+        self.assertEqual(
+            json.loads(response.data.decode())['status'], 'success')
+        # no move-finished event, whose positions take two queries
+        self.assertFalse(get_head_position.called)
+        self.assertFalse(get_plungers.called)
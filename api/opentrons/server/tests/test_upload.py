@@ -187,3 +187,49 @@ class UploadTestCase(unittest.TestCase):
         })
         status = json.loads(response.data.decode())['status']
         self.assertEqual(status, 'error')
+
+    def test_upload_jupyter_protocol_ir(self):
+        from opentrons import containers, instruments
+        from opentrons.robot import protocol_ir
+
+        plate = containers.load('96-flat', 'B1', 'plate')
+        p200 = instruments.Pipette(axis='b', max_volume=200)
+        for well in plate.rows[0]:
+            p200.aspirate(well).dispense(well)
+        data = protocol_ir.dumps(self.robot)
+        expected = self.robot.commands()
+
+        driver = self.robot._driver
+        self.robot.reset()
+        response = self.app.post(
+            '/upload-jupyter',
+            data=data,
+            headers={'Content-Type': 'application/octet-stream'})
+        status = json.loads(response.data.decode())['status']
+        self.assertEqual(status, 'success')
+
+        robot = Robot.get_instance()
+        self.assertIs(robot._driver, driver)
+        self.assertEqual(robot.commands(), expected)
+
+    def test_upload_profile(self):
+        response = self.app.post('/upload', data={
+            'file': (
+                open(self.data_path + 'good_json_protocol.json', 'rb'),
+                'good_json_protocol.json'
+            ),
+            'profile': 'true'
+        })
+        response = json.loads(response.data.decode())
+        self.assertEqual(response['status'], 'success')
+        profile = response['data']['profile']
+        self.assertIn('samples over', profile['summary'])
+        for line in profile['collapsed'].splitlines():
+            self.assertRegex(line, r'.+ \d+$')
+
+        response = self.app.post('/upload', data={
+            'file': (open(self.data_path + 'protocol.py', 'rb'), 'protocol.py')
+        })
+        response = json.loads(response.data.decode())
+        self.assertEqual(response['status'], 'success')
+        self.assertNotIn('profile', response['data'])
@@ -21,6 +21,9 @@ def refresh():
         'CALIBRATIONS_DIR': os.path.join(APP_DATA_DIR, 'calibrations'),
         'CALIBRATIONS_FILE':
             os.path.join(APP_DATA_DIR, 'calibrations', 'calibrations.json'),
+        'TIP_STATE_FILE':
+            os.path.join(APP_DATA_DIR, 'calibrations', 'tip_state.json'),
+        'PROTOCOL_CACHE_DIR': os.path.join(APP_DATA_DIR, 'protocol_cache'),
         'APP_IS_ALIVE_URL': 'http://localhost:31950',
         'APP_JUPYTER_UPLOAD_URL': 'http://localhost:31950/upload-jupyter',
     })
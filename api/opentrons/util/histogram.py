@@ -0,0 +1,91 @@
+"""
+Fixed-size histograms of durations and counts.
+"""
+from collections import OrderedDict
+import math
+
+
+# histograms cover HISTOGRAM_MIN to HISTOGRAM_MIN * 10 ** HISTOGRAM_DECADES
+HISTOGRAM_MIN = 1e-6
+HISTOGRAM_DECADES = 12
+BUCKETS_PER_DECADE = 10
+
+
+class Histogram(object):
+    """
+    Fixed-size histogram of non-negative values with logarithmic buckets,
+    quantiles are accurate to ``1 / BUCKETS_PER_DECADE`` of a decade
+    """
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        # bucket 0 holds values below HISTOGRAM_MIN, the last one
+        # values above the range
+        self.counts = [0] * (HISTOGRAM_DECADES * BUCKETS_PER_DECADE + 2)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        if value < HISTOGRAM_MIN:
+            index = 0
+        else:
+            index = int(
+                math.log10(value / HISTOGRAM_MIN) * BUCKETS_PER_DECADE) + 1
+            index = min(index, len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def get_quantile(self, quantile):
+        """
+        Returns the upper bound of the bucket holding the :quantile:
+        (0 to 1) of the values, or *None* if the histogram is empty
+        """
+        if not self.count:
+            return None
+        rank = quantile * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                break
+        if index == 0:
+            bound = HISTOGRAM_MIN
+        elif index == len(self.counts) - 1:
+            bound = self.max
+        else:
+            bound = HISTOGRAM_MIN * 10 ** (index / BUCKETS_PER_DECADE)
+        return max(self.min, min(bound, self.max))
+
+    def merge(self, other):
+        """
+        Adds the values of :other: to this histogram
+        """
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                if self.min is None or value < self.min:
+                    self.min = value
+                if self.max is None or value > self.max:
+                    self.max = value
+
+    def as_dict(self):
+        return OrderedDict([
+            ('count', self.count),
+            ('total', self.total),
+            ('mean', self.total / self.count if self.count else None),
+            ('min', self.min),
+            ('p50', self.get_quantile(0.5)),
+            ('p90', self.get_quantile(0.9)),
+            ('p99', self.get_quantile(0.99)),
+            ('max', self.max)
+        ])
@@ -1,5 +1,18 @@
+"""
+Logging configuration of the API.
+
+Messages should be logged with %-style arguments, e.g.
+``log.debug('Write: %r', data)``, so nothing is formatted when the level is
+disabled. :func:`start_queue_logging` moves the handlers of a logger to a
+background thread: logging a record then only puts it on a queue, and the
+message is formatted and written to the log files by that thread.
+"""
+import atexit
 import logging
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import threading
 
 from opentrons.util import environment
 
@@ -28,12 +41,15 @@ logging_config = dict(
             'filename': LOG_FILENAME,
             'maxBytes': 5000000,
             'level': logging.INFO,
-            'backupCount': 3
+            'backupCount': 3,
+            # the log file is opened by the first record, not on import
+            'delay': True
         },
     },
+    # the level of the 'file' handler, debug records are not even created
     root={
         'handlers': ['file'],
-        'level': logging.DEBUG
+        'level': logging.INFO
     }
 )
 
@@ -42,3 +58,63 @@ dictConfig(logging_config)
 
 def get_logger(name=None):
     return logging.getLogger(name)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Puts records on a queue as they are, unlike :class:`QueueHandler`
+    the message is not formatted on the logging thread. Arguments are
+    formatted by the :class:`QueueListener` thread, so they should not be
+    changed after being logged
+    """
+    def prepare(self, record):
+        return record
+
+
+_listeners = {}
+_listeners_lock = threading.Lock()
+
+
+def start_queue_logging(*names):
+    """
+    Moves the handlers of the named loggers to a background thread
+
+    Parameters
+    ----------
+    names : str
+        Names of the loggers, *None* is the root logger
+        (Default: the root logger)
+    """
+    with _listeners_lock:
+        for name in names or (None,):
+            if name in _listeners:
+                continue
+            logger = logging.getLogger(name)
+            handlers = list(logger.handlers)
+            listener = QueueListener(
+                queue.Queue(), *handlers, respect_handler_level=True)
+            for handler in handlers:
+                logger.removeHandler(handler)
+            logger.addHandler(DeferredQueueHandler(listener.queue))
+            listener.start()
+            _listeners[name] = listener
+
+
+def stop_queue_logging():
+    """
+    Writes the queued records and gives the loggers
+    their handlers back, see :func:`start_queue_logging`
+    """
+    with _listeners_lock:
+        for name, listener in _listeners.items():
+            logger = logging.getLogger(name)
+            listener.stop()
+            for handler in list(logger.handlers):
+                if isinstance(handler, DeferredQueueHandler):
+                    logger.removeHandler(handler)
+            for handler in listener.handlers:
+                logger.addHandler(handler)
+        _listeners.clear()
+
+
+atexit.register(stop_queue_logging)
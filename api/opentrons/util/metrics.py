@@ -0,0 +1,213 @@
+"""
+Process-wide metrics, exposed by the server in the Prometheus text format.
+
+Metrics are updated from the motion thread, so updating one must never wait
+for another thread. :class:`Counter` and :class:`Summary` keep one cell per
+thread that only that thread writes to, without a lock; reading a metric
+adds the cells up. Cells of threads that have exited are folded into a base
+value when the metric is read. :class:`Gauge` calls a function when it is
+read and costs nothing otherwise.
+
+Modules create their metrics once, at import::
+
+    COMMANDS = metrics.counter(
+        'opentrons_commands_executed_total', 'Commands run by the robot')
+    ...
+    COMMANDS.inc()
+"""
+import threading
+
+from opentrons.util.histogram import Histogram
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+SUMMARY_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class _PerThreadMetric(object):
+    """
+    Base class of metrics made of a value per thread
+    """
+    type = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # (thread, value) of every thread that updated the metric
+        self._cells = []
+        self._base = self._create_value()
+
+    def _create_value(self):
+        raise NotImplementedError
+
+    def _get_value(self):
+        try:
+            return self._local.value
+        except AttributeError:
+            cell = (threading.current_thread(), self._create_value())
+            with self._lock:
+                self._cells.append(cell)
+            self._local.value = cell[1]
+            return cell[1]
+
+    def _get_values(self):
+        """
+        Returns the values of every thread, after folding the values
+        of exited threads into the base value
+        """
+        with self._lock:
+            for cell in list(self._cells):
+                thread, value = cell
+                if not thread.is_alive():
+                    self._merge(self._base, value)
+                    self._cells.remove(cell)
+            return [self._base] + [value for _, value in self._cells]
+
+    def _merge(self, value, other):
+        raise NotImplementedError
+
+    def collect(self):
+        """
+        Returns the samples of the metric as (suffix, labels, value)
+        """
+        raise NotImplementedError
+
+
+class Counter(_PerThreadMetric):
+    """
+    Monotonically increasing count
+    """
+    type = 'counter'
+
+    def _create_value(self):
+        return [0]
+
+    def _merge(self, value, other):
+        value[0] += other[0]
+
+    def inc(self, amount=1):
+        self._get_value()[0] += amount
+
+    def get(self):
+        return sum(value[0] for value in self._get_values())
+
+    def collect(self):
+        return [('', '', self.get())]
+
+
+class Summary(_PerThreadMetric):
+    """
+    Distribution of observed values, reported as quantiles with their
+    sum and count, see :class:`~opentrons.util.histogram.Histogram`
+    """
+    type = 'summary'
+
+    def _create_value(self):
+        return Histogram()
+
+    def _merge(self, value, other):
+        value.merge(other)
+
+    def observe(self, value):
+        self._get_value().add(value)
+
+    def get(self):
+        """
+        Returns a :class:`Histogram` of every observed value
+        """
+        histogram = Histogram()
+        for value in self._get_values():
+            histogram.merge(value)
+        return histogram
+
+    def collect(self):
+        histogram = self.get()
+        samples = []
+        if histogram.count:
+            samples.extend(
+                ('', '{{quantile="{}"}}'.format(quantile),
+                 histogram.get_quantile(quantile))
+                for quantile in SUMMARY_QUANTILES)
+        samples.append(('_sum', '', histogram.total))
+        samples.append(('_count', '', histogram.count))
+        return samples
+
+
+class Gauge(object):
+    """
+    Value read from :function: when the metric is collected
+    """
+    type = 'gauge'
+
+    def __init__(self, name, documentation, function):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+
+    def get(self):
+        return self.function()
+
+    def collect(self):
+        return [('', '', self.get())]
+
+
+class Registry(object):
+    """
+    Metrics reported together, by name
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """
+        Adds :metric: and returns it, or returns the metric already
+        registered under its name
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """
+        Returns every metric in the Prometheus text exposition format
+        """
+        lines = []
+        for name in sorted(self._metrics):
+            metric = self._metrics[name]
+            lines.append('# HELP {} {}'.format(name, metric.documentation))
+            lines.append('# TYPE {} {}'.format(name, metric.type))
+            for suffix, labels, value in metric.collect():
+                lines.append('{}{}{} {}'.format(
+                    name, suffix, labels, _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+
+def _format_value(value):
+    if value is None:
+        return 'NaN'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, registry=REGISTRY):
+    return registry.register(Counter(name, documentation))
+
+
+def summary(name, documentation, registry=REGISTRY):
+    return registry.register(Summary(name, documentation))
+
+
+def gauge(name, documentation, function, registry=REGISTRY):
+    return registry.register(Gauge(name, documentation, function))
+
+
+def render(registry=REGISTRY):
+    return registry.render()
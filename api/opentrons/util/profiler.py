@@ -0,0 +1,300 @@
+"""
+Sampling profiler for protocols.
+
+:class:`SamplingProfiler` samples the stack of a thread from a background
+thread every ``interval`` seconds, so the profiled code runs at full speed
+between samples. Each sample is attributed to:
+
+    * the opentrons subsystem of its innermost opentrons frame (labware,
+      calibration, planning, driver, events, instruments, robot)
+    * the innermost line of the protocol file(s) on the stack, or the line
+      given by the caller (e.g. the line that enqueued the command being
+      run by :meth:`Robot.simulate`, see :func:`get_protocol_source`)
+    * a context label given by the caller (e.g. the type of that command)
+
+:class:`Profile` holds the samples as collapsed stacks, the input format
+of flamegraph tools (``frame;frame;frame count`` per line, outermost frame
+first), and summarizes them with :meth:`Profile.get_summary`.
+"""
+from collections import Counter, OrderedDict
+import os
+import sys
+import threading
+import time
+
+
+DEFAULT_INTERVAL = 0.005
+
+# path in the opentrons package -> subsystem, first match wins
+SUBSYSTEMS = (
+    ('containers/calibrator', 'calibration'),
+    ('instruments/calibration_store', 'calibration'),
+    ('helpers/transfer_plan', 'planning'),
+    ('containers', 'labware'),
+    ('drivers', 'driver'),
+    ('util/trace', 'events'),
+    ('server/telemetry', 'events'),
+    ('instruments', 'instruments'),
+    ('robot', 'robot'),
+)
+
+OPENTRONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# running profilers, and the union of their protocol files
+_running = []
+_running_lock = threading.Lock()
+_running_protocol_files = frozenset()
+
+
+def _set_running(profiler, running):
+    global _running_protocol_files
+    with _running_lock:
+        if running:
+            _running.append(profiler)
+        else:
+            _running.remove(profiler)
+        _running_protocol_files = frozenset(
+            path for p in _running for path in p.protocol_files)
+
+
+def get_protocol_source(frame):
+    """
+    Returns the (filename, line number) of the innermost frame of a
+    protocol file from :frame: outwards, or *None*
+
+    Only the protocol files of running profilers are looked for, so this
+    returns *None* right away when nothing is being profiled
+    """
+    protocol_files = _running_protocol_files
+    if not protocol_files:
+        return None
+    while frame is not None:
+        if frame.f_code.co_filename in protocol_files:
+            return frame.f_code.co_filename, frame.f_lineno
+        frame = frame.f_back
+    return None
+
+
+def get_source_label(source):
+    """
+    Returns the ``file:line`` label of a (filename, line number) pair
+    """
+    filename, lineno = source
+    return '{}:{}'.format(os.path.basename(filename), lineno)
+
+
+class Profile(object):
+    """
+    Samples taken by a :class:`SamplingProfiler`
+    """
+    def __init__(self, interval, protocol_files=()):
+        self.interval = interval
+        self.protocol_files = frozenset(protocol_files)
+        self.duration = 0
+        self.samples = 0
+        self.stacks = Counter()
+        self.subsystems = Counter()
+        self.protocol_lines = Counter()
+        self.contexts = Counter()
+        self.functions = Counter()
+        # code object -> (label prefix, subsystem, is protocol), lives as
+        # long as the profile
+        self._frame_info = {}
+
+    def _get_frame_info(self, code):
+        info = self._frame_info.get(code)
+        if info is not None:
+            return info
+
+        filename = code.co_filename
+        if filename in self.protocol_files:
+            info = (os.path.basename(filename), None, True)
+        elif filename.startswith(OPENTRONS_DIR + os.sep):
+            path = os.path.splitext(os.path.relpath(
+                filename, OPENTRONS_DIR))[0].replace(os.sep, '/')
+            subsystem = 'opentrons'
+            for prefix, name in SUBSYSTEMS:
+                if path == prefix or path.startswith(prefix + '/'):
+                    subsystem = name
+                    break
+            module = 'opentrons.' + path.replace('/', '.')
+            info = ('{}:{}'.format(module, code.co_name), subsystem, False)
+        else:
+            module = os.path.splitext(os.path.basename(filename))[0]
+            info = ('{}:{}'.format(module, code.co_name), None, False)
+        self._frame_info[code] = info
+        return info
+
+    def _walk_stack(self, frame):
+        """
+        Returns the labels of the stack (innermost first), its innermost
+        subsystem and innermost protocol line
+        """
+        labels = []
+        subsystem = None
+        protocol_line = None
+        while frame is not None:
+            label, frame_subsystem, is_protocol = self._get_frame_info(
+                frame.f_code)
+            if is_protocol:
+                label = '{}:{}'.format(label, frame.f_lineno)
+                protocol_line = protocol_line or label
+            subsystem = subsystem or frame_subsystem
+            labels.append(label.replace(';', ':'))
+            frame = frame.f_back
+        return labels, subsystem, protocol_line
+
+    def add_sample(self, frame, context=None, source=None):
+        """
+        Adds the stack of :frame:, labelled with :context:
+
+        :source: is the (filename, line number) of the protocol line the
+        sample belongs to, when it is not on the stack (e.g. the line that
+        enqueued the command being run)
+        """
+        labels, subsystem, protocol_line = self._walk_stack(frame)
+        if context is not None:
+            labels.append(context)
+        if source is not None:
+            protocol_line = get_source_label(source)
+            labels.append(protocol_line)
+        labels.reverse()
+
+        self.samples += 1
+        self.stacks[tuple(labels)] += 1
+        self.subsystems[
+            subsystem or ('protocol' if protocol_line else 'other')] += 1
+        if protocol_line:
+            self.protocol_lines[protocol_line] += 1
+        if context is not None:
+            self.contexts[context] += 1
+        if labels:
+            self.functions[labels[-1]] += 1
+
+    def get_collapsed_stacks(self):
+        """
+        Returns the samples in the collapsed stack format
+        """
+        return ''.join(
+            '{} {}\n'.format(';'.join(stack), count)
+            for stack, count in sorted(self.stacks.items())
+        )
+
+    def write_collapsed_stacks(self, file_path):
+        with open(file_path, 'w') as f:
+            f.write(self.get_collapsed_stacks())
+
+    def get_top(self, top=10):
+        """
+        Returns the :top: entries of each breakdown as
+        ``{breakdown: [(name, samples)]}``
+        """
+        return OrderedDict([
+            ('subsystems', self.subsystems.most_common(top)),
+            ('protocol_lines', self.protocol_lines.most_common(top)),
+            ('contexts', self.contexts.most_common(top)),
+            ('functions', self.functions.most_common(top))
+        ])
+
+    def get_summary(self, top=10):
+        """
+        Returns a text summary of where the samples were taken
+        """
+        lines = ['{} samples over {:.2f}s ({:.1f}ms interval)'.format(
+            self.samples, self.duration, self.interval * 1000)]
+        titles = {
+            'subsystems': 'Subsystems',
+            'protocol_lines': 'Protocol lines',
+            'contexts': 'Commands',
+            'functions': 'Functions (self)'
+        }
+        for breakdown, entries in self.get_top(top).items():
+            if not entries:
+                continue
+            lines.append('')
+            lines.append(titles[breakdown])
+            for name, count in entries:
+                lines.append('  {:>6.1%}  {}'.format(
+                    count / self.samples, name))
+        return '\n'.join(lines) + '\n'
+
+
+class SamplingProfiler(object):
+    """
+    Samples the stack of the thread that started it
+
+    Parameters
+    ----------
+    interval : float
+        Seconds between samples, in practice at least the interpreter's
+        switch interval (Default: 5ms)
+
+    protocol_files : list
+        Paths of the protocol files, whose lines the samples are attributed
+        to (Default: the file of the code starting the profiler)
+
+    get_context : callable
+        Called for each sample, returns *None* or a ``(label, source)``
+        pair: the label the sample is attributed to, and the (filename,
+        line number) of the protocol line it belongs to, or *None*
+
+    Examples
+    --------
+    ..
+    >>> with SamplingProfiler() as profiler:
+    >>>     robot.simulate()
+    >>> print(profiler.profile.get_summary())
+    """
+    def __init__(self,
+                 interval=DEFAULT_INTERVAL,
+                 protocol_files=None,
+                 get_context=None):
+        self.interval = interval
+        self.protocol_files = protocol_files
+        self.get_context = get_context
+        self.profile = None
+        self._thread_id = None
+        self._sampler = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        if self.protocol_files is None:
+            self.protocol_files = [sys._getframe(1).f_code.co_filename]
+        self.profile = Profile(self.interval, self.protocol_files)
+        self._thread_id = threading.get_ident()
+        self._stopping.clear()
+        self._start_time = time.perf_counter()
+        self._sampler = threading.Thread(
+            target=self._run, name='profiler', daemon=True)
+        self._sampler.start()
+        _set_running(self, True)
+
+    def stop(self):
+        """
+        Stops sampling and returns the :class:`Profile`
+        """
+        _set_running(self, False)
+        self._stopping.set()
+        self._sampler.join()
+        self._sampler = None
+        self.profile.duration = time.perf_counter() - self._start_time
+        return self.profile
+
+    def __enter__(self):
+        if self.protocol_files is None:
+            # the caller of the context manager, not of start()
+            self.protocol_files = [sys._getframe(1).f_code.co_filename]
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            context = self.get_context() if self.get_context else None
+            self.profile.add_sample(frame, *(context or ()))
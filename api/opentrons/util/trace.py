@@ -1,31 +1,46 @@
+from collections import deque
 from functools import wraps
 import inspect
+import threading
+
+from opentrons.util import metrics
+from opentrons.util.log import get_logger
+
+
+log = get_logger(__name__)
+
+# high-frequency events of which only the latest value matters
+COALESCED_EVENTS = ('move-finished', 'countdown')
 
 
 def traceable(*args):
     def _traceable(f):
+        # Introspect once, not on every call
+        spec = inspect.getfullargspec(f)
+        arg_names = spec.args
+        defaults = {}
+        if spec.defaults:
+            defaults = dict(
+                zip(reversed(spec.args), reversed(spec.defaults)))
+
         @wraps(f)
         def decorated(*args, **kwargs):
             res = f(*args, **kwargs)
             broker = EventBroker.get_instance()
 
-            # Create the initial dictionary with args that have defaults
-            args_dict = {}
+            # Nobody is listening, skip building the arguments
+            if not broker.has_listeners(name):
+                return res
 
-            if inspect.getargspec(f).defaults:
-                args_dict = dict(
-                    zip(
-                        reversed(inspect.getargspec(f).args),
-                        reversed(inspect.getargspec(f).defaults)))
+            # Create the initial dictionary with args that have defaults
+            args_dict = dict(defaults)
 
             # Update / insert values for positional args
-            args_dict.update(dict(zip(inspect.getargspec(f).args, args)))
+            args_dict.update(zip(arg_names, args))
 
             # Update it with values for named args
             args_dict.update(kwargs)
 
-            # args_dict = {k: str(v) for k, v in args_dict.items()}
-
             broker.notify({
                 'name': name,
                 'function': f.__qualname__,
@@ -51,23 +66,231 @@ def traceable(*args):
 
 
 class EventBroker(object):
+    """
+    Dispatches event dicts to listeners
+
+    Listeners added without ``names`` receive every event, others only
+    receive events whose ``'name'`` is one of the names they subscribed to
+
+    By default listeners are called inline by :meth:`notify`. After
+    :meth:`start_async` events are put on a bounded ring buffer instead and
+    delivered from a dispatcher thread, so a slow listener never blocks
+    the caller (e.g. the motion loop)
+    """
     _instance = None
 
     def __init__(self):
         self.listeners = []
+        self.named_listeners = {}
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pending = {}
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._dispatcher = None
+        self.interval = 0
+        self.coalesced_events = ()
+        self.reset_stats()
+
+    def add(self, f, names=None):
+        """
+        Subscribes :f: to events
+
+        Parameters
+        ----------
+        f : callable
+            Called with the event dict
 
-    def add(self, f):
-        self.listeners.append(f)
+        names : str or list
+            Event name(s) to subscribe to (Default: all events)
+        """
+        if names is None:
+            self.listeners.append(f)
+            return
+        if isinstance(names, str):
+            names = [names]
+        for name in names:
+            self.named_listeners.setdefault(name, []).append(f)
 
     def remove(self, f):
-        self.listeners.remove(f)
+        found = False
+        if f in self.listeners:
+            self.listeners.remove(f)
+            found = True
+        for name, listeners in list(self.named_listeners.items()):
+            if f in listeners:
+                listeners.remove(f)
+                found = True
+            if not listeners:
+                del self.named_listeners[name]
+        if not found:
+            raise ValueError('{} is not a listener'.format(f))
+
+    def get_queue_depth(self):
+        """
+        Returns the number of events waiting to be delivered
+        """
+        queue = self._queue
+        return len(queue) if queue is not None else 0
+
+    def has_listeners(self, name=None):
+        """
+        Returns *True* if an event called :name: would reach a listener
+        """
+        return bool(self.listeners) or name in self.named_listeners
 
     def notify(self, arguments):
+        if self._queue is None:
+            self._dispatch(arguments)
+        else:
+            self._enqueue(arguments)
+
+    def _dispatch(self, arguments):
         for listener in self.listeners:
             listener(arguments)
+        for listener in self.named_listeners.get(arguments.get('name'), ()):
+            listener(arguments)
+
+    def is_async(self):
+        return self._queue is not None
+
+    def start_async(
+            self,
+            max_size=1000,
+            interval=0.05,
+            coalesced_events=COALESCED_EVENTS):
+        """
+        Delivers events from a dispatcher thread instead of inline
+
+        Parameters
+        ----------
+        max_size : int
+            Size of the ring buffer, when it is full the oldest
+            event is dropped (Default: 1000)
+
+        interval : float
+            Seconds between deliveries. Events listed in
+            :coalesced_events: that are emitted more than once within
+            that time are only delivered with their latest value
+            (Default: 0.05)
+
+        coalesced_events : tuple
+            Names of the events to coalesce
+            (Default: ``move-finished`` and ``countdown``)
+        """
+        if self.is_async():
+            self.stop_async()
+
+        self.interval = interval
+        self.coalesced_events = tuple(coalesced_events)
+        self._pending = {}
+        self._queue = deque(maxlen=max_size)
+        self._stopping.clear()
+        self._dispatcher = threading.Thread(
+            target=self._run_dispatcher,
+            name='event-broker',
+            daemon=True)
+        self._dispatcher.start()
+
+    def stop_async(self):
+        """
+        Delivers queued events, stops the dispatcher thread and
+        goes back to calling listeners inline
+        """
+        if not self.is_async():
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._dispatcher.join()
+        self._dispatcher = None
+        self._flush(stop=True)
+
+    def flush(self):
+        """
+        Delivers all queued events from the calling thread
+        """
+        if self.is_async():
+            self._flush()
+
+    def reset_stats(self):
+        self.stats = {
+            'queued': 0,
+            'dispatched': 0,
+            'coalesced': 0,
+            'dropped': 0,
+            'listener_errors': 0
+        }
+
+    def _enqueue(self, arguments):
+        name = arguments.get('name')
+        with self._lock:
+            queue = self._queue
+            if queue is not None:
+                self._put(queue, name, arguments)
+        if queue is None:
+            # stop_async() was called after notify() checked the mode
+            self._dispatch(arguments)
+        else:
+            self._wakeup.set()
+
+    def _put(self, queue, name, arguments):
+        self.stats['queued'] += 1
+        # replace the value of an undelivered event of the same name,
+        # keeping its place in the queue
+        if name in self.coalesced_events:
+            entry = self._pending.get(name)
+            if entry is not None:
+                entry[0] = arguments
+                self.stats['coalesced'] += 1
+                return
+            entry = [arguments]
+            self._pending[name] = entry
+        else:
+            entry = [arguments]
+
+        if len(queue) == queue.maxlen:
+            dropped = queue.popleft()
+            dropped_name = dropped[0].get('name')
+            if self._pending.get(dropped_name) is dropped:
+                del self._pending[dropped_name]
+            self.stats['dropped'] += 1
+        queue.append(entry)
+
+    def _flush(self, stop=False):
+        with self._lock:
+            if self._queue is None:
+                return
+            entries = list(self._queue)
+            self._queue.clear()
+            self._pending = {}
+            if stop:
+                self._queue = None
+
+        for entry in entries:
+            try:
+                self._dispatch(entry[0])
+            except Exception:
+                self.stats['listener_errors'] += 1
+                log.exception('Event listener failed')
+        self.stats['dispatched'] += len(entries)
+
+    def _run_dispatcher(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self._flush()
+            # gives coalesced events time to be replaced
+            self._stopping.wait(self.interval)
 
     @classmethod
     def get_instance(cls):
         if not cls._instance:
             cls._instance = EventBroker()
         return cls._instance
+
+
+metrics.gauge(
+    'opentrons_event_queue_depth',
+    'Events waiting to be delivered to listeners',
+    lambda: EventBroker.get_instance().get_queue_depth())
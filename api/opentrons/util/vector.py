@@ -18,6 +18,7 @@ class VectorValue(tuple):
     __slots__ = ()
 
     _fields = ('x', 'y', 'z')
+    _field_defaults = {}
 
     def __new__(_cls, x, y, z):
         'Create new instance of VectorValue(x, y, z)'
@@ -0,0 +1,119 @@
+import time
+import unittest
+
+from opentrons import containers, instruments
+from opentrons.containers.liquid_tracker import (
+    LiquidTracker, OVERFLOW, UNDERFLOW
+)
+from opentrons.robot import Robot
+
+
+class LiquidTrackerTestCase(unittest.TestCase):
+    def setUp(self):
+        Robot.reset_for_tests()
+        self.plate = containers.load('96-flat', 'B1', 'plate')
+        self.tracker = LiquidTracker()
+
+    def test_volumes(self):
+        self.assertIsNone(self.tracker.get_volume(self.plate[0]))
+
+        self.tracker.set_volume(self.plate.rows[0], 100)
+        self.tracker.aspirate(self.plate[0], 30)
+        self.tracker.dispense(self.plate[8].top(), 50)
+        # unknown volumes are not checked
+        self.tracker.aspirate(self.plate[9], 30)
+
+        volumes = self.tracker.get_volumes(self.plate)
+        self.assertEqual(volumes[:3], [70, 100, 100])
+        self.assertEqual(volumes[8:10], [50, None])
+        self.assertEqual(self.tracker.get_total_volume(self.plate), 820)
+        self.assertEqual(self.tracker.get_issues(), [])
+
+        self.tracker.reset()
+        self.assertEqual(self.tracker.get_volume(self.plate[0]), 100)
+        self.assertIsNone(self.tracker.get_volume(self.plate[8]))
+
+    def test_issues(self):
+        max_volume = self.plate[0].max_volume()
+        self.tracker.set_volume(self.plate[0], 10)
+        self.tracker.aspirate(self.plate[0], 15)
+        self.tracker.aspirate(self.plate[0], 20)
+        self.tracker.dispense(self.plate[1], max_volume + 5)
+
+        self.assertEqual(self.tracker.get_issues(), [
+            (self.plate[0], UNDERFLOW, 20, 2),
+            (self.plate[1], OVERFLOW, 5, 1)
+        ])
+        self.assertEqual(len(self.tracker.get_warnings()), 2)
+        self.assertIn('(2 times)', self.tracker.get_warnings()[0])
+
+    def test_384_plate(self):
+        plate = containers.load('384-plate', 'C1')
+        self.tracker.set_volume(plate, 50)
+        start = time.time()
+        for _ in range(10):
+            for well in plate:
+                self.tracker.aspirate(well, 1)
+                self.tracker.dispense(well, 1)
+        print('Tracked {} transfers in {:.3f}s'.format(
+            len(plate) * 10, time.time() - start))
+        self.assertEqual(self.tracker.get_total_volume(plate), 50 * 384)
+
+
+class PipetteLiquidTrackingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.robot = Robot.reset_for_tests()
+        self.robot.connect()
+        self.trough = containers.load('trough-12row', 'B2', 'trough')
+        self.plate = containers.load('96-flat', 'B1', 'plate')
+        self.p200 = instruments.Pipette(
+            axis='b', name='p200-liquid', max_volume=200)
+        self.tracker = self.robot.enable_liquid_tracking()
+
+    def test_simulate_warnings(self):
+        self.tracker.set_volume(self.trough['A1'], 500)
+        self.p200.distribute(
+            100, self.trough['A1'], self.plate.rows[0], disposal_vol=0,
+            air_gap=10, new_tip='never')
+
+        warnings = self.robot.simulate()
+        # 190uL fit with the air gap, so each well takes one aspirate
+        self.assertEqual(warnings, [
+            'Aspirating 100.0uL more than {} holds (3 times)'.format(
+                repr(self.trough['A1']))
+        ])
+        self.assertEqual(self.tracker.get_volume(self.trough['A1']), 0)
+        # air gaps do not end up in the wells
+        self.assertEqual(self.tracker.get_volume(self.plate['A1']), 100)
+
+        self.tracker.set_volume(self.trough['A1'], 800)
+        self.assertEqual(self.robot.simulate(), [])
+
+    def test_multi_channel(self):
+        p200_multi = instruments.Pipette(
+            axis='a', name='p200-liquid-multi', max_volume=200, channels=8)
+        self.tracker.set_volume(self.trough['A2'], 1000)
+        p200_multi.aspirate(50, self.trough['A2'])
+        p200_multi.dispense(self.plate.rows[1])
+
+        self.assertEqual(self.tracker.get_volume(self.trough['A2']), 600)
+        self.assertEqual(
+            self.tracker.get_volumes(self.plate)[8:16], [50] * 8)
+
+    def test_mix_and_blow_out(self):
+        well = self.plate['A1']
+        self.tracker.set_volume(well, 100)
+        self.p200.mix(3, 50, well)
+        self.assertEqual(self.tracker.get_volume(well), 100)
+
+        # in place, the liquid is taken from and returned to the well
+        self.p200.aspirate(30)
+        self.assertEqual(self.tracker.get_volume(well), 70)
+        self.p200.blow_out(well)
+        self.assertEqual(self.tracker.get_volume(well), 100)
+
+        self.p200.aspirate(40, well).air_gap(20)
+        self.p200.blow_out()
+        self.assertEqual(self.tracker.get_volume(well), 100)
+        self.assertEqual(self.tracker.get_issues(), [])
+        self.assertEqual(self.robot.simulate(), [])
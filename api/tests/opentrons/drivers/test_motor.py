@@ -3,9 +3,22 @@ from threading import Thread
 import unittest
 
 from opentrons import Robot
+from opentrons.drivers import motor
 from opentrons.util.vector import Vector
 
 
+class SerialPort(object):
+    """
+    Passes everything to a virtual smoothie without being one,
+    like a serial port connected to a smoothie
+    """
+    def __init__(self, device):
+        self.device = device
+
+    def __getattr__(self, name):
+        return getattr(self.device, name)
+
+
 class OpenTronsTest(unittest.TestCase):
 
     def setUp(self):
@@ -219,6 +232,25 @@ class OpenTronsTest(unittest.TestCase):
 
         self.motor.home()
 
+    def test_metrics(self):
+        exchanges = motor.SERIAL_EXCHANGES.get()
+        latencies = motor.SERIAL_LATENCY.get().count
+        limit_hits = motor.LIMIT_SWITCH_HITS.get()
+
+        # traffic with virtual smoothies is not counted
+        self.motor.get_position()
+        self.assertEqual(motor.SERIAL_EXCHANGES.get(), exchanges)
+
+        self.motor.connection = SerialPort(self.motor.connection)
+        self.motor.get_position()
+        self.assertEqual(motor.SERIAL_EXCHANGES.get(), exchanges + 1)
+        self.assertEqual(motor.SERIAL_LATENCY.get().count, latencies + 1)
+
+        self.motor.home()
+        self.assertRaises(
+            RuntimeWarning, self.motor.move_head, x=-100)
+        self.assertEqual(motor.LIMIT_SWITCH_HITS.get(), limit_hits + 1)
+
     def test_move_x(self):
         self.motor.ot_version = None
         success = self.motor.move_head(x=100)
@@ -341,3 +373,55 @@ class OpenTronsTest(unittest.TestCase):
 
         res = self.motor.power_off()
         self.assertTrue(res)
+
+    def test_peephole_skips_noop_moves(self):
+        self.motor.peephole = True
+        self.addCleanup(setattr, self.motor, 'peephole', False)
+        self.motor.home()
+        self.motor.move_head(x=100, y=100, z=30)
+        self.motor.move_plunger(b=5)
+
+        stats = self.motor.connection.get_stats()
+        self.assertTrue(self.motor.move_head(x=100, y=100))
+        self.assertTrue(self.motor.move_plunger(b=5))
+        self.assertTrue(self.motor.move_head(mode='relative', x=0))
+        self.assertTrue(self.motor.move_head(z=30))
+        self.assertEqual(
+            self.motor.connection.get_stats()['moves'], stats['moves'])
+
+        self.motor.peephole = False
+        self.motor.move_head(x=100, y=100)
+        self.assertEqual(
+            self.motor.connection.get_stats()['moves'], stats['moves'] + 1)
+
+    def test_peephole_coordinate_system(self):
+        self.motor.peephole = True
+        self.addCleanup(setattr, self.motor, 'peephole', False)
+        self.motor.set_coordinate_system('absolute')
+        commands = self.motor.connection.get_stats()['commands']
+        self.motor.set_coordinate_system('absolute')
+        self.assertEqual(
+            self.motor.connection.get_stats()['commands'], commands)
+        self.motor.set_coordinate_system('relative')
+        self.assertEqual(
+            self.motor.connection.get_stats()['commands'], commands + 1)
+
+    def test_handshake_cache(self):
+        def count_commands(func):
+            commands = self.motor.connection.get_stats()['commands']
+            func()
+            return self.motor.connection.get_stats()['commands'] - commands
+
+        self.robot.versions()
+        self.assertEqual(count_commands(self.robot.versions), 0)
+        self.motor.ot_version = None
+        self.assertEqual(count_commands(self.motor.get_dimensions), 0)
+
+        self.motor.set_steps_per_mm('x', 80.0)
+        # one M92 for all axis, plus M119 for the switches
+        self.assertEqual(count_commands(self.robot.diagnostics), 2)
+        self.assertEqual(count_commands(self.robot.diagnostics), 1)
+
+        self.motor.connect(self.motor.connection)
+        self.assertGreater(
+            count_commands(lambda: self.motor.get_steps_per_mm('y')), 0)
@@ -0,0 +1,95 @@
+import threading
+import time
+import unittest
+
+from opentrons import Robot
+from opentrons.drivers import serial_arbiter
+from opentrons.drivers.serial_arbiter import SerialArbiter
+
+
+class SerialArbiterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.arbiter = SerialArbiter()
+        self.order = []
+
+    def request(self, name, priority):
+        def _request():
+            with self.arbiter.link(priority):
+                self.order.append(name)
+        thread = threading.Thread(target=_request)
+        thread.start()
+        return thread
+
+    def wait_for_waiting(self, count):
+        while len(self.arbiter._waiting) < count:
+            time.sleep(0.001)
+
+    def test_priority(self):
+        with self.arbiter.link():
+            # reentrant
+            with self.arbiter.link():
+                pass
+            threads = [self.request('query', serial_arbiter.QUERY)]
+            self.wait_for_waiting(1)
+            threads.append(self.request('motion', serial_arbiter.MOTION))
+            self.wait_for_waiting(2)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.order, ['motion', 'query'])
+
+    def test_queries_are_not_starved(self):
+        with self.arbiter.link():
+            query = self.request('query', serial_arbiter.QUERY)
+            self.wait_for_waiting(1)
+
+        for i in range(serial_arbiter.MAX_OVERTAKES + 5):
+            with self.arbiter.link(serial_arbiter.MOTION):
+                self.order.append(i)
+        query.join()
+        self.assertIn('query', self.order[:serial_arbiter.MAX_OVERTAKES + 1])
+
+    def test_release_by_other_thread(self):
+        self.assertRaises(RuntimeError, self.arbiter.release)
+
+
+class CachedQueriesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.robot = Robot.reset_for_tests()
+        self.robot.connect()
+        self.robot.home(enqueue=False)
+        self.driver = self.robot._driver
+
+    def test_queries_during_run(self):
+        self.driver.move_head(x=100, y=100)
+        self.driver.get_endstop_switches()
+        self.driver.get_steps_per_mm('x')
+
+        in_run = threading.Event()
+        finish_run = threading.Event()
+
+        def _run():
+            with self.driver.arbiter.motion():
+                in_run.set()
+                finish_run.wait()
+
+        thread = threading.Thread(target=_run)
+        thread.start()
+        in_run.wait()
+        try:
+            commands = self.driver.connection.get_stats()['commands']
+            position = self.driver.get_position()
+            self.assertEqual(position['target']['x'], 100)
+            self.assertEqual(
+                self.driver.get_endstop_switches()['x'], False)
+            self.assertEqual(self.driver.get_steps_per_mm('x'), 80.0)
+            self.assertTrue(self.robot.versions()['firmware']['compatible'])
+            self.assertEqual(
+                self.driver.connection.get_stats()['commands'], commands)
+        finally:
+            finish_run.set()
+            thread.join()
+
+        # outside of a run queries go to the smoothie
+        self.driver.get_position()
+        self.assertEqual(
+            self.driver.connection.get_stats()['commands'], commands + 1)
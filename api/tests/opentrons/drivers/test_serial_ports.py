@@ -0,0 +1,74 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from collections import namedtuple
+from unittest import mock
+
+from opentrons.drivers import serial_ports
+from opentrons.drivers.serial_ports import PortScanner
+
+
+PortInfo = namedtuple('PortInfo', ['device', 'vid', 'pid'])
+
+
+@unittest.skipUnless(
+    sys.platform.startswith('linux'), 'uses Linux pseudo-terminals')
+class PortScannerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.ptys = []
+        self.smoothie = self.create_port('ttyACM0')
+        self.adapter = self.create_port('ttyUSB0')
+        self.missing = os.path.join(self.dir, 'ttyUSB1')
+        self.other = self.create_port('ttyS0')
+
+        self.comports = [
+            PortInfo(self.smoothie, 0x1d50, 0x6015),
+            PortInfo(self.adapter, 0x0403, 0x6001),
+            PortInfo(self.missing, None, None),
+            PortInfo(self.other, None, None)
+        ]
+        patcher = mock.patch.object(
+            serial_ports.list_ports, 'comports', return_value=self.comports)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.scanner = PortScanner(ttl=60)
+
+    def tearDown(self):
+        for fd in self.ptys:
+            os.close(fd)
+        shutil.rmtree(self.dir)
+
+    def create_port(self, name):
+        master, slave = os.openpty()
+        self.ptys.extend([master, slave])
+        path = os.path.join(self.dir, name)
+        os.symlink(os.ttyname(slave), path)
+        return path
+
+    def test_list_ports(self):
+        with mock.patch.object(
+                self.scanner, 'probe', wraps=self.scanner.probe) as probe:
+            ports = self.scanner.list_ports()
+            self.assertEqual(ports, [self.smoothie, self.adapter])
+            # known USB ids are not opened
+            self.assertEqual(
+                sorted(c[0][0] for c in probe.call_args_list),
+                sorted([self.adapter, self.missing]))
+
+            # cached until the TTL passes
+            self.scanner.list_ports()
+            self.assertEqual(probe.call_count, 2)
+
+            self.comports.pop(0)
+            self.assertEqual(
+                self.scanner.list_ports(refresh=True), [self.adapter])
+
+    def test_ttl(self):
+        self.scanner.ttl = 0
+        self.scanner.list_ports()
+        self.comports.pop(1)
+        self.assertEqual(self.scanner.list_ports(), [self.smoothie])
@@ -0,0 +1,148 @@
+import os
+import shutil
+import struct
+import tempfile
+import time
+import unittest
+
+from opentrons.drivers import motor, serial_recorder
+from opentrons.drivers.serial_recorder import ReplayDevice, ReplayMismatch
+from opentrons.robot.robot import Robot
+
+
+def write_session(file_path, events, port='/dev/ttyACM0'):
+    port = port.encode()
+    with open(file_path, 'wb') as f:
+        f.write(serial_recorder.MAGIC)
+        f.write(serial_recorder.HEADER.pack(
+            serial_recorder.VERSION, len(port)))
+        f.write(port)
+        for kind, delta, payload in events:
+            f.write(serial_recorder.RECORD.pack(
+                kind, int(delta * 1e6), len(payload)))
+            f.write(payload)
+
+
+class SerialRecorderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'session.otsr')
+
+    def tearDown(self):
+        Robot().disconnect()
+        shutil.rmtree(self.dir)
+
+    def run_protocol(self, robot):
+        robot.home(enqueue=False)
+        robot.move_head(x=100, y=150, z=30)
+        robot.move_head(x=120, y=100)
+        return robot._driver.get_head_position()['current']
+
+    def test_record_and_replay(self):
+        robot = Robot.reset_for_tests()
+        robot.connect(options={'record': self.file_path})
+        recorder = robot._driver.connection
+        # a recorded virtual smoothie is still a simulation
+        self.assertTrue(robot.is_simulating())
+        position = self.run_protocol(robot)
+        robot.disconnect()
+        self.assertIsNone(recorder._file)
+
+        port, events = serial_recorder.read_session(self.file_path)
+        self.assertEqual(port, Robot.VIRTUAL_SMOOTHIE_PORT)
+        writes = [e for e in events if e[0] == serial_recorder.WRITE]
+        reads = [e for e in events if e[0] == serial_recorder.READ and e[2]]
+        self.assertGreater(len(writes), 5)
+        self.assertGreater(len(reads), 5)
+        times = [seconds for _, seconds, _ in events]
+        self.assertEqual(times, sorted(times))
+
+        robot = Robot.reset_for_tests()
+        robot.connect(options={'replay': self.file_path, 'speed': None})
+        self.assertEqual(self.run_protocol(robot), position)
+        self.assertEqual(robot._driver.get_connected_port(), port)
+
+    def test_replay_is_not_live(self):
+        robot = Robot.reset_for_tests()
+        robot.connect(options={'record': self.file_path})
+        self.run_protocol(robot)
+        robot.disconnect()
+
+        def get_metrics():
+            return (
+                motor.SERIAL_EXCHANGES.get(),
+                motor.SERIAL_LATENCY.get().count,
+                motor.LIMIT_SWITCH_HITS.get())
+        values = get_metrics()
+
+        robot = Robot.reset_for_tests()
+        robot.connect(options={'replay': self.file_path, 'speed': 10})
+        self.assertTrue(robot.is_simulating())
+        self.run_protocol(robot)
+        # delays are divided by the speed of the replay
+        start = time.perf_counter()
+        robot._driver.wait(1)
+        self.assertAlmostEqual(time.perf_counter() - start, 0.1, delta=0.05)
+        self.assertEqual(get_metrics(), values)
+
+    def test_reconnect_stops_recording(self):
+        robot = Robot.reset_for_tests()
+        robot.connect(options={'record': self.file_path})
+        recorder = robot._driver.connection
+        robot.home(enqueue=False)
+        robot.connect()
+        self.assertIsNone(recorder._file)
+        _, events = serial_recorder.read_session(self.file_path)
+        self.assertTrue(any(e[0] == serial_recorder.WRITE for e in events))
+
+    def test_mismatch(self):
+        write_session(self.file_path, [
+            (serial_recorder.WRITE, 0, b'M114\r\n'),
+            (serial_recorder.READ, 0.001, b'ok')
+        ])
+        device = ReplayDevice(self.file_path, speed=None)
+        device.open()
+        self.assertRaises(ReplayMismatch, device.write, b'G28\r\n')
+
+        device = ReplayDevice(self.file_path, speed=None, strict=False)
+        device.open()
+        device.write(b'G28\r\n')
+        self.assertEqual(device.readline(), b'ok')
+        self.assertRaises(ReplayMismatch, device.write, b'M114\r\n')
+
+    def test_timing(self):
+        write_session(self.file_path, [
+            (serial_recorder.WRITE, 0, b'G0 X10\r\n'),
+            (serial_recorder.READ, 0.1, b''),
+            (serial_recorder.READ, 0.1, b'ok'),
+        ])
+        for speed, latency in ((1, 0.2), (4, 0.05)):
+            device = ReplayDevice(self.file_path, speed=speed, timeout=0.5)
+            device.open()
+            start = time.perf_counter()
+            device.write('G0 X10\r\n')
+            self.assertEqual(device.readline(), b'ok')
+            self.assertAlmostEqual(
+                time.perf_counter() - start, latency, delta=0.04)
+
+        # a response later than the timeout takes several reads
+        device = ReplayDevice(self.file_path, speed=1, timeout=0.05)
+        device.open()
+        device.write('G0 X10\r\n')
+        lines = []
+        while not lines or not lines[-1]:
+            lines.append(device.readline())
+        self.assertGreaterEqual(len(lines), 4)
+
+    def test_invalid_file(self):
+        with open(self.file_path, 'wb') as f:
+            f.write(b'not a session')
+        self.assertRaises(
+            ValueError, serial_recorder.read_session, self.file_path)
+
+        write_session(self.file_path, [])
+        with open(self.file_path, 'r+b') as f:
+            f.seek(len(serial_recorder.MAGIC))
+            f.write(struct.pack('<B', 99))
+        self.assertRaises(
+            ValueError, serial_recorder.read_session, self.file_path)
@@ -257,3 +257,17 @@ class VirtualSmoothieTestCase(unittest.TestCase):
             'b': 0.0
         }}
         self.assertDictEqual(response, expected_result)
+
+    def test_stats(self):
+        self.s.reset_stats()
+        self.s.write('G90')
+        self.s.readline()
+        self.s.write('G0 X30 Y40 F6000')
+        self.s.readline()
+
+        stats = self.s.get_stats()
+        self.assertEqual(stats['commands'], 2)
+        self.assertEqual(stats['moves'], 1)
+        self.assertEqual(stats['distance'], 50)
+        # 40mm at 100mm/second, plus two round trips
+        self.assertAlmostEqual(stats['seconds'], 0.42)
@@ -0,0 +1,154 @@
+import time
+import unittest
+
+from opentrons import containers
+from opentrons.helpers import transfer_plan
+from opentrons.helpers.transfer_plan import (
+    ASPIRATE, DISPENSE, create_transfer_plan
+)
+from opentrons.robot import Robot
+
+
+class TransferPlanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sources = ['s1', 's2']
+        self.targets = ['t1', 't2', 't3', 't4']
+
+    def test_transfer(self):
+        plan = create_transfer_plan(
+            (10, 40), self.sources, self.targets, 200)
+        self.assertEqual(plan.source_index, [0, 0, 1, 1])
+        self.assertEqual(plan.target_index, [0, 1, 2, 3])
+        self.assertEqual(plan.flags, [ASPIRATE | DISPENSE] * 4)
+        self.assertEqual(list(plan)[1], {
+            'aspirate': {'location': 's1', 'volume': 20.0},
+            'dispense': {'location': 't2', 'volume': 20.0}
+        })
+
+    def test_carryover(self):
+        plan = create_transfer_plan(450, ['s1'], ['t1'], 200)
+        self.assertEqual(plan.volume, [200.0, 125.0, 125.0])
+        plan = create_transfer_plan(450, ['s1'], ['t1'], 200, carryover=False)
+        self.assertEqual(plan.volume, [450])
+
+    def test_distribute(self):
+        plan = create_transfer_plan(
+            60, ['s1'], self.targets, 200, mode='distribute', disposal_vol=20)
+        self.assertEqual(
+            plan.flags,
+            [ASPIRATE, DISPENSE, DISPENSE, DISPENSE, ASPIRATE, DISPENSE])
+        self.assertEqual(
+            plan.volume, [200.0, 60.0, 60.0, 60.0, 60.0, 60.0])
+        self.assertTrue(plan.has_aspirate(4))
+        self.assertFalse(plan.has_aspirate(5))
+        self.assertEqual(list(plan)[5], {
+            'dispense': {'location': 't4', 'volume': 60.0}})
+
+    def test_consolidate(self):
+        plan = create_transfer_plan(
+            80, self.targets, ['t1'], 200, mode='consolidate')
+        self.assertEqual(
+            plan.flags,
+            [ASPIRATE, ASPIRATE, DISPENSE, ASPIRATE, ASPIRATE, DISPENSE])
+        self.assertEqual(plan.source_index, [0, 1, -1, 2, 3, -1])
+        self.assertEqual(
+            plan.volume, [80.0, 80.0, 160.0, 80.0, 80.0, 160.0])
+
+    def test_same_source_objects(self):
+        # steps are grouped by identity, not by position in the list
+        source = object()
+        plan = create_transfer_plan(
+            10, [source, source], self.targets, 200, mode='distribute')
+        self.assertEqual(plan.flags, [ASPIRATE] + [DISPENSE] * 4)
+
+    def test_errors(self):
+        self.assertRaises(
+            ValueError, create_transfer_plan, 10, self.sources,
+            ['t1', 't2', 't3'], 200)
+        self.assertRaises(
+            RuntimeError, create_transfer_plan, [10, 20, 30],
+            self.sources, self.targets, 200)
+
+    def test_large_plan(self):
+        targets = ['t{}'.format(i) for i in range(96 * 100)]
+        start = time.time()
+        plan = create_transfer_plan(
+            (1, 400), ['s1'], targets, 200, mode='distribute')
+        print('Planned {} steps in {:.3f}s'.format(
+            len(plan), time.time() - start))
+        self.assertEqual(
+            sum(transfer_plan.DISPENSE & f == DISPENSE for f in plan.flags),
+            len(plan.target_index) - plan.target_index.count(-1))
+
+    def test_optimize_order(self):
+        coordinates = {
+            's1': (0, 0), 't1': (30, 0), 't2': (10, 0), 't3': (40, 0),
+            't4': (20, 0)
+        }
+        plan = create_transfer_plan(
+            [1, 2, 3, 4], ['s1'], ['t1', 't2', 't3', 't4'], 200,
+            mode='distribute', order='optimize')
+        before, after = plan.optimize_order(coordinates.get)
+        self.assertEqual((before, after), (100, 40))
+        self.assertEqual(plan.target_index, [-1, 1, 3, 0, 2])
+        self.assertEqual(plan.volume, [10, 2, 4, 1, 3])
+
+        # aspirates are routed towards the dispense
+        plan = create_transfer_plan(
+            [1, 2, 3, 4], ['t1', 't2', 't3', 't4'], ['s1'], 200,
+            mode='consolidate')
+        plan.optimize_order(coordinates.get)
+        self.assertEqual(plan.source_index, [2, 0, 3, 1, -1])
+
+        self.assertRaises(
+            ValueError, create_transfer_plan, 10, ['s1'], ['t1'], 200,
+            order='shortest')
+
+
+class GroupWellsByChannelsTest(unittest.TestCase):
+
+    def setUp(self):
+        Robot.reset_for_tests()
+        self.plate = containers.load('96-flat', 'A1')
+        self.trough = containers.load('trough-12row', 'B1')
+
+    def test_full_rows(self):
+        wells = list(self.plate.rows[0]) + list(self.plate.rows[1])
+        volume, source, target, single_wells = \
+            transfer_plan.group_wells_by_channels(
+                [10] * 8 + [20] * 8, self.trough[0], wells, 8)
+        self.assertEqual(volume, [10, 20])
+        self.assertEqual(source, [self.trough[0], self.trough[0]])
+        self.assertIs(target[0], self.plate.rows[0])
+        self.assertIs(target[1], self.plate.rows[1])
+        self.assertEqual(single_wells, 0)
+
+    def test_partial_rows(self):
+        wells = list(self.plate.rows[0])[2:] + list(self.plate.rows[1])
+        volume, source, target, single_wells = \
+            transfer_plan.group_wells_by_channels(
+                10, self.trough[0], wells, 8)
+        self.assertEqual(volume, 10)
+        self.assertEqual(target[:6], wells[:6])
+        self.assertIs(target[6], self.plate.rows[1])
+        self.assertEqual(single_wells, 6)
+
+    def test_not_grouped(self):
+        wells = list(self.plate.rows[0])
+
+        # volumes differ within the row
+        args = (list(range(8)), self.trough[0], wells)
+        self.assertEqual(
+            transfer_plan.group_wells_by_channels(*args, channels=8),
+            args + (8,))
+
+        # gradients and single channel pipettes are left alone
+        args = ((10, 20), self.trough[0], wells)
+        self.assertEqual(
+            transfer_plan.group_wells_by_channels(*args, channels=8),
+            args + (0,))
+        args = (10, self.trough[0], wells)
+        self.assertEqual(
+            transfer_plan.group_wells_by_channels(*args, channels=1),
+            args + (0,))
@@ -0,0 +1,116 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from opentrons.instruments import calibration_store
+from opentrons.instruments.calibration_store import CalibrationStore
+from opentrons.util.vector import Vector
+
+
+class CalibrationStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, 'calibrations.json')
+        self.store = CalibrationStore(self.file_path)
+
+    def tearDown(self):
+        self.store.flush()
+        shutil.rmtree(self.dir)
+
+    def read_file(self):
+        with open(self.file_path) as f:
+            return json.load(f)
+
+    def test_creates_file(self):
+        self.assertIsNone(self.store.get('b:p200'))
+        self.assertEqual(self.read_file(), {'version': 2, 'data': {}})
+
+    def test_coalesces_writes(self):
+        with mock.patch.object(
+                self.store, '_write', wraps=self.store._write) as write:
+            for i in range(20):
+                self.store.set('b:p200', {'max_volume': i})
+            self.assertTrue(self.store.is_dirty())
+            self.store.flush()
+        # one write creating the file, one for all the changes
+        self.assertEqual(write.call_count, 2)
+        self.assertFalse(self.store.is_dirty())
+        self.assertEqual(
+            self.read_file()['data'], {'b:p200': {'max_volume': 19}})
+        self.assertEqual(os.listdir(self.dir), ['calibrations.json'])
+
+    def test_background_write(self):
+        with mock.patch.object(calibration_store, 'WRITE_DELAY', 0.01):
+            self.store.set('b:p200', {'max_volume': 200})
+            self.store._timer.join()
+        self.assertFalse(self.store.is_dirty())
+        self.assertIn('b:p200', self.read_file()['data'])
+
+    def test_vectors(self):
+        data = {'calibration_data': {'A1': {'delta': Vector(1, 2, 3)}}}
+        self.store.set('b:p200', data)
+        self.store.flush()
+
+        saved = self.read_file()['data']['b:p200']
+        self.assertEqual(
+            saved['calibration_data']['A1']['delta'],
+            {'__vector__': [1, 2, 3]})
+
+        store = CalibrationStore(self.file_path)
+        delta = store.get('b:p200')['calibration_data']['A1']['delta']
+        self.assertIsInstance(delta, Vector)
+        self.assertEqual(delta, (1, 2, 3))
+
+    def test_legacy_vectors(self):
+        with open(self.file_path, 'w') as f:
+            json.dump({'version': 1, 'data': {'b:p200': {
+                'delta': '{"x": 1.0, "y": 2.0, "z": 3.0}',
+                'type': '96-flat'
+            }}}, f)
+        saved = self.store.get('b:p200')
+        self.assertEqual(saved['delta'], Vector(1, 2, 3))
+        self.assertEqual(saved['type'], '96-flat')
+
+        # written back in the current format with the next change
+        self.store.set('a:p10', {'max_volume': 10})
+        self.store.flush()
+        file = self.read_file()
+        self.assertEqual(file['version'], 2)
+        self.assertEqual(
+            file['data']['b:p200']['delta'], {'__vector__': [1.0, 2.0, 3.0]})
+
+    def test_vector_strings(self):
+        # only version 1 files saved vectors as strings
+        with open(self.file_path, 'w') as f:
+            json.dump({'version': 2, 'data': {'b:p200': {
+                'name': '{"x": 1.0, "y": 2.0, "z": 3.0}'
+            }}}, f)
+        self.assertEqual(
+            self.store.get('b:p200')['name'],
+            '{"x": 1.0, "y": 2.0, "z": 3.0}')
+
+    def test_external_changes(self):
+        self.store.set('a:p10', {'max_volume': 10})
+        self.store.flush()
+        self.store.set('b:p200', {'max_volume': 200})
+
+        with open(self.file_path, 'w') as f:
+            json.dump({'version': 1, 'data': {
+                'a:p10': {'max_volume': 12.5}
+            }}, f)
+
+        # the file is read again, changes not yet written are kept
+        self.assertEqual(self.store.get('a:p10'), {'max_volume': 12.5})
+        self.assertEqual(self.store.get('b:p200'), {'max_volume': 200})
+        self.store.flush()
+        self.assertEqual(len(self.read_file()['data']), 2)
+
+    def test_returns_copies(self):
+        data = {'positions': {'top': 0}}
+        self.store.set('b:p200', data)
+        data['positions']['top'] = 5
+        self.store.get('b:p200')['positions']['top'] = 6
+        self.assertEqual(self.store.get('b:p200'), {'positions': {'top': 0}})
@@ -90,7 +90,7 @@ class CrudCalibrationsTestCase(unittest.TestCase):
             file = os.path.join(calib_dir, 'calibrations.json')
             with open(file) as f:
                 calib_object = json.load(f)
-                self.assertEquals(calib_object['version'], 1)
+                self.assertEquals(calib_object['version'], 2)
 
         test_file('data/calibrations.json')
         test_file('data/invalid_json.json')
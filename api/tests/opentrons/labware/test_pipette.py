@@ -1,9 +1,11 @@
+import math
 import unittest
 from unittest import mock
 from opentrons import containers
 
 from opentrons import instruments
 from opentrons import Robot
+from opentrons.util import trace
 from opentrons.util.vector import Vector
 
 from opentrons.containers.placeable import unpack_location, Container, Well
@@ -60,6 +62,36 @@ class PipetteTest(unittest.TestCase):
         self.assertRaises(
             RuntimeError, self.p200._get_plunger_position, 'roll_out')
 
+    def test_plunger_table(self):
+        table = self.p200._plunger_table
+        self.assertEqual(table.get_position('blow_out'), 12)
+        self.assertEqual(table.get_volume_position(100), 5)
+
+        self.p200.calibrate_plunger(bottom=20)
+        self.assertEqual(self.p200._plunger_table.get_volume_position(50), 15)
+        self.p200.set_max_volume(100)
+        self.assertEqual(self.p200._plunger_table.get_volume_position(50), 10)
+        # the table is immutable, later calibrations create a new one
+        self.assertEqual(table.bottom, 10)
+
+        self.p200.positions['drop_tip'] = None
+        self.p200.reset()
+        self.assertRaises(
+            RuntimeError, self.p200._plunger_table.get_position, 'drop_tip')
+
+    def test_volume_warnings_when_enqueued(self):
+        self.p200.aspirate(5, self.plate[0])
+        self.assertEqual(len(self.robot.get_warnings()), 1)
+        self.p200.dispense(2, self.plate[1])
+        self.assertEqual(len(self.robot.get_warnings()), 2)
+        self.assertRaises(RuntimeWarning, self.p200.aspirate, 200)
+
+        with mock.patch.object(
+                self.p200, '_volume_percentage') as volume_percentage:
+            self.robot.run()
+        # the run neither sets up nor runs the validation again
+        self.assertEqual(volume_percentage.call_count, 0)
+
     def test_set_max_volume(self):
 
         self.p200.reset()
@@ -110,6 +142,40 @@ class PipetteTest(unittest.TestCase):
 
         self.assertEquals(self.p200.placeables, expected)
 
+    def test_used_containers_and_wells(self):
+        self.assertFalse(self.p200.has_used(self.plate))
+
+        self.p200.pick_up_tip()
+        for _ in range(3):
+            for well in self.plate.rows[0]:
+                self.p200.aspirate(10, well).dispense(10, well.top())
+        # a WellSeries counts as its first well
+        self.p200.mix(1, 10, self.plate.cols['B'])
+
+        self.assertEqual(
+            self.p200.get_used_containers(), [self.tiprack1, self.plate])
+        self.assertEqual(
+            self.p200.get_used_wells(),
+            [self.tiprack1[0]] + list(self.plate.rows[0]))
+        self.assertTrue(self.p200.has_used(self.plate))
+        self.assertTrue(self.p200.has_used(self.plate[0]))
+        self.assertFalse(self.p200.has_used(self.plate[95]))
+        self.assertFalse(self.p200.has_used(self.tiprack2))
+
+        self.p200.reset()
+        self.assertFalse(self.p200.has_used(self.plate))
+        self.assertEqual(self.p200.get_used_wells(), [])
+
+    def test_placeables_history_is_bounded(self):
+        for i in range(30):
+            for well in self.plate:
+                self.p200.aspirate(10, well).dispense(10, well)
+
+        history_size = instruments.pipette.PLACEABLES_HISTORY_SIZE
+        self.assertLessEqual(len(self.p200.placeables), history_size * 2)
+        self.assertEqual(self.p200.placeables[-1], self.plate[95])
+        self.assertEqual(len(self.p200.get_used_wells()), 96)
+
     def test_unpack_location(self):
 
         location = (self.plate[0], (1, 0, -1))
@@ -1158,6 +1224,70 @@ class PipetteTest(unittest.TestCase):
                 self.assertTrue(s.lower() in c.lower())
         self.robot.clear_commands()
 
+    def _run_and_measure_travel(self):
+        positions = []
+
+        def _record(info):
+            if info.get('name') == 'move-finished':
+                head = info['position']['head']
+                positions.append((head['x'], head['y']))
+
+        # every position is needed, so events must not be coalesced
+        broker = trace.EventBroker.get_instance()
+        was_async = broker.is_async()
+        broker.stop_async()
+        broker.add(_record, ['move-finished'])
+        try:
+            self.robot.run()
+        finally:
+            broker.remove(_record)
+            if was_async:
+                broker.start_async()
+        self.assertTrue(positions)
+        return sum(
+            math.hypot(b[0] - a[0], b[1] - a[1])
+            for a, b in zip(positions, positions[1:]))
+
+    def _get_dispensed(self):
+        return sorted(
+            c for c in self.robot.commands() if 'dispensing' in c.lower())
+
+    def test_distribute_optimize_order(self):
+        wells = [self.plate[i] for i in (95, 0, 90, 5, 80, 15, 88, 7)]
+        volumes = [10, 11, 12, 13, 14, 15, 16, 17]
+
+        self.p200.distribute(volumes, self.plate[40], wells)
+        given_dispensed = self._get_dispensed()
+        given_travel = self._run_and_measure_travel()
+
+        self.robot.clear_commands()
+        self.p200.reset()
+        self.p200.distribute(
+            volumes, self.plate[40], wells, order='optimize')
+        self.assertEqual(self._get_dispensed(), given_dispensed)
+        self.assertLess(self._run_and_measure_travel(), given_travel)
+
+        self.assertRaises(
+            ValueError, self.p200.distribute, 10, self.plate[40], wells,
+            order='shortest')
+
+    def test_consolidate_optimize_order(self):
+        wells = [self.plate[i] for i in (95, 0, 90, 5, 80, 15)]
+
+        self.p200.consolidate(30, wells, self.plate[40])
+        given_commands = self.robot.commands()
+        given_travel = self._run_and_measure_travel()
+
+        self.robot.clear_commands()
+        self.p200.reset()
+        self.p200.consolidate(30, wells, self.plate[40], order='optimize')
+        self.assertEqual(
+            len(self.robot.commands()), len(given_commands))
+        self.assertEqual(
+            sorted(c for c in self.robot.commands() if 'Well' in c),
+            sorted(c for c in given_commands if 'Well' in c))
+        self.assertLess(self._run_and_measure_travel(), given_travel)
+
     def test_consolidate_mix(self):
         self.p200.reset()
         self.p200.consolidate(
@@ -1560,6 +1690,39 @@ class PipetteTest(unittest.TestCase):
             expected
         )
 
+    def test_transfer_multi_channel_rows(self):
+        p200_multi = instruments.Pipette(
+            name='p200-multi',
+            trash_container=self.trash,
+            max_volume=200,
+            axis="a",
+            channels=8
+        )
+        p200_multi.calibrate_plunger(
+            top=0, bottom=10, blow_out=12, drop_tip=13)
+        trough = containers.load('trough-12row', 'C2')
+        self.robot.clear_commands()
+
+        p200_multi.distribute(20, trough[0], self.plate, new_tip='never')
+        dispenses = [
+            c for c in self.robot.commands() if c.startswith('Dispensing')]
+        self.assertEqual(len(dispenses), 12)
+        self.assertIn(str(self.plate.rows[11]), dispenses[-1])
+        self.assertEqual(self.robot.get_warnings(), [])
+
+        self.robot.clear_commands()
+        sources = list(self.plate.rows[0]) + list(self.plate.rows[1])[:3]
+        targets = list(self.plate.rows[2]) + list(self.plate.rows[3])[:3]
+        p200_multi.transfer(30, sources, targets, new_tip='never')
+        aspirates = [
+            c for c in self.robot.commands() if c.startswith('Aspirating')]
+        self.assertEqual(len(aspirates), 4)
+        self.assertIn(str(self.plate.rows[0]), aspirates[0])
+        self.assertIn(str(self.plate['C2']), aspirates[-1])
+        self.assertEqual(self.robot.get_warnings(), [
+            'p200-multi transfers 3 wells one at a time, they do not '
+            'fill complete rows of 8 wells'])
+
     def test_tip_tracking_start_at_tip(self):
         self.p200.start_at_tip(self.tiprack1['B2'])
         self.p200.pick_up_tip()
@@ -0,0 +1,157 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from opentrons import containers, instruments
+from opentrons.instruments import tip_tracker
+from opentrons.instruments.tip_tracker import TipTracker
+from opentrons.robot import Robot
+from opentrons.util import environment
+
+
+class TipTrackerTestCase(unittest.TestCase):
+    def setUp(self):
+        Robot.reset_for_tests()
+        self.rack1 = containers.load('tiprack-200ul', 'A1', 'rack1')
+        self.rack2 = containers.load('tiprack-200ul', 'A2', 'rack2')
+        self.tracker = TipTracker([self.rack1, self.rack2])
+
+    def test_next_tip(self):
+        self.assertEqual(self.tracker.tips_remaining(), 192)
+        self.assertIs(self.tracker.next_tip(), self.rack1[0])
+        self.assertIs(self.tracker.next_tip(), self.rack1[1])
+        self.assertEqual(len(self.tracker), 190)
+
+        self.tracker.use_tip(self.rack1[2])
+        self.assertFalse(self.tracker.has_tip(self.rack1[2]))
+        self.assertIs(self.tracker.next_tip(), self.rack1[3])
+
+        self.tracker.start_at(self.rack2[95])
+        self.assertEqual(self.tracker.tips_remaining(), 1)
+        self.assertIs(self.tracker.next_tip(), self.rack2[95])
+        self.assertIsNone(self.tracker.next_tip())
+
+    def test_multi_channel(self):
+        tracker = TipTracker([self.rack1], channels=8)
+        self.assertEqual(tracker.tips_remaining(), 12)
+        self.assertIs(tracker.next_tip(), self.rack1.rows[0])
+        self.assertFalse(tracker.use_tip(self.rack1[20]))
+        self.assertIs(tracker.next_tip(), self.rack1.rows[1])
+
+    def test_state(self):
+        for _ in range(100):
+            self.tracker.next_tip()
+        state = self.tracker.get_state()
+        self.assertEqual(state['A1:rack1:tiprack-200ul'], 0)
+
+        tracker = TipTracker([self.rack1, self.rack2])
+        tracker.set_state(state)
+        self.assertEqual(tracker.tips_remaining(), 92)
+        self.assertIs(tracker.next_tip(), self.rack2[4])
+
+        # racks on another slot start full
+        rack3 = containers.load('tiprack-200ul', 'A3', 'rack1')
+        tracker = TipTracker([rack3])
+        tracker.set_state(state)
+        self.assertEqual(tracker.tips_remaining(), 96)
+
+
+class PersistedTipStateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.robot = Robot.reset_for_tests()
+        self.robot.connect()
+        self.tiprack = containers.load('tiprack-200ul', 'A1', 'tiprack')
+
+        fd, self.tip_state_file = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(self.tip_state_file)
+        patcher = mock.patch.dict(
+            environment.settings, {'TIP_STATE_FILE': self.tip_state_file})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        if os.path.exists(self.tip_state_file):
+            os.remove(self.tip_state_file)
+
+    def create_pipette(self):
+        p200 = instruments.Pipette(
+            axis='b',
+            name='p200-tip-state',
+            max_volume=200,
+            tip_racks=[self.tiprack],
+            persist_tips=True)
+        p200.calibrate_plunger(top=0, bottom=10, blow_out=12, drop_tip=13)
+        return p200
+
+    def test_continues_after_restart(self):
+        p200 = self.create_pipette()
+        for _ in range(3):
+            p200.pick_up_tip().return_tip()
+
+        # simulated runs are not saved
+        self.robot.simulate()
+        self.assertFalse(os.path.exists(self.tip_state_file))
+
+        with mock.patch.object(
+                self.robot, 'is_simulating', return_value=False):
+            with mock.patch.object(
+                    tip_tracker, 'save_tip_state',
+                    wraps=tip_tracker.save_tip_state) as save_tip_state:
+                self.robot.run()
+        # saved once at the end of the run
+        self.assertEqual(save_tip_state.call_count, 1)
+        self.assertEqual(p200.tips_remaining(), 93)
+
+        Robot.reset_for_tests()
+        self.robot = Robot.get_instance()
+        self.tiprack = containers.load('tiprack-200ul', 'A1', 'tiprack')
+        p200 = self.create_pipette()
+        self.assertEqual(p200.tips_remaining(), 93)
+        p200.pick_up_tip()
+        self.assertIs(p200.current_tip(), self.tiprack[3])
+
+        p200.refill_tip_racks()
+        self.assertEqual(p200.tips_remaining(), 96)
+        self.assertEqual(
+            tip_tracker._read_tip_states(), {})
+
+    def test_rerun_continues(self):
+        p200 = self.create_pipette()
+        for _ in range(3):
+            p200.pick_up_tip().return_tip()
+
+        with mock.patch.object(
+                self.robot, 'is_simulating', return_value=False):
+            self.robot.run()
+            self.assertEqual(p200.tips_remaining(), 93)
+            # running the same commands again uses the next tips
+            self.robot.run()
+        self.assertEqual(p200.tips_remaining(), 90)
+        self.assertFalse(p200.tip_tracker.has_tip(self.tiprack[5]))
+        self.assertTrue(p200.tip_tracker.has_tip(self.tiprack[6]))
+
+        # simulated runs follow the saved tips without saving theirs
+        self.robot.simulate()
+        self.assertEqual(p200.tips_remaining(), 87)
+        p200.reset_tip_tracking()
+        self.assertEqual(p200.tips_remaining(), 90)
+
+    def test_tip_chosen_when_run(self):
+        p200 = self.create_pipette()
+        p200.pick_up_tip().drop_tip()
+        p200.pick_up_tip(self.tiprack[50]).drop_tip()
+        descriptions = self.robot.commands()
+
+        with mock.patch.object(
+                self.robot, 'is_simulating', return_value=False):
+            self.robot.run()
+            self.robot.run()
+        # the second run picked up the tip after the one of the first run,
+        # the enqueued commands are unchanged
+        self.assertEqual(self.robot.commands(), descriptions)
+        for tip in (0, 1, 50):
+            self.assertFalse(p200.tip_tracker.has_tip(self.tiprack[tip]))
+        self.assertTrue(p200.tip_tracker.has_tip(self.tiprack[2]))
+        self.assertEqual(p200.tips_remaining(), 93)
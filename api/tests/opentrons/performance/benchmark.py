@@ -0,0 +1,146 @@
+"""
+Repeatable timing and memory measurements compared to stored baselines.
+
+Times are stored relative to :func:`get_reference_time`, a fixed pure
+Python workload timed right before each benchmark, so baselines recorded
+on one machine can be checked on another. Like :mod:`timeit`, the garbage
+collector is disabled while timing, and the best of several calls is kept.
+Memory is the peak of the memory allocated by one call, as traced by
+:mod:`tracemalloc`.
+
+Baselines are updated by running the benchmarks with the
+``OT_UPDATE_BENCHMARKS`` environment variable set (``make
+api-benchmark-update``).
+"""
+from collections import OrderedDict
+import gc
+import json
+import os
+import time
+import tracemalloc
+
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+# a benchmark fails when it is this much slower or bigger than its baseline
+TIME_TOLERANCE = 1.0
+MEMORY_TOLERANCE = 0.5
+
+# and by more than this, small values vary too much between runs
+MIN_TIME_INCREASE = 0.05
+MIN_MEMORY_INCREASE = 64 * 1024
+
+
+def _reference_workload():
+    total = 0
+    for i in range(200000):
+        total += i * i % 7
+    return total
+
+
+def _time_call(function, setup):
+    args = setup() if setup else ()
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        function(*args)
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def get_reference_time(repeat=5):
+    return min(_time_call(_reference_workload, None) for _ in range(repeat))
+
+
+def measure(function, setup=None, repeat=5):
+    """
+    Returns the best time in seconds of :repeat: calls of :function:
+    and the peak memory in bytes it allocated during one call
+
+    Parameters
+    ----------
+    function : callable
+        Called with the values returned by :setup:
+
+    setup : callable
+        Called before each call of :function:, not measured
+    """
+    # the first call warms up caches (e.g. labware definitions)
+    _time_call(function, setup)
+    seconds = min(_time_call(function, setup) for _ in range(repeat))
+
+    args = setup() if setup else ()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+class BenchmarkSuite(object):
+    """
+    Benchmarks measured together against the baselines in :baselines_path:
+    """
+    def __init__(self, baselines_path=BASELINES_PATH):
+        self.baselines_path = baselines_path
+        self.benchmarks = OrderedDict()
+
+    def add(self, name, function, setup=None, repeat=5):
+        self.benchmarks[name] = (function, setup, repeat)
+
+    def run(self):
+        """
+        Returns ``{name: {'time': relative time, 'memory': bytes}}``
+        """
+        results = OrderedDict()
+        for name, (function, setup, repeat) in self.benchmarks.items():
+            # timed next to each benchmark to follow changes of CPU speed
+            reference = get_reference_time()
+            seconds, memory = measure(function, setup, repeat)
+            results[name] = OrderedDict([
+                ('time', round(seconds / reference, 3)),
+                ('memory', memory)
+            ])
+        return results
+
+    def load_baselines(self):
+        try:
+            with open(self.baselines_path) as f:
+                return json.load(f)
+        except OSError:
+            return {}
+
+    def save_baselines(self, results):
+        with open(self.baselines_path, 'w') as f:
+            json.dump(results, f, indent=4)
+            f.write('\n')
+
+    def compare(self, results, baselines):
+        """
+        Returns a table of the results next to their baselines, and
+        whether any of them regressed
+        """
+        lines = ['{:<28} {:>8} {:>10} {:>10} {:>8}'.format(
+            'benchmark', 'metric', 'baseline', 'current', 'change')]
+        regressed = False
+        for name, result in results.items():
+            baseline = baselines.get(name)
+            if baseline is None:
+                lines.append('{:<28} no baseline'.format(name))
+                continue
+            for metric, tolerance, min_increase in (
+                    ('time', TIME_TOLERANCE, MIN_TIME_INCREASE),
+                    ('memory', MEMORY_TOLERANCE, MIN_MEMORY_INCREASE)):
+                change = result[metric] / max(baseline[metric], 1e-9) - 1
+                failed = change > tolerance and \
+                    result[metric] - baseline[metric] > min_increase
+                regressed = regressed or failed
+                lines.append('{:<28} {:>8} {:>10} {:>10} {:>+7.0%}{}'.format(
+                    name, metric, baseline[metric], result[metric], change,
+                    ' REGRESSION' if failed else ''))
+        return '\n'.join(lines), regressed
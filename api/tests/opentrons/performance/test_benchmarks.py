@@ -0,0 +1,207 @@
+from collections import OrderedDict
+import glob
+import io
+import json
+import os
+import unittest
+
+import dill
+
+from opentrons import containers, instruments
+from opentrons.helpers.transfer_plan import create_transfer_plan
+from opentrons.json_importer import JSONProtocolProcessor
+from opentrons.robot.robot import Robot
+
+from tests.opentrons.performance.benchmark import BenchmarkSuite, measure
+
+
+TESTS_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+JSON_PROTOCOLS_DIR = os.path.join(
+    TESTS_DIR, 'opentrons', 'json_importer', 'protocol_data')
+SERVER_PROTOCOL_PATH = os.path.join(
+    os.path.dirname(TESTS_DIR), 'opentrons', 'server', 'tests', 'data',
+    'protocol.py')
+
+
+def create_robot():
+    robot = Robot.reset_for_tests()
+    robot.connect()
+    robot.home(enqueue=False)
+    return robot
+
+
+def load_deck():
+    robot = create_robot()
+    tiprack = containers.load('tiprack-200ul', 'A1')
+    trough = containers.load('trough-12row', 'B1')
+    plate_96 = containers.load('96-flat', 'C1')
+    plate_384 = containers.load('384-plate', 'D1')
+    trash = containers.load('point', 'B2')
+    p200 = instruments.Pipette(
+        axis='b', name='p200-benchmark', max_volume=200,
+        tip_racks=[tiprack], trash_container=trash)
+    p200.calibrate_plunger(top=0, bottom=10, blow_out=12, drop_tip=13)
+    return robot, p200, trough, plate_96, plate_384
+
+
+def load_labware():
+    Robot.reset_for_tests()
+    containers.load('tiprack-200ul', 'A1')
+    containers.load('96-flat', 'B1')
+    containers.load('384-plate', 'C1')
+    containers.load('trough-12row', 'D1')
+
+
+def compute_coordinates(robot, p200, trough, plate_96, plate_384):
+    deck = robot._deck
+    for well in plate_384:
+        well.coordinates(deck)
+        well.from_center(x=0.5, y=-0.5, z=-1)
+        well.top()
+        well.bottom(1)
+
+
+def convert_coordinates(robot, p200, trough, plate_96, plate_384):
+    for well in plate_384:
+        p200.calibrator.convert(well, well.center())
+
+
+def plan_transfer_96(robot, p200, trough, plate_96, plate_384):
+    list(create_transfer_plan(
+        30, plate_96.wells(), plate_96.wells()[::-1], 200))
+    list(create_transfer_plan(
+        5, trough[0], plate_96.wells(), 200, mode='distribute'))
+
+
+def plan_transfer_384(robot, p200, trough, plate_96, plate_384):
+    list(create_transfer_plan(
+        30, plate_384.wells(), plate_384.wells()[::-1], 200))
+    list(create_transfer_plan(
+        5, trough[0], plate_384.wells(), 200, mode='distribute'))
+
+
+def enqueue_commands(robot, p200, trough, plate_96, plate_384):
+    p200.pick_up_tip()
+    p200.aspirate(96 * 2, trough[0])
+    for well in plate_96:
+        p200.dispense(2, well).touch_tip()
+    p200.drop_tip()
+
+
+def create_protocol():
+    robot, p200, trough, plate_96, plate_384 = load_deck()
+    p200.transfer(
+        50, trough[0], plate_96.wells(), new_tip='once', mix_after=(2, 20))
+    return (robot,)
+
+
+def simulate(robot):
+    robot.simulate()
+
+
+def import_json_protocols(protocols):
+    for protocol in protocols:
+        Robot.reset_for_tests()
+        JSONProtocolProcessor(protocol).process()
+
+
+def read_json_protocols():
+    protocols = []
+    for path in sorted(glob.glob(os.path.join(JSON_PROTOCOLS_DIR, '*.json'))):
+        with open(path) as f:
+            protocols.append(json.load(f, object_pairs_hook=OrderedDict))
+    return (protocols,)
+
+
+def serialize_with_dill(robot):
+    dill.loads(dill.dumps(robot))
+
+
+def serialize_to_ir(robot):
+    ir = robot.export_ir()
+    robot.import_ir(json.loads(json.dumps(ir)))
+
+
+def upload_protocol(client, source):
+    response = client.post('/upload', data={
+        'file': (io.BytesIO(source), 'protocol.py')
+    })
+    assert json.loads(response.data.decode())['status'] == 'success'
+
+
+def create_server_client():
+    from opentrons.server import main
+    Robot.reset_for_tests()
+    with open(SERVER_PROTOCOL_PATH, 'rb') as f:
+        source = f.read()
+    return main.app.test_client(), source
+
+
+def create_suite():
+    suite = BenchmarkSuite()
+    suite.add('labware_load', load_labware)
+    suite.add('coordinate_math', compute_coordinates, load_deck)
+    suite.add('calibrator_convert', convert_coordinates, load_deck)
+    suite.add('transfer_plan_96', plan_transfer_96, load_deck)
+    suite.add('transfer_plan_384', plan_transfer_384, load_deck)
+    suite.add('command_enqueue', enqueue_commands, load_deck)
+    suite.add('simulate', simulate, create_protocol, repeat=3)
+    suite.add('json_import', import_json_protocols, read_json_protocols,
+              repeat=1)
+    suite.add('serialize_dill', serialize_with_dill, create_protocol)
+    suite.add('serialize_ir', serialize_to_ir, create_protocol)
+    suite.add('server_upload', upload_protocol, create_server_client,
+              repeat=3)
+    return suite
+
+
+@unittest.skipUnless(
+    os.environ.get('OT_BENCHMARK') or os.environ.get('OT_UPDATE_BENCHMARKS'),
+    'set OT_BENCHMARK to run the benchmarks (make api-benchmark)')
+class BenchmarksTestCase(unittest.TestCase):
+    def test_benchmarks(self):
+        suite = create_suite()
+        results = suite.run()
+        if os.environ.get('OT_UPDATE_BENCHMARKS'):
+            suite.save_baselines(results)
+            return
+
+        table, regressed = suite.compare(results, suite.load_baselines())
+        print('\n' + table)
+        self.assertFalse(regressed, 'Benchmarks regressed:\n' + table)
+
+
+class BenchmarkSuiteTestCase(unittest.TestCase):
+    def test_measure(self):
+        calls = []
+        seconds, memory = measure(
+            lambda size: calls.append(bytearray(size)),
+            setup=lambda: (1024 * 1024,),
+            repeat=2)
+        # warm up, timed calls and the traced one
+        self.assertEqual(len(calls), 4)
+        self.assertGreater(seconds, 0)
+        self.assertGreaterEqual(memory, 1024 * 1024)
+
+    def test_compare(self):
+        suite = BenchmarkSuite()
+        baselines = {
+            'fast': {'time': 1.0, 'memory': 1000000},
+            'small': {'time': 0.01, 'memory': 1000}
+        }
+        results = OrderedDict([
+            ('fast', {'time': 2.5, 'memory': 1100000}),
+            ('small', {'time': 0.03, 'memory': 5000}),
+            ('new', {'time': 1.0, 'memory': 1000})
+        ])
+        table, regressed = suite.compare(results, baselines)
+        self.assertTrue(regressed)
+        lines = table.splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[1].startswith('fast'))
+        self.assertTrue(lines[1].endswith('+150% REGRESSION'))
+        self.assertNotIn('REGRESSION', '\n'.join(lines[2:]))
+        self.assertEqual(lines[5], 'new'.ljust(28) + ' no baseline')
+
+        del results['fast']
+        self.assertFalse(suite.compare(results, baselines)[1])
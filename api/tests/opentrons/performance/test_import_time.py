@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import opentrons
+
+
+# cumulative time in seconds `import opentrons` may take
+IMPORT_TIME_BUDGET = 0.5
+
+API_DIR = os.path.dirname(os.path.dirname(opentrons.__file__))
+
+
+def run_python(*args):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [API_DIR] + env.get('PYTHONPATH', '').split(os.pathsep))
+    return subprocess.run(
+        [sys.executable, '-W', 'ignore'] + list(args),
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True)
+
+
+def get_import_time(module):
+    """
+    Returns the cumulative time in seconds it takes to import :module:
+    in a new interpreter, as reported by `python -X importtime`
+    """
+    stderr = run_python('-X', 'importtime', '-c', 'import ' + module).stderr
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.strip() == module and name.startswith(' ' + module):
+            return int(cumulative) / 1e6
+    raise ValueError('{} not found in importtime output'.format(module))
+
+
+@unittest.skipIf(sys.version_info < (3, 7), '-X importtime needs Python 3.7')
+class ImportTimeTestCase(unittest.TestCase):
+    @unittest.skipUnless(
+        os.environ.get('OT_BENCHMARK'),
+        'set OT_BENCHMARK to check the import time (make api-benchmark)')
+    def test_import_time(self):
+        # warm up the bytecode cache, then keep the best of a few runs
+        get_import_time('opentrons')
+        best = min(get_import_time('opentrons') for _ in range(3))
+        self.assertLess(best, IMPORT_TIME_BUDGET)
+
+    def test_lazy_import(self):
+        script = '\n'.join([
+            'import json, sys',
+            'import opentrons',
+            'from opentrons.util.singleton import Singleton',
+            'print(json.dumps({',
+            '    "modules": [m for m in ("dill", "requests", "serial")',
+            '                if m in sys.modules],',
+            '    "robots": len(Singleton._instances),',
+            '    "containers": len(opentrons.containers.persisted_containers'
+            '.persisted_containers_dict)',
+            '}))',
+            'robot = opentrons.robot',
+            'assert isinstance(robot, opentrons.Robot)',
+            'assert robot is opentrons.Robot.get_instance()',
+        ])
+        result = json.loads(run_python('-c', script).stdout)
+        self.assertEqual(
+            result, {'modules': [], 'robots': 0, 'containers': 0})
@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+import threading
+import unittest
+
+from opentrons import containers, instruments
+from opentrons.robot.command import Command
+from opentrons.robot.command_timing import CommandTiming, METRICS
+from opentrons.robot.robot import Robot
+
+
+class CommandTimingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.robot = Robot.reset_for_tests()
+        self.robot.connect()
+        self.robot.home(enqueue=False)
+
+        self.plate = containers.load('96-flat', 'B1', 'plate')
+        self.p200 = instruments.Pipette(
+            axis='b', name='p200-timing', max_volume=200)
+        self.p200.calibrate_plunger(top=0, bottom=10, blow_out=12, drop_tip=13)
+
+        self.p200.aspirate(50, self.plate[0])
+        self.p200.dispense(50, self.plate[1])
+        self.p200.delay(0.01)
+
+    def test_disabled(self):
+        self.robot.run()
+        self.assertEqual(self.robot.command_timing.get_commands(), [])
+
+    def test_run(self):
+        timing = self.robot.command_timing
+        timing.enabled = True
+        self.robot.run()
+
+        commands = timing.get_commands()
+        self.assertEqual(len(commands), len(self.robot._commands))
+        self.assertEqual(
+            [c['type'] for c in commands], ['aspirate', 'dispense', 'delay'])
+        for command in commands:
+            self.assertGreaterEqual(command['total'], command['setup'])
+        self.assertGreater(commands[0]['serial_exchanges'], 0)
+        self.assertGreater(commands[0]['bytes_sent'], 0)
+        self.assertGreater(commands[0]['arrival_wait'], 0)
+
+        summary = timing.get_summary()
+        self.assertEqual(
+            list(summary.keys()), ['aspirate', 'all', 'dispense', 'delay'])
+        self.assertEqual(list(summary['all'].keys()), list(METRICS))
+        self.assertEqual(summary['all']['total']['count'], 3)
+        self.assertEqual(
+            summary['all']['bytes_sent']['total'],
+            sum(c['bytes_sent'] for c in commands))
+
+        # each run replaces the data of the previous one
+        self.robot.run()
+        self.assertEqual(len(timing.get_commands()), 3)
+
+        exported = json.loads(timing.to_json())
+        self.assertEqual(exported['summary']['all']['total']['count'], 3)
+        self.assertEqual(len(exported['commands']), 3)
+
+        rows = list(csv.reader(io.StringIO(timing.to_csv())))
+        self.assertEqual(rows[0], ['index', 'type', 'description'] + list(
+            METRICS))
+        self.assertEqual([row[1] for row in rows[1:]], [
+            'aspirate', 'dispense', 'delay'])
+
+    def test_export_during_run(self):
+        class Driver(object):
+            serial_exchanges = 0
+            serial_bytes_sent = 0
+            arrival_wait_seconds = 0
+
+        timing = CommandTiming(enabled=True)
+        commands = [
+            Command(do=lambda: None, description='Command {}'.format(i))
+            for i in range(20)]
+        done = threading.Event()
+
+        def run():
+            while not done.is_set():
+                timing.clear()
+                for i, command in enumerate(commands):
+                    timing.run_command(i, command, Driver())
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        try:
+            for _ in range(100):
+                timing.to_json()
+                timing.to_csv()
+        finally:
+            done.set()
+            thread.join()
+        self.assertGreater(len(timing.get_commands()), 0)
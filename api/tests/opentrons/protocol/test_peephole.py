@@ -0,0 +1,71 @@
+import unittest
+
+from opentrons import containers, instruments
+from opentrons.robot import peephole
+from opentrons.robot.robot import Robot
+
+
+class PeepholeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.robot = Robot.reset_for_tests()
+        self.robot.connect()
+        self.robot._driver.peephole = True
+        self.robot.home(enqueue=False)
+
+        self.tiprack = containers.load('tiprack-200ul', 'A1', 'tiprack')
+        self.plate = containers.load('96-flat', 'B1', 'plate')
+        self.p200 = instruments.Pipette(
+            axis='b', name='p200-peephole', max_volume=200,
+            tip_racks=[self.tiprack])
+        self.p200.calibrate_plunger(top=0, bottom=10, blow_out=12, drop_tip=13)
+
+    def test_redundant_commands(self):
+        self.p200.move_to(self.plate[0])
+        self.p200.move_to(self.plate[0])
+        self.p200.move_to((self.plate[0], self.plate[0].center()))
+        self.p200.move_to((self.plate[0], self.plate[0].center()))
+        self.p200.move_to(self.plate[1])
+        self.p200.aspirate(10, self.plate[1])
+        self.p200.move_to(self.plate[1])
+
+        self.assertEqual(
+            peephole.get_redundant_commands(self.robot._commands), {1, 3})
+
+    def test_vertical_arc(self):
+        self.robot.move_head(x=100, y=100, z=50)
+        stats = self.robot._driver.connection.get_stats()
+        arc = self.robot._create_arc((100, 100, 10), self.plate[0])
+        self.assertEqual(arc, [{'z': 10}])
+        # the last target is known without asking the smoothie
+        self.assertEqual(
+            self.robot._driver.connection.get_stats()['commands'],
+            stats['commands'])
+
+        # not after homing, the head might not be where it was sent
+        self.robot.home('z', enqueue=False)
+        arc = self.robot._create_arc((100, 100, 10), self.plate[0])
+        self.assertEqual(len(arc), 3)
+
+        self.robot.move_head(x=100, y=100, z=50)
+        arc = self.robot._create_arc((110, 100, 10), self.plate[0])
+        self.assertEqual(len(arc), 3)
+
+    def test_runtime_report(self):
+        self.p200.pick_up_tip()
+        self.p200.mix(3, 50, self.plate[0])
+        self.p200.move_to(self.plate[1])
+        self.p200.move_to(self.plate[1])
+        self.p200.transfer(
+            50, self.plate[2], self.plate[3:6], new_tip='never')
+        self.p200.drop_tip()
+
+        expected = self.robot.commands()
+        report = peephole.get_runtime_report(self.robot)
+        before, after = report['before'], report['after']
+
+        self.assertLess(after['commands'], before['commands'])
+        self.assertLess(after['moves'], before['moves'])
+        self.assertLess(after['distance'], before['distance'])
+        self.assertLess(after['seconds'], before['seconds'])
+        self.assertTrue(self.robot._driver.peephole)
+        self.assertEqual(self.robot.commands(), expected)
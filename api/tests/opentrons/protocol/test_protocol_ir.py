@@ -0,0 +1,86 @@
+import unittest
+
+import dill
+
+from opentrons import containers, instruments
+from opentrons import Robot
+from opentrons.robot import protocol_ir
+
+
+class ProtocolIRTestCase(unittest.TestCase):
+    def setUp(self):
+        Robot.reset_for_tests()
+        self.robot = Robot()
+        self.robot.connect()
+
+    def load_protocol(self):
+        tiprack = containers.load('tiprack-200ul', 'A1', 'tiprack')
+        plate = containers.load('96-flat', 'B1', 'plate')
+        trash = containers.load('point', 'C2', 'trash')
+        p200 = instruments.Pipette(
+            axis='b',
+            name='p200-ir',
+            max_volume=200,
+            trash_container=trash,
+            tip_racks=[tiprack])
+
+        self.robot.home(enqueue=True)
+        p200.pick_up_tip()
+        for well in plate:
+            p200.aspirate(100, well).delay(1).dispense(well.top())
+        p200.mix(2, 50, plate[0]).blow_out().touch_tip()
+        p200.drop_tip()
+        self.robot.comment('done')
+        self.robot.move_to(plate[1], instrument=p200, enqueue=True)
+        return p200
+
+    def test_round_trip(self):
+        self.load_protocol()
+        expected = self.robot.commands()
+        data = protocol_ir.dumps(self.robot)
+        self.assertTrue(protocol_ir.is_protocol_ir(data))
+
+        Robot.reset_for_tests()
+        robot = Robot()
+        robot.connect()
+        protocol_ir.loads(data, robot)
+
+        self.assertEqual(robot.commands(), expected)
+        self.assertEqual(
+            [name for name, _ in robot.get_instruments()], ['B'])
+        self.assertEqual(robot.containers()['plate'].get_type(), '96-flat')
+        robot.simulate()
+
+    def test_export_ir_is_json(self):
+        self.load_protocol()
+        ir = self.robot.export_ir()
+        self.assertEqual(ir['version'], protocol_ir.IR_VERSION)
+        self.assertEqual(
+            ir['deck'],
+            [['A1', 'tiprack', 'tiprack-200ul'],
+             ['B1', 'plate', '96-flat'],
+             ['C2', 'trash', 'point']])
+        self.assertEqual(len(ir['commands']), len(self.robot._commands))
+
+    def test_unknown_version(self):
+        self.load_protocol()
+        ir = self.robot.export_ir()
+        ir['version'] = protocol_ir.IR_VERSION + 1
+        self.assertRaises(ValueError, self.robot.import_ir, ir)
+
+    def test_unknown_opcode(self):
+        self.load_protocol()
+        ir = self.robot.export_ir()
+        ir['commands'].append(['format_disk', None, [], {}])
+        self.assertRaises(ValueError, self.robot.import_ir, ir)
+
+    def test_registered_command_cannot_be_exported(self):
+        self.robot.register('custom', lambda: None)
+        self.robot.custom()
+        self.assertRaises(ValueError, self.robot.export_ir)
+
+    def test_size_vs_dill(self):
+        self.load_protocol()
+        dill_data = dill.dumps(self.robot)
+        ir_data = protocol_ir.dumps(self.robot)
+        self.assertLess(len(ir_data) * 10, len(dill_data))
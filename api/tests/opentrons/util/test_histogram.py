@@ -0,0 +1,41 @@
+import unittest
+
+from opentrons.util.histogram import Histogram, HISTOGRAM_MIN
+
+
+class HistogramTestCase(unittest.TestCase):
+    def test_quantiles(self):
+        histogram = Histogram()
+        self.assertIsNone(histogram.get_quantile(0.5))
+
+        for i in range(1, 101):
+            histogram.add(i / 1000)
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.total, 5.05)
+        self.assertAlmostEqual(histogram.get_quantile(0.5), 0.05, delta=0.013)
+        self.assertAlmostEqual(histogram.get_quantile(0.9), 0.09, delta=0.023)
+        self.assertEqual(histogram.get_quantile(1), 0.1)
+        self.assertAlmostEqual(histogram.get_quantile(0), 0.001, delta=3e-4)
+
+    def test_out_of_range(self):
+        histogram = Histogram()
+        histogram.add(0)
+        histogram.add(1e9)
+        self.assertEqual(histogram.counts[0], 1)
+        self.assertEqual(histogram.counts[-1], 1)
+        self.assertEqual(histogram.get_quantile(0.5), HISTOGRAM_MIN)
+        self.assertEqual(histogram.get_quantile(1), 1e9)
+
+    def test_merge(self):
+        first = Histogram()
+        second = Histogram()
+        for i in range(1, 11):
+            first.add(i)
+            second.add(i * 10)
+        first.merge(second)
+        self.assertEqual(first.count, 20)
+        self.assertEqual(first.total, 605)
+        self.assertEqual((first.min, first.max), (1, 100))
+        self.assertEqual(first.get_quantile(1), 100)
+        first.merge(Histogram())
+        self.assertEqual(first.count, 20)
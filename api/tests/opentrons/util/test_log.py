@@ -0,0 +1,62 @@
+import logging
+import threading
+import unittest
+
+from opentrons.util import log
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.threads = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+        self.threads.append(threading.get_ident())
+
+
+class Formatted(object):
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return 'formatted'
+
+
+class QueueLoggingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger('opentrons.tests.log')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.handler = RecordingHandler()
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        log.stop_queue_logging()
+        self.logger.removeHandler(self.handler)
+
+    def test_queue_logging(self):
+        log.start_queue_logging('opentrons.tests.log')
+        self.assertEqual(len(self.logger.handlers), 1)
+        self.assertIsInstance(
+            self.logger.handlers[0], log.DeferredQueueHandler)
+
+        arg = Formatted()
+        self.logger.info('Executing: %s', arg)
+        self.logger.debug('Moving: %s', arg)
+
+        log.stop_queue_logging()
+        self.assertEqual(self.logger.handlers, [self.handler])
+        self.assertEqual(self.handler.messages, ['Executing: formatted'])
+        # formatted once, by the listener thread
+        self.assertEqual(arg.count, 1)
+        self.assertNotEqual(self.handler.threads, [threading.get_ident()])
+
+    def test_start_twice(self):
+        log.start_queue_logging('opentrons.tests.log')
+        log.start_queue_logging('opentrons.tests.log')
+        self.logger.info('once')
+        log.stop_queue_logging()
+        self.assertEqual(self.handler.messages, ['once'])
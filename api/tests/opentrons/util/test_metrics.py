@@ -0,0 +1,74 @@
+import threading
+import unittest
+
+from opentrons.util import metrics
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def run_threads(self, target, count=4):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_counter(self):
+        counter = metrics.counter(
+            'test_total', 'Test counter', registry=self.registry)
+        self.assertIs(
+            metrics.counter('test_total', 'Again', registry=self.registry),
+            counter)
+
+        def increment():
+            for _ in range(1000):
+                counter.inc()
+
+        self.run_threads(increment)
+        counter.inc(5)
+        self.assertEqual(counter.get(), 4005)
+        # exited threads are folded into the base value
+        self.assertEqual(len(counter._cells), 1)
+        self.assertEqual(counter.get(), 4005)
+
+    def test_summary(self):
+        summary = metrics.summary(
+            'test_seconds', 'Test summary', registry=self.registry)
+
+        def observe():
+            for i in range(1, 101):
+                summary.observe(i / 1000)
+
+        self.run_threads(observe)
+        histogram = summary.get()
+        self.assertEqual(histogram.count, 400)
+        self.assertAlmostEqual(histogram.total, 20.2)
+        self.assertEqual(histogram.max, 0.1)
+
+    def test_render(self):
+        metrics.counter('test_total', 'Test counter', registry=self.registry)
+        metrics.summary(
+            'test_seconds', 'Test summary', registry=self.registry)
+        metrics.gauge(
+            'test_depth', 'Test gauge', lambda: 3, registry=self.registry)
+
+        self.assertEqual(self.registry.render(), '\n'.join([
+            '# HELP test_depth Test gauge',
+            '# TYPE test_depth gauge',
+            'test_depth 3',
+            '# HELP test_seconds Test summary',
+            '# TYPE test_seconds summary',
+            'test_seconds_sum 0',
+            'test_seconds_count 0',
+            '# HELP test_total Test counter',
+            '# TYPE test_total counter',
+            'test_total 0',
+        ]) + '\n')
+
+        self.registry.get('test_seconds').observe(0.5)
+        lines = self.registry.render().splitlines()
+        self.assertIn('test_seconds{quantile="0.99"} 0.5', lines)
+        self.assertIn('test_seconds_sum 0.5', lines)
+        self.assertIn('test_seconds_count 1', lines)
@@ -0,0 +1,156 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from opentrons import containers, instruments
+from opentrons.robot.robot import Robot
+from opentrons.util.profiler import Profile, SamplingProfiler
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+class ProfilerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_attribution(self):
+        profile = Profile(0.005, [__file__])
+        profile.add_sample(sys._getframe())
+        profile.add_sample(sys._getframe(), 'command:move')
+
+        self.assertEqual(profile.samples, 2)
+        self.assertEqual(profile.contexts, {'command:move': 1})
+        self.assertEqual(set(profile.subsystems), {'protocol'})
+        self.assertEqual(len(profile.protocol_lines), 2)
+        for line in profile.protocol_lines:
+            self.assertTrue(line.startswith('test_profiler.py:'))
+
+        stacks = profile.get_collapsed_stacks().splitlines()
+        self.assertEqual(len(stacks), 2)
+        context_stack = [s for s in stacks if s.startswith('command:move;')]
+        self.assertEqual(len(context_stack), 1)
+        for stack in stacks:
+            frames, count = stack.rsplit(' ', 1)
+            self.assertEqual(count, '1')
+            self.assertIn('test_profiler.py:', frames)
+
+        summary = profile.get_summary(top=3)
+        self.assertTrue(summary.startswith('2 samples'))
+        self.assertIn('Protocol lines', summary)
+        self.assertIn('Commands', summary)
+
+    def test_subsystems(self):
+        profile = Profile(0.005)
+
+        class Frame(object):
+            def __init__(self, code, back):
+                self.f_code = code
+                self.f_lineno = 1
+                self.f_back = back
+
+        # a labware frame, called by this test
+        code = containers.Container.__iter__.__code__
+        profile.add_sample(Frame(code, sys._getframe()))
+        self.assertEqual(dict(profile.subsystems), {'labware': 1})
+        self.assertEqual(
+            profile.functions.most_common(1)[0][0],
+            'opentrons.containers.placeable:__iter__')
+        self.assertEqual(len(profile.protocol_lines), 0)
+
+    def test_source(self):
+        profile = Profile(0.005, [__file__])
+        profile.add_sample(
+            sys._getframe(), 'command:move', ('/tmp/protocol.py', 12))
+        self.assertEqual(dict(profile.protocol_lines), {'protocol.py:12': 1})
+        stack, = profile.stacks
+        self.assertEqual(stack[:2], ('protocol.py:12', 'command:move'))
+
+    def test_sampling(self):
+        with SamplingProfiler(interval=0.001) as profiler:
+            busy(0.1)
+        profile = profiler.profile
+        self.assertGreater(profile.samples, 10)
+        self.assertGreaterEqual(profile.duration, 0.1)
+        # this file is the protocol by default
+        loop_lines = [
+            'test_profiler.py:{}'.format(busy.__code__.co_firstlineno + i)
+            for i in (2, 3)]
+        samples = sum(profile.protocol_lines[line] for line in loop_lines)
+        self.assertGreater(samples, profile.samples / 2)
+
+    def test_simulate(self):
+        robot = Robot.reset_for_tests()
+        robot.connect()
+        robot.home(enqueue=False)
+        tiprack = containers.load('tiprack-200ul', 'A1')
+        plate = containers.load('96-flat', 'B1')
+        trash = containers.load('point', 'C1')
+        p200 = instruments.Pipette(
+            axis='b', max_volume=200, tip_racks=[tiprack],
+            trash_container=trash)
+        p200.calibrate_plunger(top=0, bottom=10, blow_out=12, drop_tip=13)
+        p200.transfer(50, plate.wells(), plate.wells()[::-1], new_tip='once')
+        commands = len(robot.commands())
+
+        file_path = os.path.join(self.dir, 'simulate.folded')
+        robot.simulate(profile=file_path)
+        self.assertEqual(len(robot.commands()), commands)
+        self.assertIsNone(robot._running_command)
+
+        profile = robot.last_profile
+        self.assertGreater(profile.samples, 0)
+        for context in profile.contexts:
+            self.assertTrue(context.startswith('command:'))
+        self.assertTrue(set(profile.subsystems).issubset({
+            'labware', 'calibration', 'planning', 'driver', 'events',
+            'instruments', 'robot', 'opentrons', 'protocol', 'other'}))
+        with open(file_path) as f:
+            self.assertEqual(f.read(), profile.get_collapsed_stacks())
+
+    def test_simulate_protocol_lines(self):
+        robot = Robot.reset_for_tests()
+        robot.connect()
+        robot.home(enqueue=False)
+        tiprack = containers.load('tiprack-200ul', 'A1')
+        plate = containers.load('96-flat', 'B1')
+        trash = containers.load('point', 'C1')
+        p200 = instruments.Pipette(
+            axis='b', max_volume=200, tip_racks=[tiprack],
+            trash_container=trash)
+        p200.calibrate_plunger(top=0, bottom=10, blow_out=12, drop_tip=13)
+        p200.transfer(50, plate[0], plate[1])
+        # sources are only looked up while a profiler runs
+        self.assertIsNone(robot._commands[-1].source)
+
+        robot.clear_commands()
+        with SamplingProfiler():
+            transfer_line = sys._getframe().f_lineno + 1
+            p200.transfer(
+                50, plate.wells(), plate.wells()[::-1], new_tip='once')
+            p200.distribute(10, plate[0], plate.wells(), new_tip='never')
+        self.assertEqual(
+            robot._commands[0].source, (__file__, transfer_line))
+
+        robot.simulate(profile=True)
+        # samples of each command belong to the line that enqueued it,
+        # not to the simulate() call
+        lines = robot.last_profile.protocol_lines
+        for line in (transfer_line, transfer_line + 2):
+            self.assertIn('test_profiler.py:{}'.format(line), lines)
+
+        # commands re-created from the IR have no protocol line
+        ir = robot.export_ir()
+        with SamplingProfiler(protocol_files=['<protocol>']):
+            robot.import_ir(ir)
+        self.assertTrue(robot._commands)
+        self.assertEqual({c.source for c in robot._commands}, {None})
@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 from opentrons.util.trace import (
     EventBroker,
@@ -83,3 +85,177 @@ class TraceTestCase(unittest.TestCase):
             'result': None
         })
         self.assertDictEqual(expected_results[-1], self.events[-1])
+
+
+class EventBrokerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.previous_broker = EventBroker._instance
+        EventBroker._instance = None
+        self.broker = EventBroker.get_instance()
+        self.events = []
+
+    def tearDown(self):
+        EventBroker._instance = self.previous_broker
+
+    def log(self, info):
+        self.events.append(info)
+
+    def test_subscribe_by_name(self):
+        self.broker.add(self.log, names=['move-to', 'home'])
+        self.assertTrue(self.broker.has_listeners('move-to'))
+        self.assertFalse(self.broker.has_listeners('countdown'))
+
+        self.broker.notify({'name': 'countdown'})
+        self.broker.notify({'name': 'home'})
+        self.broker.notify({'name': 'move-to'})
+        self.assertEqual(
+            [event['name'] for event in self.events], ['home', 'move-to'])
+
+        self.broker.remove(self.log)
+        self.assertFalse(self.broker.has_listeners('move-to'))
+        self.assertRaises(ValueError, self.broker.remove, self.log)
+
+    def test_subscribe_to_all(self):
+        self.assertFalse(self.broker.has_listeners('anything'))
+        self.broker.add(self.log)
+        self.assertTrue(self.broker.has_listeners('anything'))
+        self.broker.notify({'name': 'anything'})
+        self.assertEqual(len(self.events), 1)
+
+    def test_traceable_named_listener(self):
+        @traceable('event-c')
+        def event_c(arg1, arg2='foo'):
+            return arg1
+
+        self.broker.add(self.log, names='event-c')
+        event_c(1)
+        self.assertDictEqual(self.events[-1], {
+            'arguments': {'arg1': 1, 'arg2': 'foo'},
+            'name': 'event-c',
+            'function': event_c.__wrapped__.__qualname__,
+            'result': 1
+        })
+
+    def test_overhead_without_listeners(self):
+        def hot(a, b=2):
+            return a * b
+
+        traced_hot = traceable('hot')(hot)
+        calls = 50000
+
+        def measure(f):
+            start = time.perf_counter()
+            for i in range(calls):
+                f(i)
+            return time.perf_counter() - start
+
+        plain_time = min(measure(hot) for _ in range(3))
+        traced_time = min(measure(traced_hot) for _ in range(3))
+
+        self.broker.add(self.log, names='other-event')
+        filtered_time = min(measure(traced_hot) for _ in range(3))
+
+        self.broker.add(self.log, names='hot')
+        listened_time = min(measure(traced_hot) for _ in range(3))
+
+        print(
+            '\n{} calls: plain {:.4f}s, traced without listeners {:.4f}s, '
+            'with listeners for other events {:.4f}s, '
+            'with listener {:.4f}s'.format(
+                calls, plain_time, traced_time, filtered_time, listened_time))
+
+        self.assertEqual(len(self.events), calls * 3)
+        self.assertLess(traced_time, listened_time)
+        self.assertLess(filtered_time, listened_time)
+        # per call overhead of the wrapper when nothing is listening
+        self.assertLess((traced_time - plain_time) / calls, 5e-6)
+
+
+class AsyncEventBrokerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.broker = EventBroker()
+        self.events = []
+        self.broker.add(self.log)
+
+    def tearDown(self):
+        self.broker.stop_async()
+
+    def log(self, info):
+        self.events.append(info)
+
+    def stop_dispatcher(self):
+        # lets events pile up in the queue until flush() is called
+        self.broker._stopping.set()
+        self.broker._wakeup.set()
+        self.broker._dispatcher.join()
+
+    def test_events_delivered_from_dispatcher(self):
+        threads = []
+        self.broker.add(
+            lambda info: threads.append(threading.current_thread()))
+        self.broker.start_async(interval=0)
+        self.broker.notify({'name': 'command-run', 'index': 0})
+
+        deadline = time.time() + 5
+        while not self.events and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.events, [{'name': 'command-run', 'index': 0}])
+        self.assertNotEqual(threads[0], threading.current_thread())
+
+    def test_coalesce(self):
+        self.broker.start_async(interval=0)
+        self.stop_dispatcher()
+
+        self.broker.notify({'name': 'countdown', 'countdown': 3})
+        self.broker.notify({'name': 'command-run', 'index': 0})
+        self.broker.notify({'name': 'countdown', 'countdown': 2})
+        self.broker.notify({'name': 'countdown', 'countdown': 1})
+        self.broker.flush()
+
+        self.assertEqual(self.events, [
+            {'name': 'countdown', 'countdown': 1},
+            {'name': 'command-run', 'index': 0}
+        ])
+        self.assertEqual(self.broker.stats['queued'], 4)
+        self.assertEqual(self.broker.stats['coalesced'], 2)
+        self.assertEqual(self.broker.stats['dispatched'], 2)
+
+    def test_drops_oldest_when_full(self):
+        self.broker.start_async(max_size=3, interval=0)
+        self.stop_dispatcher()
+
+        for i in range(5):
+            self.broker.notify({'name': 'command-run', 'index': i})
+        self.broker.flush()
+
+        self.assertEqual([e['index'] for e in self.events], [2, 3, 4])
+        self.assertEqual(self.broker.stats['dropped'], 2)
+
+    def test_slow_listener_does_not_block(self):
+        def slow_listener(info):
+            time.sleep(0.05)
+
+        self.broker.add(slow_listener)
+        self.broker.start_async()
+
+        start = time.time()
+        for i in range(20):
+            self.broker.notify({'name': 'move-finished', 'position': i})
+        self.assertLess(time.time() - start, 0.05)
+
+        self.broker.stop_async()
+        self.assertFalse(self.broker.is_async())
+        self.assertEqual(self.events[-1]['position'], 19)
+        self.assertLess(len(self.events), 20)
+
+    def test_listener_errors_are_counted(self):
+        def broken_listener(info):
+            raise Exception('broken')
+
+        self.broker.add(broken_listener)
+        self.broker.start_async(interval=0)
+        self.broker.notify({'name': 'command-run'})
+        self.broker.stop_async()
+
+        self.assertEqual(self.broker.stats['listener_errors'], 1)
+        self.assertEqual(len(self.events), 1)